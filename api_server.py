@@ -0,0 +1,289 @@
+"""Async JSON API for the read-only pages, served over ASGI.
+
+Uses the same SQL as app.py (queries.py) on psycopg 3's async driver with its
+own connection pool, and runs the independent queries behind each response
+concurrently on separate pooled connections. Requests are routed to a tenant
+the same way as in app.py (by host or /<slug> prefix, see tenants.py), and
+every query runs with search_path set to that tenant's schema. Run it with,
+for example:
+
+    uvicorn api_server:app --workers 2 --port 8001
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import psycopg
+import psycopg.errors
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import queries
+from app import DATABASE, STATEMENT_TIMEOUT_MS, TENANTS
+
+API_POOL_MIN_SIZE = int(os.getenv('API_POOL_MIN_SIZE', '2'))
+API_POOL_MAX_SIZE = int(os.getenv('API_POOL_MAX_SIZE', '10'))
+API_POOL_TIMEOUT_SECONDS = float(os.getenv('API_POOL_TIMEOUT_SECONDS', '10'))
+# Most ids one /api/v1/<entity>?ids= request may ask for.
+API_BATCH_MAX_IDS = int(os.getenv('API_BATCH_MAX_IDS', '500'))
+
+pool = AsyncConnectionPool(
+    make_conninfo(**{k: v for k, v in DATABASE.items() if v}),
+    min_size=API_POOL_MIN_SIZE,
+    max_size=API_POOL_MAX_SIZE,
+    timeout=API_POOL_TIMEOUT_SECONDS,
+    kwargs={
+        'autocommit': True,
+        'client_encoding': 'utf8',
+        'row_factory': dict_row,
+        'options': f'-c statement_timeout={STATEMENT_TIMEOUT_MS}',
+    },
+    open=False,
+)
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _JSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def _not_found(what: str) -> _JSONResponse:
+    return _JSONResponse({'error': f'{what} not found'}, status_code=404)
+
+
+# Schema of the current request's tenant, set by _TenantMiddleware.
+_schema = contextvars.ContextVar('schema', default='public')
+
+
+@contextlib.asynccontextmanager
+async def _execute(sql: str, params):
+    """Run sql on a pooled connection in the request's tenant schema.
+
+    The search_path is set in the same pipeline as the query, so it costs no
+    extra round trip.
+    """
+    async with pool.connection() as conn:
+        async with conn.pipeline():
+            await conn.execute("SELECT set_config('search_path', %s, false);", (_schema.get(),))
+            cursor = await conn.execute(sql, params)
+        yield cursor
+
+
+async def fetch_all(sql: str, params=None) -> list[dict]:
+    async with _execute(sql, params) as cursor:
+        return await cursor.fetchall()
+
+
+async def fetch_one(sql: str, params=None) -> dict | None:
+    async with _execute(sql, params) as cursor:
+        return await cursor.fetchone()
+
+
+class _TenantMiddleware:
+    """Pick each request's tenant. A /<slug> prefix becomes part of
+    root_path, so routing ignores it; unknown sites get a 404."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        host = dict(scope['headers']).get(b'host', b'').decode('latin-1')
+        tenant, prefix = TENANTS.resolve(host, scope['path'])
+        if tenant is None:
+            return await _JSONResponse({'error': 'Unknown site'}, status_code=404)(scope, receive, send)
+        if prefix:
+            scope = dict(scope, root_path=scope.get('root_path', '') + prefix)
+        token = _schema.set(tenant.schema)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _schema.reset(token)
+
+
+def _group_by(rows: list[dict], key: str) -> dict:
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop(key), []).append(row)
+    return grouped
+
+
+async def elections(request):
+    sort_column, sort_order = queries.validated_sort(
+        request.query_params.get('sort'), request.query_params.get('order'),
+        queries.ELECTION_SORT_COLUMNS, 'election_name',
+    )
+    rows = await fetch_all(queries.ELECTIONS.format(sort_column=sort_column, sort_order=sort_order))
+    return _JSONResponse({'elections': rows})
+
+
+async def election_races(request):
+    election_id = request.path_params['election_id']
+    sort_column, sort_order = queries.validated_sort(
+        request.query_params.get('sort'), request.query_params.get('order'),
+        queries.RACE_SORT_COLUMNS, 'race_name',
+    )
+    election, races = await asyncio.gather(
+        fetch_one(queries.ELECTION, (election_id,)),
+        fetch_all(queries.ELECTION_RACES.format(sort_column=sort_column, sort_order=sort_order), (election_id,)),
+    )
+    if not election:
+        return _not_found('Election')
+    return _JSONResponse({'election': election, 'races': races})
+
+
+async def race_details(request):
+    race_id = request.path_params['race_id']
+    race, campaigns = await asyncio.gather(
+        fetch_one(queries.RACE, (race_id,)),
+        fetch_all(queries.RACE_CAMPAIGNS, (race_id,)),
+    )
+    if not race:
+        return _not_found('Race')
+    return _JSONResponse({'race': race, 'campaigns': campaigns})
+
+
+async def individual(request):
+    contact_id = request.path_params['contact_id']
+    individual, campaigns = await asyncio.gather(
+        fetch_one(queries.INDIVIDUAL, (contact_id,)),
+        fetch_all(queries.INDIVIDUAL_CAMPAIGNS, (contact_id,)),
+    )
+    if not individual:
+        return _not_found('Individual')
+    return _JSONResponse({'individual': individual, 'campaigns': campaigns})
+
+
+async def people(request):
+    sort_column, sort_order = queries.validated_sort(
+        request.query_params.get('sort'), request.query_params.get('order'),
+        queries.PEOPLE_SORT_MAP, 'full_name',
+    )
+    rows = await fetch_all(
+        queries.PEOPLE.format(sort_column=queries.PEOPLE_SORT_MAP[sort_column], sort_order=sort_order)
+    )
+    return _JSONResponse({'people': rows})
+
+
+async def jurisdictions(request):
+    sort_column, sort_order = queries.validated_sort(
+        request.query_params.get('sort'), request.query_params.get('order'),
+        queries.JURISDICTION_SORT_COLUMNS, 'jurisdiction_name',
+    )
+    rows = await fetch_all(queries.JURISDICTIONS.format(sort_column=sort_column, sort_order=sort_order))
+    return _JSONResponse({'jurisdictions': rows})
+
+
+async def jurisdiction_details(request):
+    jurisdiction_id = request.path_params['jurisdiction_id']
+    jurisdiction, offices, holders = await asyncio.gather(
+        fetch_one(queries.JURISDICTION, (jurisdiction_id,)),
+        fetch_all(queries.JURISDICTION_OFFICES, (jurisdiction_id,)),
+        fetch_all(queries.JURISDICTION_CURRENT_HOLDERS, (jurisdiction_id,)),
+    )
+    if not jurisdiction:
+        return _not_found('Jurisdiction')
+    holders = _group_by(holders, 'office_id')
+    for office in offices:
+        office['current_officeholders'] = holders.get(office['office_id'], [])
+    return _JSONResponse({'jurisdiction': jurisdiction, 'offices': offices})
+
+
+async def offices(request):
+    if 'ids' in request.query_params:
+        return await _batch_offices(request)
+    rows = await fetch_all(queries.OFFICES)
+    return _JSONResponse({'offices': rows})
+
+
+async def office_details(request):
+    office_id = request.path_params['office_id']
+    office, officeholders, races = await asyncio.gather(
+        fetch_one(queries.OFFICE, (office_id,)),
+        fetch_all(queries.OFFICE_HOLDERS, (office_id, office_id)),
+        fetch_all(queries.OFFICE_RACES, (office_id,)),
+    )
+    if not office:
+        return _not_found('Office')
+    return _JSONResponse({'office': office, 'officeholders': officeholders, 'races': races})
+
+
+def _batch(entity: str):
+    """Endpoint returning the rows of entity for ?ids=1,2,3 with one query,
+    plus the ids that matched nothing."""
+    sql, id_column = queries.BATCH_QUERIES[entity]
+
+    async def endpoint(request):
+        try:
+            ids = queries.parse_id_list(request.query_params.get('ids'), API_BATCH_MAX_IDS)
+        except ValueError as e:
+            return _JSONResponse({'error': str(e)}, status_code=400)
+        rows = await fetch_all(sql, (ids,))
+        found = {row[id_column] for row in rows}
+        return _JSONResponse({entity: rows, 'missing': [i for i in ids if i not in found]})
+
+    return endpoint
+
+
+_batch_offices = _batch('offices')
+
+
+async def _query_canceled(request, exc):
+    return _JSONResponse(
+        {'error': 'The database took too long to answer. Please try again shortly.'},
+        status_code=503,
+        headers={'Retry-After': '5'},
+    )
+
+
+@contextlib.asynccontextmanager
+async def _pool_lifespan(app):
+    await pool.open()
+    try:
+        yield
+    finally:
+        await pool.close()
+
+
+routes = [
+    Route('/api/v1/elections', elections),
+    Route('/api/v1/elections/{election_id:int}', election_races),
+    Route('/api/v1/races', _batch('races')),
+    Route('/api/v1/races/{race_id:int}', race_details),
+    Route('/api/v1/individuals', _batch('individuals')),
+    Route('/api/v1/individuals/{contact_id:int}', individual),
+    Route('/api/v1/people', people),
+    Route('/api/v1/jurisdictions', jurisdictions),
+    Route('/api/v1/jurisdictions/{jurisdiction_id:int}', jurisdiction_details),
+    Route('/api/v1/offices', offices),
+    Route('/api/v1/offices/{office_id:int}', office_details),
+    Route('/api/v1/campaigns', _batch('campaigns')),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(_TenantMiddleware)],
+    lifespan=_pool_lifespan,
+    exception_handlers={
+        psycopg.errors.QueryCanceled: _query_canceled,
+        PoolTimeout: _query_canceled,
+    },
+)
@@ -1,17 +1,34 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file
+from flask import Flask, render_template, request, redirect, url_for, send_file, g, has_request_context, make_response
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+import psycopg2.pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor, execute_values
+from read_model import ReadModel
+import queries
+import tenants
 import os
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from collections import OrderedDict, deque
 from datetime import datetime
 from datetime import date, timedelta
-import calendar
-import subprocess
 import tempfile
-import shutil
-import csv
+import fcntl
+import functools
+import hashlib
+import hmac
 import io
+import json
+import queue
 import re
+import secrets
+import select
+import socket
+import sys
+import threading
+import time
 
 _shared_dotenv_path = os.getenv(
     "COCODEMS_ENV_FILE",
@@ -34,14 +51,1416 @@ DATABASE = {
     'port': os.getenv('DB_PORT')
 }
 
-def get_db_connection():
-    """Establish connection to the PostgreSQL database."""
-    conn = psycopg2.connect(**DATABASE)
+# Counties served by this deployment, each in its own schema of DATABASE
+# (see tenants.py). Unconfigured, the one tenant is the public schema.
+TENANTS = tenants.load()
+app.wsgi_app = tenants.TenantMiddleware(app.wsgi_app, TENANTS)
+
+# Connections are pooled per worker and shared by every tenant. Each checkout
+# sets the tenant's search_path and the request's statement timeout, and
+# close() returns the connection to the pool. A request that cannot get a
+# connection within DB_POOL_TIMEOUT_SECONDS gets the "try again" page.
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '10'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', '300'))
+
+# Optional read-only replica. Read-only pages are routed here while it is
+# reachable and caught up; writes always go to the primary above.
+DATABASE_REPLICA_DSN = (os.getenv('DB_REPLICA_DSN') or '').strip()
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv('DB_REPLICA_CHECK_INTERVAL_SECONDS', '10'))
+PRIMARY_PIN_SECONDS = int(os.getenv('DB_PRIMARY_PIN_SECONDS', '30'))
+_PRIMARY_PIN_COOKIE = 'cocodems_primary_until'
+
+_replica_state = {'checked_at': 0.0, 'healthy': False}
+_replica_state_lock = threading.Lock()
+
+# Statement timeouts, applied to every connection a request checks out.
+# Interactive pages get a short budget; admin jobs a long one.
+STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))
+ADMIN_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_ADMIN_STATEMENT_TIMEOUT_MS', '300000'))
+_ADMIN_ENDPOINTS = {
+    'enhance_individuals',
+    'admin_reload',
+    'admin_clean_candidates',
+    'upload_election_races',
+}
+
+
+def get_db_connection(readonly: bool = False):
+    """Check out a pooled connection to the current tenant's schema.
+
+    Pass readonly=True from handlers that only read. Those connections go to
+    the replica when DB_REPLICA_DSN is set, the replica is reachable and its
+    replay lag is within DB_REPLICA_MAX_LAG_SECONDS; otherwise (and for every
+    write) the primary is used. close() returns the connection to the pool.
+    """
+    if readonly and DATABASE_REPLICA_DSN and not _pinned_to_primary():
+        conn = _replica_connection()
+        if conn is not None:
+            if has_request_context():
+                g.used_replica = True
+            return _checkout(conn)
+    return _checkout(_pool_checkout(_primary_pool))
+
+
+def _statement_timeout_ms() -> int:
+    if has_request_context() and request.endpoint in _ADMIN_ENDPOINTS:
+        return ADMIN_STATEMENT_TIMEOUT_MS
+    return STATEMENT_TIMEOUT_MS
+
+
+class _ConnectionPool:
+    """A bounded pool of connections for one server, shared by all tenants.
+
+    At most max_size connections are checked out or idle at once; getconn()
+    waits up to timeout seconds for one to free up and then raises PoolError.
+    Idle connections are reused most recently returned first and closed
+    after max_idle seconds. The pool starts empty in each forked worker.
+    """
+
+    def __init__(self, connect, max_size: int, timeout: float, max_idle: float):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._pid = None
+        self._slots = None
+        # (connection, returned at), oldest first
+        self._idle: list = []
+
+    def getconn(self, schema: str, statement_timeout_ms: int) -> '_PooledConnection':
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Connections inherited from the parent belong to it.
+                    self._pid = os.getpid()
+                    self._slots = threading.BoundedSemaphore(self.max_size)
+                    self._idle = []
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError(f'No database connection became free within {self.timeout:g}s')
+        conn = None
+        try:
+            conn = self._take()
+            try:
+                self._configure(conn, schema, statement_timeout_ms)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                # The server dropped it while idle; one retry on a new one.
+                conn.close()
+                conn = None
+                conn = self._connect()
+                self._configure(conn, schema, statement_timeout_ms)
+            return _PooledConnection(self, conn)
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            self._slots.release()
+            raise
+
+    @staticmethod
+    def _configure(conn, schema: str, statement_timeout_ms: int) -> None:
+        # Session-level settings, so they outlast the request's transactions.
+        # The round trip also proves an idle connection is still alive.
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('search_path', %s, false), set_config('statement_timeout', %s, false);",
+                (schema, str(statement_timeout_ms)),
+            )
+        conn.autocommit = False
+
+    def _take(self):
+        stale = []
+        now = time.monotonic()
+        try:
+            with self._lock:
+                while self._idle and now - self._idle[0][1] > self.max_idle:
+                    stale.append(self._idle.pop(0)[0])
+                while self._idle:
+                    conn, _ = self._idle.pop()
+                    if not conn.closed:
+                        return conn
+        finally:
+            for conn in stale:
+                conn.close()
+        return self._connect()
+
+    def putconn(self, conn) -> None:
+        try:
+            if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            reusable = not conn.closed and conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+        except psycopg2.Error:
+            reusable = False
+        if reusable and self._pid == os.getpid():
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        elif not conn.closed:
+            conn.close()
+        self._slots.release()
+
+
+class _PooledConnection:
+    """A checked-out connection. close() rolls back anything uncommitted and
+    returns it to its pool; everything else goes to the psycopg2 connection."""
+
+    __slots__ = ('_pool', '_conn')
+
+    def __init__(self, pool: _ConnectionPool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    @property
+    def closed(self) -> int:
+        return 1 if self._conn is None else self._conn.closed
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    def cancel(self) -> None:
+        conn = self._conn
+        if conn is not None:
+            conn.cancel()
+
+    def __getattr__(self, name):
+        conn = self._conn
+        if conn is None:
+            raise psycopg2.InterfaceError('connection already returned to the pool')
+        return getattr(conn, name)
+
+
+_primary_pool = _ConnectionPool(
+    lambda: psycopg2.connect(**DATABASE),
+    DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT_SECONDS, DB_POOL_MAX_IDLE_SECONDS,
+)
+_replica_pool = _ConnectionPool(
+    lambda: psycopg2.connect(DATABASE_REPLICA_DSN, connect_timeout=2),
+    DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT_SECONDS, DB_POOL_MAX_IDLE_SECONDS,
+)
+
+
+def _pool_checkout(pool: _ConnectionPool, tenant: tenants.Tenant | None = None,
+                   timeout_ms: int | None = None) -> _PooledConnection:
+    """Check out a connection for tenant (default: the current one), with the
+    statement timeout of the current request unless timeout_ms is given."""
+    tenant = tenant or _tenant()
+    metrics = _tenant_states[tenant.slug].metrics
+    started = time.perf_counter()
+    try:
+        conn = pool.getconn(tenant.schema, timeout_ms or _statement_timeout_ms())
+    except psycopg2.pool.PoolError:
+        metrics.add(db_pool_timeouts=1)
+        raise
+    metrics.add(db_checkouts=1, db_wait_seconds=time.perf_counter() - started)
+    return conn
+
+
+def _checkout(conn):
+    """Track a request's connection so it is cancelled if the client goes away
+    and closed at teardown even when the handler raised."""
+    if has_request_context():
+        g.setdefault('db_connections', []).append(conn)
+        _disconnect_watcher.watch(request.environ, conn)
+    return conn
+
+
+class _DisconnectWatcher:
+    """One thread per worker that cancels the running query of any request
+    whose client has closed its socket."""
+
+    POLL_SECONDS = 0.25
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watched: dict = {}
+        self._thread = None
+
+    def watch(self, environ, conn) -> None:
+        sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+        if sock is None or type(sock).__module__.startswith('gevent.'):
+            # A gevent socket can only be waited on by one greenlet at a time,
+            # and the worker waits on it for the next keep-alive request.
+            return
+        with self._lock:
+            self._watched.setdefault(sock, []).append(conn)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-disconnect-watcher', daemon=True)
+                self._thread.start()
+
+    def forget(self, environ) -> None:
+        sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+        with self._lock:
+            self._watched.pop(sock, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                socks = list(self._watched)
+            # poll() rather than select(), which cannot take descriptors
+            # numbered 1024 or above.
+            poller = select.poll()
+            by_fd = {}
+            for sock in socks:
+                fd = sock.fileno()
+                if fd < 0:
+                    # Closed under us.
+                    with self._lock:
+                        self._watched.pop(sock, None)
+                    continue
+                by_fd[fd] = sock
+                poller.register(fd, select.POLLIN | select.POLLPRI)
+            if not by_fd:
+                time.sleep(self.POLL_SECONDS)
+                continue
+            try:
+                events = poller.poll(self.POLL_SECONDS * 1000)
+            except OSError:
+                time.sleep(self.POLL_SECONDS)
+                continue
+            readable = []
+            for fd, event in events:
+                if event & select.POLLNVAL:
+                    with self._lock:
+                        self._watched.pop(by_fd[fd], None)
+                else:
+                    readable.append(by_fd[fd])
+            for sock in readable:
+                try:
+                    disconnected = sock.recv(1, socket.MSG_PEEK) == b''
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    disconnected = True
+                with self._lock:
+                    # A readable socket with data is an unread request body
+                    # or a pipelined request, not a hang-up; stop watching it
+                    # either way so select() does not spin on it.
+                    conns = self._watched.pop(sock, [])
+                if disconnected:
+                    for conn in conns:
+                        if not conn.closed:
+                            conn.cancel()
+
+
+_disconnect_watcher = _DisconnectWatcher()
+
+
+@app.teardown_request
+def _release_db_connections(exc):
+    if has_request_context():
+        _disconnect_watcher.forget(request.environ)
+    for conn in g.pop('db_connections', []):
+        # Also for broken connections, so their pool slot is released.
+        conn.close()
+
+
+@app.errorhandler(psycopg2.errors.QueryCanceled)
+@app.errorhandler(psycopg2.pool.PoolError)
+def _query_canceled(e):
+    """Degrade gracefully when a statement timeout (or client hang-up) cancels
+    a query, or no pooled connection frees up in time."""
+    return (
+        render_template('unavailable.html'),
+        503,
+        {'Retry-After': '5'},
+    )
+
+
+def _replica_connection():
+    """Return a replica connection, or None if reads should use the primary."""
+    now = time.monotonic()
+    with _replica_state_lock:
+        checked_at = _replica_state['checked_at']
+        healthy = _replica_state['healthy']
+    stale = now - checked_at >= REPLICA_CHECK_INTERVAL_SECONDS
+    if not healthy and not stale:
+        return None
+
+    try:
+        conn = _pool_checkout(_replica_pool)
+    except psycopg2.pool.PoolError:
+        # Busy, not broken: this read goes to the primary, and the replica
+        # stays in use for the rest.
+        return None
+    except psycopg2.OperationalError:
+        _set_replica_health(False, now)
+        return None
+
+    if not stale:
+        return conn
+
+    try:
+        lag = _replica_lag_seconds(conn)
+    except psycopg2.Error:
+        conn.close()
+        _set_replica_health(False, now)
+        return None
+
+    healthy = lag <= REPLICA_MAX_LAG_SECONDS
+    _set_replica_health(healthy, now)
+    if not healthy:
+        conn.close()
+        return None
     return conn
 
 
+def _replica_lag_seconds(conn) -> float:
+    with conn.cursor() as cursor:
+        # An idle primary sends no new WAL, so a replica that has replayed
+        # everything it received counts as caught up regardless of how old
+        # its last replayed transaction is, but only while it is streaming:
+        # one whose WAL stream has dropped has also replayed all it received.
+        # (The receiver's status is NULL unless the user has
+        # pg_read_all_stats, and then only the replay timestamp counts.)
+        cursor.execute(
+            """
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                     AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END;
+            """
+        )
+        lag = float(cursor.fetchone()[0])
+    conn.rollback()
+    return lag
+
+
+def _set_replica_health(healthy: bool, checked_at: float) -> None:
+    with _replica_state_lock:
+        _replica_state['healthy'] = healthy
+        _replica_state['checked_at'] = checked_at
+
+
+def _pinned_to_primary() -> bool:
+    """True for a client that wrote recently, so it reads its own writes."""
+    if not has_request_context():
+        return False
+    try:
+        until = float(request.cookies.get(_PRIMARY_PIN_COOKIE) or 0)
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def _mark_primary_write() -> None:
+    """Record that this request committed a write (see _pin_writer_to_primary)."""
+    if has_request_context():
+        g.wrote_to_primary = True
+
+
+@app.after_request
+def _pin_writer_to_primary(response):
+    if (DATABASE_REPLICA_DSN or LOCAL_CACHE_ENABLED) and g.get('wrote_to_primary'):
+        response.set_cookie(
+            _PRIMARY_PIN_COOKIE,
+            str(int(time.time()) + PRIMARY_PIN_SECONDS),
+            max_age=PRIMARY_PIN_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+    return response
+
+
+# Per-worker cache for rendered pages and reference data. Entries are tagged
+# with the (table, id) pairs they were built from; write paths announce what
+# they changed with NOTIFY and every worker's listener thread evicts the
+# matching entries. A tag id of None means "anything in that table".
+LOCAL_CACHE_ENABLED = os.getenv('LOCAL_CACHE_ENABLED', '1') not in {'0', 'false', 'False', ''}
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', '1000'))
+_NOTIFY_CHANNEL = 'cocodems_changes'
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+_NOTIFY_MAX_PAYLOAD = 7900
+
+
+class _LocalCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._by_tag: dict = {}
+        # Bumped on every eviction, so a value computed while a write landed
+        # can be recognised as possibly stale and not stored.
+        self.generation = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, tags, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags, generation: int, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tuple(tags), expires_at)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def evict(self, table: str, ids) -> None:
+        with self._lock:
+            self.generation += 1
+            if ids is None:
+                tags = [t for t in self._by_tag if t[0] == table]
+            else:
+                tags = [(table, None)] + [(table, i) for i in ids]
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def _remove(self, key) -> None:
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+class _ChangeListener:
+    """LISTENs on the primary and evicts cache entries named by each NOTIFY.
+
+    One connection and thread per worker listens on every tenant's channel
+    and applies each notification to that tenant's state. Started lazily so
+    that each gunicorn worker (after fork) gets its own thread. While the
+    listener is disconnected the caches are bypassed, since notifications
+    may have been missed.
+    """
+
+    def __init__(self, states: dict):
+        self.states = states
+        self._by_channel = {state.channel: state for state in states.values()}
+        self.connected = False
+        self._subscribers: list = []
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def subscribe(self, callback) -> None:
+        """Call callback(tenant_slug, changes) for each notification, before
+        that tenant's versions advance.
+
+        changes is the list of (table, ids) pairs from _notify_change, or None
+        when notifications may have been missed (on (re)connect).
+        """
+        self._subscribers.append(callback)
+
+    def _publish(self, slug: str, changes) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(slug, changes)
+            except Exception:
+                app.logger.exception('Change subscriber failed')
+
+    def _clear_all(self) -> None:
+        for state in self.states.values():
+            state.cache.clear()
+
+    def ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.connected = False
+            self._clear_all()
+            threading.Thread(target=self._run, name='db-change-listener', daemon=True).start()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**DATABASE)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    for channel, state in self._by_channel.items():
+                        cursor.execute(f'LISTEN {channel};')
+                        state.versions = _load_data_versions(cursor, state.tenant.schema)
+                # Anything cached before (re)connecting may have missed a
+                # notification.
+                self._clear_all()
+                for slug in self.states:
+                    self._publish(slug, None)
+                self.connected = True
+                backoff = 1.0
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        state = self._by_channel.get(notify.channel)
+                        if state is not None:
+                            self._apply(state, notify.payload)
+            except Exception:
+                self.connected = False
+                self._clear_all()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _apply(self, state, payload: str) -> None:
+        slug = state.tenant.slug
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            state.cache.clear()
+            self._publish(slug, None)
+            return
+        self._publish(slug, message.get('changes', []))
+        versions = message.get('versions') or {}
+        if state.versions is not None:
+            merged = dict(state.versions)
+            for table, version in versions.items():
+                merged[table] = max(version, merged.get(table, 0))
+            state.versions = merged
+        for table, ids in message.get('changes', []):
+            state.cache.evict(table, ids)
+
+
+def _cache_usable() -> bool:
+    if not LOCAL_CACHE_ENABLED:
+        return False
+    _change_listener.ensure_started()
+    return _change_listener.connected and not _pinned_to_primary()
+
+
+def _load_data_versions(cursor, schema: str) -> dict | None:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'{schema}.data_versions',))
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(f"SELECT table_name, version FROM {schema}.data_versions;")
+    return {table: int(version) for table, version in cursor.fetchall()}
+
+
+def _bump_data_versions(conn, tables, tenant: tenants.Tenant | None = None) -> dict:
+    """Increment data_versions for tables (in the caller's transaction)."""
+    state = _tenant_states[(tenant or _tenant()).slug]
+    with conn.cursor() as cursor:
+        if not state.data_versions_table_exists:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'{state.tenant.schema}.data_versions',))
+            # Remembered only once it exists; the app never drops it.
+            state.data_versions_table_exists = bool(cursor.fetchone()[0])
+            if not state.data_versions_table_exists:
+                return {}
+        cursor.execute(
+            """
+            UPDATE data_versions
+            SET version = version + 1
+            WHERE table_name = ANY(%s)
+            RETURNING table_name, version;
+            """,
+            (sorted(tables),),
+        )
+        return {table: int(version) for table, version in cursor.fetchall()}
+
+
+def _notify_change(cursor, changes, tenant: tenants.Tenant | None = None) -> None:
+    """Announce a write to every worker's cache.
+
+    changes is a list of (table, ids) pairs; ids are the primary keys of the
+    affected rows (race_ids for campaigns), or None for the whole table. Call
+    inside the writing transaction: the data_versions bump commits with it,
+    and Postgres only delivers the notification when it commits. tenant
+    defaults to the current request's.
+    """
+    tenant = tenant or _tenant()
+    changes = [[table, sorted(set(ids)) if ids is not None else None] for table, ids in changes]
+    versions = _bump_data_versions(cursor.connection, {table for table, _ in changes}, tenant)
+    payload = json.dumps({'changes': changes, 'versions': versions}, separators=(',', ':'))
+    if len(payload) > _NOTIFY_MAX_PAYLOAD:
+        payload = json.dumps({'changes': [[table, None] for table, _ in changes], 'versions': versions})
+    cursor.execute('SELECT pg_notify(%s, %s);', (_tenant_states[tenant.slug].channel, payload))
+
+
+# Shared on-disk cache of rendered pages, used by every worker on the host,
+# in a directory per tenant. Entries are keyed by route, query string and
+# data version, so any write makes the old entries unreachable; they then age
+# out by LRU.
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', '1') not in {'0', 'false', 'False', ''}
+PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'cocodems_page_cache')
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+def _add_to_shared_counts(path: str, counts: dict) -> dict:
+    """Add counts to the totals in the JSON file at path, shared by the
+    workers on a host, and return the new totals."""
+    totals = dict.fromkeys(counts, 0)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                totals.update(json.loads(f.read() or '{}'))
+            except ValueError:
+                pass
+            for name, value in counts.items():
+                totals[name] = totals.get(name, 0) + value
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(totals))
+    except OSError:
+        pass
+    return totals
+
+
+class _DiskCache:
+    SUFFIX = '.page'
+    STATS_FILE = 'stats.json'
+    SWEEP_INTERVAL_SECONDS = 5.0
+    STATS_FLUSH_SECONDS = 5.0
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._flushed_at = time.monotonic()
+        self._swept_at = 0.0
+        self._written_since_sweep = 0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + self.SUFFIX)
+
+    def get(self, key: str):
+        entry = self._read(key)
+        self._count(hit=entry is not None)
+        return entry
+
+    def _read(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # mtime doubles as the LRU clock.
+            os.utime(path)
+        except OSError:
+            return None
+        header, _, body = data.partition(b'\n')
+        try:
+            meta = json.loads(header)
+        except ValueError:
+            return None
+        return body, meta['mimetype'], [tuple(t) for t in meta['tags']]
+
+    def acquire(self, key: str):
+        """Try to take the cross-worker lock for rendering key.
+
+        Returns the open lock file (pass it to release()), False if another
+        worker is already rendering key, or None if locking is unavailable.
+        """
+        path = self._path(key)[:-len(self.SUFFIX)] + '.lock'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            f = open(path, 'a')
+        except OSError:
+            return None
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        return f
+
+    def release(self, lock) -> None:
+        if lock:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+    def wait_for(self, key: str, timeout: float):
+        """Wait up to timeout seconds for the worker rendering key to finish.
+
+        Returns (entry, lock). Once the render lock is free the entry is
+        read; if the other worker wrote none (the page was not cacheable, was
+        read from the replica or failed), the lock is returned held, for the
+        caller to render under and release(). Both are None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(0.02)
+            lock = self.acquire(key)
+            if lock is not False:
+                entry = self._read(key)
+                self._count(hit=entry is not None)
+                if entry is not None:
+                    self.release(lock)
+                    return entry, None
+                return None, lock
+            if time.monotonic() >= deadline:
+                self._count(hit=False)
+                return None, None
+
+    def set(self, key: str, body: bytes, mimetype: str, tags) -> None:
+        path = self._path(key)
+        header = json.dumps({'mimetype': mimetype, 'tags': list(tags)}, separators=(',', ':'))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header.encode('utf-8') + b'\n')
+                f.write(body)
+            # Readers see either the old file or the complete new one.
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except (OSError, UnboundLocalError):
+                pass
+            return
+        with self._lock:
+            self._written_since_sweep += len(body)
+            due = (
+                time.monotonic() - self._swept_at >= self.SWEEP_INTERVAL_SECONDS
+                or self._written_since_sweep >= self.max_bytes // 10
+            )
+        if due:
+            self.sweep()
+
+    def sweep(self) -> None:
+        """Delete least recently used entries until under 90% of max_bytes."""
+        with self._lock:
+            self._swept_at = time.monotonic()
+            self._written_since_sweep = 0
+        entries = []
+        total = 0
+        stale_before = time.time() - 600
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.lock'):
+                        # Lock files are reused; drop the ones nobody has
+                        # rendered with for a while.
+                        try:
+                            if entry.stat().st_mtime < stale_before:
+                                os.unlink(entry.path)
+                        except OSError:
+                            pass
+                        continue
+                    if not entry.name.endswith(self.SUFFIX):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            due = time.monotonic() - self._flushed_at >= self.STATS_FLUSH_SECONDS
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self) -> dict:
+        """Add this worker's counts to the shared stats file and return the totals."""
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+            self._flushed_at = time.monotonic()
+        return _add_to_shared_counts(os.path.join(self.directory, self.STATS_FILE), {'hits': hits, 'misses': misses})
+
+    def stats(self) -> dict:
+        totals = self.flush_stats()
+        entries = 0
+        used = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(self.SUFFIX):
+                        entries += 1
+                        used += entry.stat().st_size
+        except OSError:
+            pass
+        lookups = totals['hits'] + totals['misses']
+        return {
+            'hits': totals['hits'],
+            'misses': totals['misses'],
+            'hit_rate': (totals['hits'] / lookups) if lookups else None,
+            'entries': entries,
+            'bytes': used,
+            'max_bytes': self.max_bytes,
+        }
+
+
+# How long a request waits for an identical in-flight render (in this worker
+# or another one on the host) before rendering the page itself.
+COALESCE_TIMEOUT_SECONDS = float(os.getenv('PAGE_COALESCE_TIMEOUT_SECONDS', '10'))
+
+
+class _SingleFlight:
+    """Let one thread per key do the work while concurrent callers wait for it."""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key, fn, timeout: float):
+        """Return fn()'s result, sharing it with concurrent calls for key.
+
+        fn returns (shareable, private): waiting callers get shareable, the
+        caller that ran fn gets private. Waiters fall back to running fn
+        themselves after timeout seconds or if shareable is None.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        if not leader:
+            if call.done.wait(timeout) and call.result is not None:
+                return call.result, None
+            return fn()
+        try:
+            call.result, private = fn()
+            return call.result, private
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+_page_flights = _SingleFlight()
+
+
+def _page_cache_stats() -> dict | None:
+    """Shared page cache stats for the admin page."""
+    if not PAGE_CACHE_ENABLED:
+        return None
+    return _state().disk_cache.stats()
+
+
+def _cache_depends_on(*tags) -> None:
+    """Mark the current page cacheable, built from the given (table, id) tags."""
+    g.setdefault('cache_tags', []).extend(tags)
+
+
+def _cached_page(view):
+    """Serve a GET view from the per-worker cache, then the shared disk cache.
+
+    Only responses whose view called _cache_depends_on are stored. Pages read
+    from the replica are kept at most DB_REPLICA_MAX_LAG_SECONDS in memory and
+    never written to disk, because the notification for a write can arrive
+    before the replica has replayed it.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or not _cache_usable():
+            return view(*args, **kwargs)
+
+        state = _state()
+        local_cache, disk_cache = state.cache, state.disk_cache
+        # script_root is the tenant's path prefix, which the links carry.
+        path = request.script_root + request.full_path
+        key = ('page', path)
+        cached = local_cache.get(key)
+        if cached is not None:
+            body, mimetype = cached
+            return app.response_class(body, mimetype=mimetype)
+
+        generation = local_cache.generation
+        g.cache_generation = generation
+        data_version = state.data_version if PAGE_CACHE_ENABLED else None
+        disk_key = f'{path}@{data_version}'
+        if data_version is not None:
+            cached = disk_cache.get(disk_key)
+            if cached is not None:
+                body, mimetype, tags = cached
+                local_cache.set(key, (body, mimetype), tags, generation)
+                return app.response_class(body, mimetype=mimetype)
+
+        def render():
+            lock = disk_cache.acquire(disk_key) if data_version is not None else None
+            try:
+                if lock is False:
+                    # Another worker is rendering this page right now.
+                    cached, lock = disk_cache.wait_for(disk_key, COALESCE_TIMEOUT_SECONDS)
+                    if cached is not None:
+                        body, mimetype, tags = cached
+                        local_cache.set(key, (body, mimetype), tags, generation)
+                        return (body, mimetype), None
+
+                response = make_response(view(*args, **kwargs))
+                tags = g.get('cache_tags')
+                if response.status_code != 200 or not tags or response.direct_passthrough:
+                    return None, response
+                body = response.get_data()
+                if g.get('used_replica'):
+                    local_cache.set(key, (body, response.mimetype), tags, generation, ttl=REPLICA_MAX_LAG_SECONDS)
+                else:
+                    local_cache.set(key, (body, response.mimetype), tags, generation)
+                    if data_version is not None:
+                        disk_cache.set(disk_key, body, response.mimetype, tags)
+                return (body, response.mimetype), response
+            finally:
+                disk_cache.release(lock)
+
+        shared, response = _page_flights.do((state.tenant.slug, disk_key), render, COALESCE_TIMEOUT_SECONDS)
+        if response is not None:
+            return response
+        body, mimetype = shared
+        return app.response_class(body, mimetype=mimetype)
+
+    return wrapper
+
+
+def _cached_reference(name: str, tags, loader):
+    """Return loader() through the per-worker cache, e.g. for lookup lists."""
+    if not _cache_usable():
+        return loader()
+    cache = _state().cache
+    key = ('reference', name)
+    value = cache.get(key)
+    if value is None:
+        generation = cache.generation
+        value = loader()
+        cache.set(key, value, tags, generation)
+    return value
+
+
+# Partials repeated across pages, cached per entity in the per-worker cache
+# with the tags of the rows they show, so a NOTIFY for one race evicts only
+# that race's fragment and the pages listing it are re-assembled from the
+# other fragments. name -> (template, tags for an entity id).
+_FRAGMENTS = {
+    'race_row': ('_race_row.html', lambda race_id: [('races', race_id), ('campaigns', race_id)]),
+    'office_race': ('_office_race.html', lambda race_id: [('races', race_id), ('elections', None)]),
+    'current_officeholders': ('_officeholders.html', lambda office_id: [('offices', office_id), ('campaigns', None)]),
+    'latest_officeholders': ('_officeholders.html', lambda office_id: [('campaigns', None)]),
+}
+
+
+def _fragment(name: str, entity_id, **context) -> Markup:
+    """Render a partial for one entity, reusing a cached rendering.
+
+    Fragments are only stored while a page is being rendered for the page
+    cache, under the cache generation the page started with, so one built
+    from data read before a concurrent write is not kept.
+    """
+    template_name, tags = _FRAGMENTS[name]
+    cache = _state().cache
+    key = ('fragment', name, entity_id, request.script_root)
+    generation = g.get('cache_generation')
+    if generation is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    html = Markup(app.jinja_env.get_template(template_name).render(context))
+    if generation is not None:
+        ttl = REPLICA_MAX_LAG_SECONDS if g.get('used_replica') else None
+        cache.set(key, html, tags(entity_id), generation, ttl=ttl)
+    return html
+
+
+# Optional in-memory copy of the whole dataset (see read_model.py). When it is
+# loaded and current, read-only pages are built from it with no database
+# round trips; otherwise they fall back to SQL.
+READ_MODEL_ENABLED = os.getenv('READ_MODEL_ENABLED', '0') in {'1', 'true', 'True'}
+READ_MODEL_MAX_MB = int(os.getenv('READ_MODEL_MAX_MB', '256'))
+
+# Per-tenant request and connection counts, summed across the workers on a
+# host in METRICS_DIR and shown on the admin page.
+METRICS_DIR = os.getenv('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'cocodems_metrics')
+
+
+class _TenantMetrics:
+    FLUSH_SECONDS = 5.0
+    FIELDS = ('requests', 'server_errors', 'request_seconds', 'db_checkouts', 'db_wait_seconds', 'db_pool_timeouts')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self._flushed_at = time.monotonic()
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                self._counts[name] += value
+            due = time.monotonic() - self._flushed_at >= self.FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self) -> dict:
+        """Add this worker's counts to the shared totals and return them."""
+        with self._lock:
+            counts = self._counts
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+            self._flushed_at = time.monotonic()
+        return _add_to_shared_counts(self.path, counts)
+
+
+class _TenantState:
+    """What each worker keeps separately for one tenant: its caches, the
+    data_versions the change listener last saw, its read model and metrics."""
+
+    def __init__(self, tenant: tenants.Tenant):
+        self.tenant = tenant
+        # The public schema keeps the channel it had before tenants existed.
+        self.channel = _NOTIFY_CHANNEL if tenant.schema == 'public' else f'{_NOTIFY_CHANNEL}_{tenant.slug}'
+        self.cache = _LocalCache(LOCAL_CACHE_MAX_ENTRIES)
+        self.disk_cache = _DiskCache(os.path.join(PAGE_CACHE_DIR, tenant.slug), PAGE_CACHE_MAX_BYTES)
+        # Latest data_versions seen, or None when that table does not exist.
+        self.versions: dict | None = None
+        self.data_versions_table_exists = False
+        self.read_model = ReadModel(
+            lambda: psycopg2.connect(**DATABASE, options=f'-c search_path={tenant.schema}'),
+            READ_MODEL_MAX_MB * 2**20,
+            logger=app.logger,
+        )
+        self.metrics = _TenantMetrics(os.path.join(METRICS_DIR, f'{tenant.slug}.json'))
+
+    @property
+    def data_version(self) -> int | None:
+        """Sum of all per-table versions: changes whenever any table does.
+        Only meaningful while the change listener is connected."""
+        versions = self.versions
+        if versions is None:
+            return None
+        return sum(versions.values())
+
+
+_tenant_states = {tenant.slug: _TenantState(tenant) for tenant in TENANTS}
+_change_listener = _ChangeListener(_tenant_states)
+if READ_MODEL_ENABLED:
+    _change_listener.subscribe(lambda slug, changes: _tenant_states[slug].read_model.notify(changes))
+
+
+def _tenant() -> tenants.Tenant:
+    """The current request's tenant; outside a request, the default (or first) one."""
+    if has_request_context():
+        tenant = request.environ.get(tenants.ENVIRON_KEY)
+        if tenant is not None:
+            return tenant
+    return TENANTS.default or next(iter(TENANTS))
+
+
+def _state() -> _TenantState:
+    return _tenant_states[_tenant().slug]
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None and request.endpoint != 'static':
+        _state().metrics.add(
+            requests=1,
+            server_errors=int(response.status_code >= 500),
+            request_seconds=time.perf_counter() - started,
+        )
+    return response
+
+
+def _tenant_metrics() -> dict:
+    """This tenant's metrics across the host's workers, for the admin page."""
+    totals = _state().metrics.flush()
+    requests = totals.get('requests', 0)
+    checkouts = totals.get('db_checkouts', 0)
+    return dict(
+        totals,
+        mean_request_ms=totals['request_seconds'] * 1000 / requests if requests else None,
+        mean_db_wait_ms=totals['db_wait_seconds'] * 1000 / checkouts if checkouts else None,
+    )
+
+
+def _current_read_model():
+    """The read model snapshot to serve this request from, or None for SQL.
+
+    The model follows data_versions through the change listener, so it is
+    only used while the listener is connected, and not for clients that just
+    wrote (their notification may still be in flight).
+    """
+    if not READ_MODEL_ENABLED or _pinned_to_primary():
+        return None
+    _change_listener.ensure_started()
+    state = _state()
+    versions = state.versions
+    if not _change_listener.connected or versions is None:
+        return None
+    return state.read_model.current(versions)
+
+
+# Live results: browsers on an election page hold a Server-Sent Events stream
+# and get the rows of races whose results change. Under thread-based workers
+# each stream occupies a thread, so only LIVE_RESULTS_MAX_STREAMS streams per
+# worker are accepted (default 2, or 1000 under gevent) and each ends after
+# LIVE_RESULTS_STREAM_SECONDS, after which the browser reconnects.
+LIVE_RESULTS_ENABLED = os.getenv('LIVE_RESULTS_ENABLED', '1') not in {'0', 'false', 'False', ''}
+LIVE_RESULTS_STREAM_SECONDS = float(os.getenv('LIVE_RESULTS_STREAM_SECONDS', '600'))
+LIVE_RESULTS_KEEPALIVE_SECONDS = 15.0
+
+
+def _default_live_streams() -> int:
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    return 1000 if gevent_monkey and gevent_monkey.is_module_patched('socket') else 2
+
+
+class _LiveResults:
+    """Pushes changed race rows to the browsers watching an election.
+
+    Subscribed to the change listener, so the one LISTEN per worker drives
+    every stream. Notifications that touch races or campaigns are handed to
+    a single thread, which re-reads just the changed races of each watched
+    election once, however many browsers watch it, and queues the rows for
+    each of them. A browser that falls QUEUE_SIZE messages behind is
+    disconnected and gets a full snapshot when it reconnects.
+    """
+
+    QUEUE_SIZE = 50
+
+    class _Client:
+        def __init__(self, key):
+            self.key = key
+            self.queue = queue.Queue(maxsize=_LiveResults.QUEUE_SIZE)
+            self.dropped = False
+
+    class _Watch:
+        def __init__(self):
+            self.clients: set = set()
+            # race_id -> latest row, once the first load finishes.
+            self.rows: dict | None = None
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._watches: dict = {}
+        self._streams = 0
+        self._work: queue.Queue = queue.Queue()
+        self._pid = None
+
+    def open(self, slug: str, election_id: int):
+        """Register a stream; returns its client, or None when at max_streams."""
+        self._ensure_thread()
+        key = (slug, election_id)
+        with self._lock:
+            if self._streams >= self.max_streams:
+                return None
+            self._streams += 1
+            client = self._Client(key)
+            watch = self._watches.get(key)
+            if watch is None:
+                watch = self._watches[key] = self._Watch()
+                self._work.put((key, None))
+            watch.clients.add(client)
+            if watch.rows is not None:
+                client.queue.put_nowait(self._message(list(watch.rows.values()), [], complete=True))
+        return client
+
+    def close(self, client) -> None:
+        with self._lock:
+            self._streams -= 1
+            watch = self._watches.get(client.key)
+            if watch is not None:
+                watch.clients.discard(client)
+                if not watch.clients:
+                    del self._watches[client.key]
+
+    def notify(self, slug: str, changes) -> None:
+        """Change listener callback: queue a reload of the races changes touched."""
+        with self._lock:
+            keys = [key for key in self._watches if key[0] == slug]
+        if not keys:
+            return
+        race_ids: set | None = set()
+        for table, ids in changes if changes is not None else [(None, None)]:
+            if table not in {None, 'races', 'campaigns', 'elections'}:
+                continue
+            if ids is None or table == 'elections':
+                race_ids = None
+                break
+            race_ids.update(ids)
+        if race_ids is None or race_ids:
+            for key in keys:
+                self._work.put((key, race_ids))
+
+    def _ensure_thread(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name='live-results', daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._run_once()
+            except Exception:
+                app.logger.exception('Live results update failed')
+
+    def _run_once(self) -> None:
+        key, race_ids = self._work.get()
+        pending = {key: race_ids}
+        # Coalesce whatever else queued up meanwhile; None means all races.
+        while True:
+            try:
+                key, race_ids = self._work.get_nowait()
+            except queue.Empty:
+                break
+            prev = pending.get(key, set())
+            pending[key] = None if prev is None or race_ids is None else prev | race_ids
+        for key, race_ids in pending.items():
+            try:
+                self._reload(key, race_ids)
+            except Exception:
+                app.logger.exception('Live results reload failed for %s', key)
+
+    def _reload(self, key, race_ids) -> None:
+        with self._lock:
+            if key not in self._watches:
+                return
+        slug, election_id = key
+        ids = sorted(race_ids) if race_ids is not None else None
+        # The primary, since the notification can arrive before a replica
+        # has replayed the write.
+        conn = _pool_checkout(_primary_pool, TENANTS.get(slug))
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(queries.LIVE_RACES, (election_id, ids, ids))
+                races = cursor.fetchall()
+        finally:
+            conn.close()
+        rows = {
+            race['race_id']: dict(race, winners=[[w['contact_id'], w['candidate_name']] for w in race['winners']])
+            for race in races
+        }
+
+        with self._lock:
+            watch = self._watches.get(key)
+            if watch is None:
+                return
+            if ids is None:
+                removed = [i for i in (watch.rows or {}) if i not in rows]
+                watch.rows = rows
+            else:
+                removed = [i for i in ids if i not in rows and i in (watch.rows or {})]
+                watch.rows = {i: row for i, row in (watch.rows or {}).items() if i not in removed}
+                watch.rows.update(rows)
+            message = self._message(list(rows.values()), removed, complete=ids is None)
+            for client in list(watch.clients):
+                try:
+                    client.queue.put_nowait(message)
+                except queue.Full:
+                    client.dropped = True
+
+    @staticmethod
+    def _message(rows, removed, complete: bool) -> str:
+        return json.dumps({'rows': rows, 'removed': removed, 'complete': complete}, separators=(',', ':'), default=str)
+
+
+_live_results = _LiveResults(int(os.getenv('LIVE_RESULTS_MAX_STREAMS') or _default_live_streams()))
+if LIVE_RESULTS_ENABLED:
+    _change_listener.subscribe(_live_results.notify)
+
+
+# List pages send every row and sort and filter them in the browser, from a
+# JSON payload fetched once per dataset (static/list_table.js). Above
+# CLIENT_SORT_MAX_ROWS rows a page is instead split into LIST_PAGE_SIZE-row
+# pages sorted by the server. LIST_JSON_MAX_AGE is how long browsers and CDNs
+# may reuse a payload without revalidating it (0: always revalidate, which is
+# answered with a 304 while the data is unchanged).
+CLIENT_SORT_MAX_ROWS = int(os.getenv('CLIENT_SORT_MAX_ROWS', '5000'))
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '500'))
+LIST_JSON_MAX_AGE = int(os.getenv('LIST_JSON_MAX_AGE', '0'))
+
+
+def _list_page(rows):
+    """Return (rows to render, pagination), where pagination is None when
+    every row is rendered and sorted in the browser."""
+    if len(rows) <= CLIENT_SORT_MAX_ROWS:
+        return rows, None
+    pages = -(-len(rows) // LIST_PAGE_SIZE)
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    start = (page - 1) * LIST_PAGE_SIZE
+    return rows[start:start + LIST_PAGE_SIZE], {'page': page, 'pages': pages}
+
+
+def _list_payload(columns: list, rows):
+    """Rows as {"columns": [...], "rows": [[...], ...]}, without repeating keys per row."""
+    body = json.dumps(
+        {'columns': columns, 'rows': [[row[c] for c in columns] for row in rows]},
+        separators=(',', ':'),
+        default=str,
+    )
+    return app.response_class(body, mimetype='application/json')
+
+
+def _cacheable_json(view):
+    """Let browsers and CDNs cache a payload, revalidating it by ETag."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.cache_control.public = True
+            if LIST_JSON_MAX_AGE > 0:
+                response.cache_control.max_age = LIST_JSON_MAX_AGE
+            else:
+                response.cache_control.no_cache = True
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+
+    return wrapper
+
+
 def _admin_token_is_valid(req) -> bool:
-    expected = os.getenv('ADMIN_TOKEN')
+    expected = os.getenv(_tenant().admin_token_env)
     if not expected:
         return False
 
@@ -63,6 +1482,8 @@ def _pg_env() -> dict:
 
 
 def _preferred_bin(explicit_env_var: str, default_name: str, brew_opt_path: str) -> str:
+    import shutil
+
     override = (os.getenv(explicit_env_var) or '').strip()
     if override:
         return override
@@ -76,94 +1497,131 @@ def _preferred_bin(explicit_env_var: str, default_name: str, brew_opt_path: str)
 
 
 _BACKUP_TABLES = [
-    'public.campaigns',
-    'public.elections',
-    'public.individuals',
-    'public.jurisdictions',
-    'public.office_names',
-    'public.offices',
-    'public.races',
+    'campaigns',
+    'elections',
+    'individuals',
+    'jurisdictions',
+    'office_names',
+    'offices',
+    'races',
 ]
 
 
+def _backup_tables() -> list:
+    """_BACKUP_TABLES qualified with the current tenant's schema."""
+    schema = _tenant().schema
+    return [f'{schema}.{t}' for t in _BACKUP_TABLES]
+
+
+def _all_tables_changed() -> list:
+    return [(t, None) for t in _BACKUP_TABLES]
+
+
+def _dump_schemas(path: str) -> set:
+    """Schemas a pg_dump file creates tables in."""
+    schemas = set()
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = re.match(r'CREATE TABLE (?:IF NOT EXISTS )?"?(\w+)"?\.', line)
+            if match:
+                schemas.add(match.group(1))
+    return schemas
+
+
 @app.route('/admin')
 def admin():
     """Render the admin page."""
     return render_template('admin.html')
 
 
+# Rows per UPDATE (and per commit) in enhance_individuals.
+_ENHANCE_BATCH_SIZE = 5000
+
+
 @app.route('/enhance_individuals', methods=['POST'])
 def enhance_individuals():
+    """Fill in empty cities from each individual's most recent campaign jurisdiction.
+
+    One query finds the latest jurisdiction of every individual without a
+    city, the cities are inferred in Python once per distinct jurisdiction,
+    and they are written _ENHANCE_BATCH_SIZE rows per UPDATE, each batch
+    committed on its own so a large run never holds one long transaction.
+    """
     if not _admin_token_is_valid(request):
         return "Forbidden", 403
 
+    started = time.perf_counter()
     conn = get_db_connection()
     updated = 0
     skipped_no_campaign = 0
     skipped_infer_failed = 0
 
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with conn.cursor() as cursor:
             cursor.execute(
                 """
-                SELECT contact_id
-                FROM individuals
-                WHERE city IS NULL OR city = '';
+                SELECT DISTINCT ON (i.contact_id) i.contact_id, c.jurisdiction
+                FROM individuals i
+                LEFT JOIN campaigns c ON c.contact_id = i.contact_id
+                WHERE i.city IS NULL OR i.city = ''
+                ORDER BY i.contact_id, c.election_date DESC NULLS LAST;
                 """
             )
-            individuals = cursor.fetchall()
-
-            for ind in individuals:
-                contact_id = ind['contact_id']
-                cursor.execute(
-                    """
-                    SELECT jurisdiction
-                    FROM campaigns
-                    WHERE contact_id = %s
-                    ORDER BY election_date DESC NULLS LAST
-                    LIMIT 1;
-                    """,
-                    (contact_id,),
-                )
-                crow = cursor.fetchone()
-                if not crow:
-                    skipped_no_campaign += 1
-                    continue
-
-                jurisdiction = (crow.get('jurisdiction') or '').strip()
-                if not jurisdiction:
-                    skipped_no_campaign += 1
-                    continue
-
-                inferred = _infer_city_from_jurisdiction(jurisdiction)
-                city = inferred or jurisdiction
-                if not city:
-                    skipped_infer_failed += 1
-                    continue
-
-                cursor.execute(
+            latest = cursor.fetchall()
+        conn.commit()
+        fetched = time.perf_counter()
+
+        cities: dict[str, str | None] = {}
+        pending: list[tuple[int, str]] = []
+        for contact_id, jurisdiction in latest:
+            jurisdiction = (jurisdiction or '').strip()
+            if not jurisdiction:
+                skipped_no_campaign += 1
+                continue
+            if jurisdiction not in cities:
+                cities[jurisdiction] = _infer_city_from_jurisdiction(jurisdiction) or jurisdiction
+            city = cities[jurisdiction]
+            if not city:
+                skipped_infer_failed += 1
+                continue
+            pending.append((contact_id, city))
+        inferred = time.perf_counter()
+
+        for i in range(0, len(pending), _ENHANCE_BATCH_SIZE):
+            with conn.cursor() as cursor:
+                # Still empty: the city may have been filled in since the SELECT.
+                rows = execute_values(
+                    cursor,
                     """
-                    UPDATE individuals
-                    SET city = %s
-                    WHERE contact_id = %s;
+                    UPDATE individuals i
+                    SET city = v.city
+                    FROM (VALUES %s) AS v (contact_id, city)
+                    WHERE i.contact_id = v.contact_id AND (i.city IS NULL OR i.city = '')
+                    RETURNING i.contact_id;
                     """,
-                    (city, contact_id),
+                    pending[i:i + _ENHANCE_BATCH_SIZE],
+                    page_size=_ENHANCE_BATCH_SIZE,
+                    fetch=True,
                 )
-                if cursor.rowcount:
-                    updated += 1
-
-        conn.commit()
+                updated_ids = [row[0] for row in rows]
+                _notify_change(cursor, [('individuals', updated_ids)])
+            conn.commit()
+            _mark_primary_write()
+            updated += len(updated_ids)
     except Exception as e:
         conn.rollback()
         conn.close()
-        return f"Error enhancing individuals: {e}", 500
+        return f"Error enhancing individuals after updating {updated}: {e}", 500
 
     conn.close()
+    finished = time.perf_counter()
 
     message = (
         f"Enhance individuals complete. Updated: {updated}. "
         f"Skipped (no campaign/jurisdiction): {skipped_no_campaign}. "
-        f"Skipped (could not infer): {skipped_infer_failed}."
+        f"Skipped (could not infer): {skipped_infer_failed}. "
+        f"Took {finished - started:.2f}s (query {fetched - started:.2f}s, "
+        f"infer {inferred - fetched:.2f}s, update {finished - inferred:.2f}s)."
     )
     return render_template('admin.html', message=message)
 
@@ -171,6 +1629,8 @@ def enhance_individuals():
 @app.route('/admin/backup', methods=['POST'])
 def admin_backup():
     """Create a SQL backup and return it as a download."""
+    import subprocess
+
     if not _admin_token_is_valid(request):
         return "Forbidden", 403
 
@@ -191,11 +1651,13 @@ def admin_backup():
             '--if-exists',
             '-f', backup_path,
         ]
-        for t in _BACKUP_TABLES:
+        for t in _backup_tables():
             cmd.extend(['--table', t])
         subprocess.run(cmd, check=True, env=_pg_env(), capture_output=True, text=True)
 
         download_name = f"{DATABASE.get('dbname') or 'database'}_backup.sql"
+        if len(TENANTS) > 1:
+            download_name = f"{DATABASE.get('dbname') or 'database'}_{_tenant().slug}_backup.sql"
         return send_file(backup_path, as_attachment=True, download_name=download_name)
     except subprocess.CalledProcessError as e:
         try:
@@ -215,6 +1677,8 @@ def admin_backup():
 @app.route('/admin/reload', methods=['POST'])
 def admin_reload():
     """Reload the database from an uploaded SQL dump (destructive)."""
+    import subprocess
+
     if not _admin_token_is_valid(request):
         return "Forbidden", 403
 
@@ -226,12 +1690,24 @@ def admin_reload():
         restore_path = tf.name
         backup_file.save(restore_path)
 
+    # A dump names the schema it was taken from; restoring another tenant's
+    # would overwrite that tenant's tables.
+    other_schemas = _dump_schemas(restore_path) - {_tenant().schema}
+    if other_schemas:
+        os.unlink(restore_path)
+        return render_template(
+            'admin.html',
+            error=f"This backup is for schema {', '.join(sorted(other_schemas))}, not {_tenant().schema}.",
+        ), 400
+
     conn = get_db_connection()
     try:
         with conn.cursor() as cursor:
-            for t in _BACKUP_TABLES:
+            for t in _backup_tables():
                 cursor.execute(f'DROP TABLE IF EXISTS {t} CASCADE;')
+            _notify_change(cursor, _all_tables_changed())
         conn.commit()
+        _mark_primary_write()
     except Exception as e:
         conn.rollback()
         conn.close()
@@ -273,6 +1749,36 @@ def admin_reload():
     except Exception:
         pass
 
+    # Pages rendered while psql was still restoring may have been cached.
+    # The dump may also predate the contact_id sequence, or hold ids past it,
+    # and dropping the tables dropped the race_summary triggers.
+    conn = None
+    try:
+        restore_sql = []
+        for path in (_CONTACT_ID_SEQUENCE_SQL, _RACE_SUMMARY_SQL):
+            with open(path, encoding='utf-8') as f:
+                restore_sql.append(f.read())
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            for sql in restore_sql:
+                cursor.execute(sql)
+            _notify_change(cursor, _all_tables_changed())
+        conn.commit()
+        _mark_primary_write()
+    except Exception as e:
+        app.logger.exception('Post-restore migrations failed')
+        if conn is not None:
+            conn.rollback()
+        return render_template(
+            'admin.html',
+            error=f"The backup was restored, but re-running "
+                  f"{', '.join(os.path.basename(p) for p in (_CONTACT_ID_SEQUENCE_SQL, _RACE_SUMMARY_SQL))} "
+                  f"on it failed: {e}",
+        ), 500
+    finally:
+        if conn is not None:
+            conn.close()
+
     return render_template('admin.html', message='Database reload complete.')
 
 
@@ -306,8 +1812,33 @@ def _infer_city_from_jurisdiction(jurisdiction: str | None) -> str | None:
     return None
 
 
+# New individuals are numbered by the contact_id sequence that
+# migrations/002_contact_id_sequence.sql creates.
+_CONTACT_ID_SEQUENCE_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', '002_contact_id_sequence.sql')
+_NO_CONTACT_ID_DEFAULT = "individuals.contact_id has no default; run python migrate_database.py"
+
+# race_summary and the triggers that keep it current, recreated after a restore.
+_RACE_SUMMARY_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations', '004_race_summary.sql')
+
+
+def _name_key(first_name: str | None, middle_name: str | None, last_name: str | None) -> tuple[str, str, str]:
+    """Key that matches the same person's name across case, spacing and periods."""
+    def normalize(part):
+        return ' '.join((part or '').replace('.', ' ').split()).casefold()
+
+    return normalize(first_name), normalize(middle_name), normalize(last_name)
+
+
 @app.route('/admin/clean_candidates', methods=['POST'])
 def admin_clean_candidates():
+    """Fill in the Contact ID column of a candidates CSV and return it.
+
+    Rows without a Contact ID are matched by name against the existing
+    individuals, then against each other; everyone left over is inserted with
+    one multi-row INSERT. Re-running a file therefore creates nobody twice.
+    """
+    import csv
+
     if not _admin_token_is_valid(request):
         return "Forbidden", 403
 
@@ -315,13 +1846,7 @@ def admin_clean_candidates():
     if not candidates_file:
         return render_template('admin.html', error='Candidates CSV file is required.'), 400
 
-    raw = candidates_file.read()
-    try:
-        text = raw.decode('utf-8-sig')
-    except Exception:
-        text = raw.decode('utf-8', errors='replace')
-
-    reader = csv.DictReader(io.StringIO(text))
+    reader = _csv_upload(candidates_file)
     if not reader.fieldnames:
         return render_template('admin.html', error='Candidates CSV appears to have no header.'), 400
 
@@ -333,105 +1858,121 @@ def admin_clean_candidates():
         return render_template('admin.html', error=f"Candidates CSV missing required columns: {', '.join(missing)}"), 400
 
     field_map = {f.strip(): f for f in reader.fieldnames}
+    contact_id_key = field_map['Contact ID']
+    first_key = field_map['First Name']
+    middle_key = field_map['Middle Name']
+    last_key = field_map['Last Name']
+    jurisdiction_key = field_map['Jurisdiction']
+
+    # The rows wait in a temporary file as JSON lines, and are written out
+    # again with their ids filled in once any new individuals have them, so
+    # only the name maps are held in memory, however long the file.
+    spill = tempfile.TemporaryFile(prefix='cocodems_candidates_')
+    # name key -> contact_id, of existing and of newly inserted individuals
+    known: dict[tuple[str, str, str], int] = {}
+    new_people: dict[tuple[str, str, str], tuple] = {}
+
+    def name_key(row):
+        """The row's name key if its Contact ID needs filling in, else None."""
+        if (row.get(contact_id_key) or '').strip():
+            return None
+        first_name = (row.get(first_key) or '').strip() or None
+        last_name = (row.get(last_key) or '').strip() or None
+        if not first_name or not last_name:
+            return None
+        return _name_key(first_name, (row.get(middle_key) or '').strip(), last_name)
 
     conn = get_db_connection()
-    inserted_cache: dict[tuple[str, str, str], int] = {}
-    out_rows: list[dict] = []
-
     try:
         with conn.cursor() as cursor:
+            cursor.execute("SELECT contact_id, first_name, middle_name, last_name FROM individuals ORDER BY contact_id;")
+            for contact_id, first_name, middle_name, last_name in cursor:
+                # The oldest of any duplicates already in the table.
+                known.setdefault(_name_key(first_name, middle_name, last_name), contact_id)
+
             for row in reader:
                 if row is None:
                     continue
+                spill.write(json.dumps(row).encode() + b'\n')
 
-                contact_id_key = field_map['Contact ID']
-                first_key = field_map['First Name']
-                middle_key = field_map['Middle Name']
-                last_key = field_map['Last Name']
-                jurisdiction_key = field_map['Jurisdiction']
-
-                existing_contact = (row.get(contact_id_key) or '').strip()
-                if existing_contact:
-                    out_rows.append(row)
+                key = name_key(row)
+                if key is None or key in known or key in new_people:
                     continue
 
-                first_name = (row.get(first_key) or '').strip() or None
+                first_name = (row.get(first_key) or '').strip()
                 middle_name = (row.get(middle_key) or '').strip()
-                last_name = (row.get(last_key) or '').strip() or None
-
-                if not first_name or not last_name:
-                    out_rows.append(row)
-                    continue
-
-                cache_key = (
-                    first_name.lower(),
-                    middle_name.lower(),
-                    last_name.lower(),
-                )
-
-                if cache_key in inserted_cache:
-                    row[contact_id_key] = str(inserted_cache[cache_key])
-                    out_rows.append(row)
-                    continue
-
+                last_name = (row.get(last_key) or '').strip()
                 middle_part = f" {middle_name}" if middle_name else ""
                 full_name = f"{last_name}, {first_name}{middle_part}".strip()
-
                 jurisdiction = (row.get(jurisdiction_key) or '').strip() or None
                 city = _infer_city_from_jurisdiction(jurisdiction) or (jurisdiction or '')
+                new_people[key] = (
+                    first_name, middle_name, last_name, full_name,
+                    '', '', '', city, 'WI', '', '', '', '', '', '',
+                )
 
-                cursor.execute(
+            inserted_ids = []
+            if new_people:
+                inserted = execute_values(
+                    cursor,
                     """
                     INSERT INTO individuals (
                         first_name, middle_name, last_name, full_name,
                         email, phone, address, city, state, zip,
                         candidate_status, party_affiliation, democratic_alignment, area, notes
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING contact_id;
+                    VALUES %s
+                    RETURNING contact_id, first_name, middle_name, last_name;
                     """,
-                    (
-                        first_name,
-                        middle_name,
-                        last_name,
-                        full_name,
-                        '',
-                        '',
-                        '',
-                        city,
-                        'WI',
-                        '',
-                        '',
-                        '',
-                        '',
-                        '',
-                        '',
-                    ),
+                    list(new_people.values()),
+                    page_size=len(new_people),
+                    fetch=True,
                 )
-                new_contact_id = cursor.fetchone()[0]
-                inserted_cache[cache_key] = int(new_contact_id)
-                row[contact_id_key] = str(new_contact_id)
-                out_rows.append(row)
+                # RETURNING order is not guaranteed to follow VALUES, so map
+                # the ids back by name.
+                for contact_id, first_name, middle_name, last_name in inserted:
+                    if contact_id is None:
+                        raise ValueError(_NO_CONTACT_ID_DEFAULT)
+                    inserted_ids.append(contact_id)
+                    known[_name_key(first_name, middle_name, last_name)] = contact_id
+                new_people.clear()
+
+            _notify_change(cursor, [('individuals', inserted_ids)])
 
         conn.commit()
+        _mark_primary_write()
     except Exception as e:
         conn.rollback()
         conn.close()
+        spill.close()
         return f"Error cleaning candidates: {e}", 500
 
     conn.close()
 
-    out_buf = io.StringIO(newline='')
-    writer = csv.DictWriter(out_buf, fieldnames=reader.fieldnames)
-    writer.writeheader()
-    writer.writerows(out_rows)
-    out_bytes = out_buf.getvalue().encode('utf-8')
-
-    return send_file(
-        io.BytesIO(out_bytes),
-        as_attachment=True,
-        download_name='candidates_cleaned.csv',
+    def generate():
+        try:
+            spill.seek(0)
+            out_buf = io.StringIO(newline='')
+            writer = csv.DictWriter(out_buf, fieldnames=reader.fieldnames)
+            writer.writeheader()
+            for i, line in enumerate(spill, 1):
+                row = json.loads(line)
+                key = name_key(row)
+                if key is not None:
+                    row[contact_id_key] = str(known[key])
+                writer.writerow(row)
+                if i % 1000 == 0:
+                    yield out_buf.getvalue().encode('utf-8')
+                    out_buf.seek(0)
+                    out_buf.truncate()
+            yield out_buf.getvalue().encode('utf-8')
+        finally:
+            spill.close()
+
+    return app.response_class(
+        generate(),
         mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=candidates_cleaned.csv'},
     )
 
 @app.route('/')
@@ -439,34 +1980,44 @@ def index():
     """Redirect root URL to elections page."""
     return redirect(url_for('elections'))
 
-@app.route('/elections')
-def elections():
-    """Render the elections page."""
-    sort_column = request.args.get('sort', 'election_name')
-    sort_order = request.args.get('order', 'asc')
-    
-    if sort_column not in ['election_name', 'election_date']:
-        sort_column = 'election_name'
-    if sort_order not in ['asc', 'desc']:
-        sort_order = 'asc'
-
-    conn = get_db_connection()
+def _elections_rows(sort_column: str, sort_order: str) -> list:
+    model = _current_read_model()
+    if model is not None:
+        return model.elections_list(sort_column, sort_order)
+    conn = get_db_connection(readonly=True)
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(f"""
-            SELECT election_id, election_name, TO_CHAR(election_date, 'MM/DD/YYYY') as election_date
-            FROM elections
-            ORDER BY {sort_column} {sort_order};
-        """)
+        cursor.execute(queries.ELECTIONS.format(sort_column=sort_column, sort_order=sort_order))
         elections_data = cursor.fetchall()
     conn.close()
+    return elections_data
 
+@app.route('/elections')
+@_cached_page
+def elections():
+    """Render the elections page."""
+    sort_column, sort_order = queries.validated_sort(
+        request.args.get('sort'), request.args.get('order'), queries.ELECTION_SORT_COLUMNS, 'election_name'
+    )
+    elections_data, pagination = _list_page(_elections_rows(sort_column, sort_order))
+
+    _cache_depends_on(('elections', None))
     return render_template(
         'elections.html',
         elections=elections_data,
         sort_column=sort_column,
-        sort_order=sort_order
+        sort_order=sort_order,
+        pagination=pagination,
+        data_url=url_for('elections_json') if pagination is None else None,
     )
 
+@app.route('/elections.json')
+@_cacheable_json
+@_cached_page
+def elections_json():
+    """The elections list as a compact JSON payload, sorted in the browser."""
+    _cache_depends_on(('elections', None))
+    return _list_payload(['election_id', 'election_name', 'election_date'], _elections_rows('election_name', 'asc'))
+
 @app.route('/election/add', methods=['GET', 'POST'])
 def add_election():
     """Render and handle the add election form."""
@@ -494,7 +2045,9 @@ def add_election():
                     """,
                     (election_id, election_name, election_date),
                 )
+                _notify_change(cursor, [('elections', [election_id])])
             conn.commit()
+            _mark_primary_write()
         except Exception as e:
             conn.rollback()
             conn.close()
@@ -513,49 +2066,298 @@ def add_election():
 
     return render_template('add_election.html')
 
-@app.route('/election_races/<int:election_id>')
-def election_races(election_id):
-    """Render the election detail page for specific election races."""
-    sort_column = request.args.get('sort', 'race_name')
-    sort_order = request.args.get('order', 'asc')
-    
-    if sort_column not in ['race_name', 'seats', 'total_votes', 'term_years']:
-        sort_column = 'race_name'
-    if sort_order not in ['asc', 'desc']:
-        sort_order = 'asc'
-
-    conn = get_db_connection()
+def _election_races_rows(election_id: int, sort_column: str, sort_order: str):
+    model = _current_read_model()
+    if model is not None:
+        return model.election_races(election_id, sort_column, sort_order)
+    conn = get_db_connection(readonly=True)
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute("""
-            SELECT election_name, TO_CHAR(election_date, 'MM/DD/YYYY') as election_date
-            FROM elections
-            WHERE election_id = %s;
-        """, (election_id,))
+        cursor.execute(queries.ELECTION, (election_id,))
         election = cursor.fetchone()
 
-        cursor.execute(f"""
-            SELECT race_id, race_name, seats, total_votes, term_years
-            FROM races
-            WHERE election_id = %s
-            ORDER BY {sort_column} {sort_order};
-        """, (election_id,))
+        cursor.execute(
+            queries.ELECTION_RACES.format(sort_column=sort_column, sort_order=sort_order), (election_id,)
+        )
         races = cursor.fetchall()
 
-        for race in races:
-            cursor.execute("""
-                SELECT candidate_name, contact_id
-                FROM campaigns
-                WHERE race_id = %s AND elected = 1;
-            """, (race['race_id'],))
-            winners = cursor.fetchall()
-            race['winners'] = winners
-
     conn.close()
+    return election, races
+
+def _election_races_depend_on(election_id: int, races) -> None:
+    _cache_depends_on(('elections', election_id))
+    for race in races:
+        _cache_depends_on(('races', race['race_id']), ('campaigns', race['race_id']))
 
+@app.route('/election_races/<int:election_id>')
+@_cached_page
+def election_races(election_id):
+    """Render the election detail page for specific election races."""
+    sort_column, sort_order = queries.validated_sort(
+        request.args.get('sort'), request.args.get('order'), queries.RACE_SORT_COLUMNS, 'race_name'
+    )
+    election, races = _election_races_rows(election_id, sort_column, sort_order)
     if not election:
         return "Election not found", 404
 
-    return render_template('election_races.html', election=election, races=races, election_id=election_id, sort_column=sort_column, sort_order=sort_order)
+    _election_races_depend_on(election_id, races)
+    races, pagination = _list_page(races)
+    return render_template(
+        'election_races.html',
+        election=election,
+        races=races,
+        election_id=election_id,
+        sort_column=sort_column,
+        sort_order=sort_order,
+        pagination=pagination,
+        data_url=url_for('election_races_json', election_id=election_id) if pagination is None else None,
+        live_url=url_for('election_races_events', election_id=election_id) if LIVE_RESULTS_ENABLED and pagination is None else None,
+    )
+
+@app.route('/election_races/<int:election_id>.json')
+@_cacheable_json
+@_cached_page
+def election_races_json(election_id):
+    """An election's races as a compact JSON payload; winners are [contact_id, name] pairs."""
+    election, races = _election_races_rows(election_id, 'race_name', 'asc')
+    if not election:
+        return "Election not found", 404
+
+    _election_races_depend_on(election_id, races)
+    rows = [
+        dict(race, winners=[[w['contact_id'], w['candidate_name']] for w in race['winners']])
+        for race in races
+    ]
+    return _list_payload(['race_id', 'race_name', 'seats', 'total_votes', 'term_years', 'winners'], rows)
+
+
+@app.route('/election_races/<int:election_id>/events')
+def election_races_events(election_id):
+    """Server-Sent Events stream of an election's changed race rows.
+
+    Each event is {"rows": [...], "removed": [race_id, ...], "complete": bool},
+    with rows shaped like /election_races/<id>.json; the first is a complete
+    snapshot.
+    """
+    if not LIVE_RESULTS_ENABLED:
+        return "Live results are disabled", 404
+    _change_listener.ensure_started()
+    client = _live_results.open(_tenant().slug, election_id)
+    if client is None:
+        return "Too many live connections; reload the page for new results.", 503
+
+    def stream():
+        try:
+            # Reconnect soon after the stream ends.
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + LIVE_RESULTS_STREAM_SECONDS
+            while not client.dropped and time.monotonic() < deadline:
+                try:
+                    message = client.queue.get(timeout=LIVE_RESULTS_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Also how a closed connection is noticed.
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: races\ndata: {message}\n\n'
+        finally:
+            _live_results.close(client)
+
+    return app.response_class(
+        stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+# Uploads: request bodies over UPLOAD_MAX_MB are refused with a 413 before
+# they are read (Werkzeug spools larger file fields to a temporary file rather
+# than memory). CSV uploads are decoded as they are parsed, and a races upload
+# keeps at most UPLOAD_SPILL_ROWS rows in memory while grouping them by race;
+# the rest wait in a temporary file. The races are then built, compared and
+# written UPLOAD_CHUNK_RACES at a time, so the whole file is never in memory.
+UPLOAD_MAX_MB = float(os.getenv('UPLOAD_MAX_MB', '512'))
+UPLOAD_SPILL_ROWS = int(os.getenv('UPLOAD_SPILL_ROWS', '20000'))
+# Races compared and written per round (and per transaction in the background).
+UPLOAD_CHUNK_RACES = max(1, int(os.getenv('UPLOAD_CHUNK_RACES', '100')))
+app.config['MAX_CONTENT_LENGTH'] = int(UPLOAD_MAX_MB * 1024 * 1024) if UPLOAD_MAX_MB > 0 else None
+
+
+@app.errorhandler(413)
+def _upload_too_large(e):
+    return f"Upload is larger than the {UPLOAD_MAX_MB:g} MB limit (UPLOAD_MAX_MB)", 413
+
+
+def _csv_upload(file_storage):
+    """A csv.DictReader over an uploaded file, decoding it as rows are read.
+
+    A UTF-8 byte order mark is skipped and bytes that are not UTF-8 are
+    replaced, so a stray Latin-1 name does not reject the whole file.
+    """
+    import csv
+
+    return csv.DictReader(io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', errors='replace', newline=''))
+
+
+class _RowGroups:
+    """CSV rows grouped by a key, in the order keys are first seen.
+
+    The first max_rows rows are held in memory; later ones are appended to a
+    temporary file as JSON lines and only their offsets are kept, so a large
+    upload costs disk rather than memory. Call close() when done.
+    """
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        # key -> rows, or offsets into the spill file for rows past max_rows
+        self._groups: dict[str, list] = {}
+        self._held = 0
+        self._spill = None
+        self._spill_size = 0
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def add(self, key: str, row: dict) -> None:
+        entries = self._groups.setdefault(key, [])
+        if self._held < self.max_rows:
+            entries.append(row)
+            self._held += 1
+            return
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix='cocodems_upload_')
+        line = json.dumps(row).encode() + b'\n'
+        self._spill.seek(self._spill_size)
+        self._spill.write(line)
+        entries.append(self._spill_size)
+        self._spill_size += len(line)
+
+    def keys(self):
+        return list(self._groups)
+
+    def _read(self, entry):
+        if isinstance(entry, int):
+            self._spill.seek(entry)
+            entry = json.loads(self._spill.readline())
+        return entry
+
+    def first(self, key: str) -> dict:
+        return self._read(self._groups[key][0])
+
+    def pop(self, key: str) -> list[dict]:
+        """The rows of a group, which is then forgotten (freeing its held rows)."""
+        entries = self._groups.pop(key)
+        self._held -= sum(1 for entry in entries if not isinstance(entry, int))
+        return [self._read(entry) for entry in entries]
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+_ELECTED_VALUES = {'1', 'true', 'True', 'YES', 'Yes'}
+_NOT_ELECTED_VALUES = {'', '0', 'false', 'False', 'NO', 'No'}
+
+
+def _parse_elected(val: str | None) -> int:
+    s = (val or '').strip()
+    if s in _ELECTED_VALUES:
+        return 1
+    if s in _NOT_ELECTED_VALUES:
+        return 0
+    raise ValueError(f"Invalid Elected value: {s}")
+
+
+class _RaceUploadCheck:
+    """Checks every row of a races upload before anything is written.
+
+    check() type-checks a row's values as it is read, parsing each distinct
+    value of a column once (values such as dates and term lengths repeat down
+    the whole file). Names and Contact IDs are noted with the first line using
+    them and cross-referenced in one go by check_references() once a
+    connection is open. report() lists every problem found.
+    """
+
+    # Problems listed in the report; the rest are counted.
+    MAX_LISTED = 200
+
+    def __init__(self, field_map: dict):
+        self.field_map = field_map
+        self.problems: list[tuple[int, str, str]] = []
+        # name or id -> first line using it
+        self.jurisdictions: dict[str, int] = {}
+        self.offices: dict[str, int] = {}
+        self.contact_ids: dict[int, int] = {}
+        # (column, parser, problem with the value)
+        self._columns = [
+            (column, _parse_int_field, "is not a number")
+            for column in ('Votes Received', 'Total Votes', 'Term (years)')
+        ]
+        self._columns.append(('Percent Received', _parse_float_field, "is not a number"))
+        self._columns += [
+            (column, _parse_date_mdy, "is not a date (MM/DD/YYYY or MM/DD/YY)")
+            for column in ('Election Date', 'Office Start Date', 'Re-Election Date', 'Term End Date')
+        ]
+        self._columns.append(('Elected', _parse_elected, "is not 1 or 0"))
+        # column -> raw values that parsed
+        self._valid: dict[str, set] = {column: set() for column, _, _ in self._columns}
+
+    def _value(self, row: dict, column: str) -> str:
+        return (row.get(self.field_map[column]) or '').strip()
+
+    def check(self, line: int, row: dict) -> None:
+        for column, parse, problem in self._columns:
+            raw = row.get(self.field_map[column])
+            valid = self._valid[column]
+            if raw in valid:
+                continue
+            value = (raw or '').strip()
+            try:
+                parse(value)
+            except (ValueError, OverflowError):
+                self.problems.append((line, column, f"{value!r} {problem}"))
+            else:
+                valid.add(raw)
+
+        jurisdiction = self._value(row, 'Jurisdiction')
+        if jurisdiction:
+            self.jurisdictions.setdefault(jurisdiction, line)
+        office_name = self._value(row, 'Office')
+        if office_name:
+            self.offices.setdefault(office_name, line)
+        raw = self._value(row, 'Contact ID')
+        if raw:
+            try:
+                self.contact_ids.setdefault(int(raw), line)
+            except ValueError:
+                self.problems.append(
+                    (line, 'Contact ID', f"{raw!r} is not a contact_id; fill it in with Clean candidates first")
+                )
+
+    def check_references(self, cursor, jurisdiction_ids: dict, office_name_ids: dict) -> None:
+        """Report names not in jurisdiction_ids / office_name_ids and
+        Contact IDs with no individual, at the first line using each."""
+        for name, line in self.jurisdictions.items():
+            if name not in jurisdiction_ids:
+                self.problems.append((line, 'Jurisdiction', f"{name!r} is not a known jurisdiction"))
+        for name, line in self.offices.items():
+            if name not in office_name_ids:
+                self.problems.append((line, 'Office', f"{name!r} is not in the offices table"))
+        if self.contact_ids:
+            cursor.execute(
+                "SELECT contact_id FROM individuals WHERE contact_id = ANY(%s);", (list(self.contact_ids),)
+            )
+            known = {int(row['contact_id']) for row in cursor.fetchall()}
+            for contact_id, line in self.contact_ids.items():
+                if contact_id not in known:
+                    self.problems.append((line, 'Contact ID', f"{contact_id} is not an individual"))
+
+    def report(self) -> str:
+        problems = sorted(self.problems)
+        lines = [f"Races CSV has {len(problems)} problem{'s' if len(problems) != 1 else ''}; nothing was uploaded."]
+        lines += [f"line {line}, {column}: {problem}" for line, column, problem in problems[:self.MAX_LISTED]]
+        if len(problems) > self.MAX_LISTED:
+            lines.append(f"... and {len(problems) - self.MAX_LISTED} more")
+        return '\n'.join(lines) + '\n'
 
 
 @app.route('/election_races/<int:election_id>/upload_races', methods=['POST'])
@@ -567,13 +2369,7 @@ def upload_election_races(election_id):
     if not races_file:
         return "Races CSV file is required", 400
 
-    raw = races_file.read()
-    try:
-        text = raw.decode('utf-8-sig')
-    except Exception:
-        text = raw.decode('utf-8', errors='replace')
-
-    reader = csv.DictReader(io.StringIO(text))
+    reader = _csv_upload(races_file)
     if not reader.fieldnames:
         return "Races CSV appears to have no header", 400
 
@@ -600,269 +2396,796 @@ def upload_election_races(election_id):
     if missing:
         return f"Races CSV missing required columns: {', '.join(missing)}", 400
 
-    field_map = {f.strip(): f for f in reader.fieldnames}
-    rows = [r for r in reader if r]
-    if not rows:
-        return "Races CSV contains no rows", 400
+    field_map = {f.strip(): f for f in reader.fieldnames}
+    groups = _RowGroups(UPLOAD_SPILL_ROWS)
+    upload_check = _RaceUploadCheck(field_map)
+    row_count = 0
+    for row in reader:
+        if not row:
+            continue
+        row_count += 1
+        key = (row.get(field_map['Race Ordinal ID']) or '').strip()
+        if key:
+            upload_check.check(reader.line_num, row)
+            groups.add(key, row)
+    if not row_count:
+        groups.close()
+        return "Races CSV contains no rows", 400
+
+    dry_run = request.form.get('dry_run') in {'1', 'on', 'true'}
+    background = not dry_run and request.form.get('background') in {'1', 'on', 'true'}
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(
+                """
+                SELECT election_date::date AS election_date
+                FROM elections
+                WHERE election_id = %s;
+                """,
+                (election_id,),
+            )
+            election = cursor.fetchone()
+            if not election:
+                conn.close()
+                return "Election not found", 404
+
+            election_year = int(election['election_date'].year)
+            jurisdiction_ids, office_name_ids = _upload_name_ids(cursor)
+            upload_check.check_references(cursor, jurisdiction_ids, office_name_ids)
+            if upload_check.problems:
+                conn.close()
+                return app.response_class(upload_check.report(), status=400, mimetype='text/plain')
+
+            upload_rows = _RaceUploadRows(
+                groups, field_map, election_id, election_year, jurisdiction_ids, office_name_ids
+            )
+
+            if background:
+                view_key = secrets.token_urlsafe(24)
+                cursor.execute(
+                    """
+                    INSERT INTO upload_jobs (election_id, filename, races_total, chunk_races, view_key)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING job_id;
+                    """,
+                    (election_id, races_file.filename, len(upload_rows), UPLOAD_CHUNK_RACES, view_key),
+                )
+                job_id = cursor.fetchone()['job_id']
+                conn.commit()
+                conn.close()
+                # The job reads the rows from groups and closes it when done.
+                _upload_jobs.submit(_tenant(), job_id, election_id, upload_rows)
+                groups = None
+                # The job page needs the admin token or the job's own key;
+                # only the key goes in URLs (EventSource cannot send headers).
+                return redirect(url_for('upload_job', job_id=job_id, key=view_key))
+
+            # Compare (and write) a batch of races at a time. A dry run keeps
+            # only the counts; a real one writes every batch in this one
+            # transaction and announces the races it changed at the end.
+            totals = _RaceUploadTotals()
+            changed_race_ids: list[int] = []
+            changed_contact_ids: set[int] = set()
+            for races, campaigns in upload_rows.batches(UPLOAD_CHUNK_RACES):
+                diff = _diff_race_upload(cursor, races, campaigns)
+                totals.add(diff)
+                if not dry_run:
+                    _apply_race_upload(cursor, diff)
+                    changed_race_ids += diff.changed_race_ids
+                    changed_contact_ids.update(diff.changed_contact_ids)
+
+            if dry_run:
+                conn.rollback()
+                conn.close()
+                return render_template(
+                    'upload_races_preview.html',
+                    election_id=election_id,
+                    election_year=election_year,
+                    totals=totals,
+                )
+
+            _notify_change(
+                cursor,
+                [
+                    ('elections', [election_id]),
+                    ('races', changed_race_ids),
+                    ('campaigns', changed_race_ids),
+                    ('individuals', changed_contact_ids),
+                ],
+            )
+
+        conn.commit()
+        _mark_primary_write()
+    except Exception as e:
+        conn.rollback()
+        conn.close()
+        return f"Error uploading races: {e}", 500
+    finally:
+        if groups is not None:
+            groups.close()
+
+    conn.close()
+    return redirect(url_for('election_races', election_id=election_id))
+
+
+def _upload_name_ids(cursor) -> tuple[dict[str, int], dict[str, int]]:
+    """Jurisdiction name -> jurisdiction_id and office name -> office_name_id,
+    loaded once and kept in the per-worker cache until either table changes."""
+    def load():
+        cursor.execute(
+            """
+            SELECT DISTINCT ON (jurisdiction_name) jurisdiction_name, jurisdiction_id
+            FROM jurisdictions
+            WHERE jurisdiction_id IS NOT NULL
+            ORDER BY jurisdiction_name, jurisdiction_id;
+            """
+        )
+        jurisdiction_ids = {row['jurisdiction_name']: int(row['jurisdiction_id']) for row in cursor.fetchall()}
+        cursor.execute(
+            """
+            SELECT DISTINCT ON (office_name) office_name, office_name_id
+            FROM offices
+            WHERE office_name_id IS NOT NULL
+            ORDER BY office_name, office_name_id;
+            """
+        )
+        office_name_ids = {row['office_name']: int(row['office_name_id']) for row in cursor.fetchall()}
+        return jurisdiction_ids, office_name_ids
+
+    return _cached_reference('upload_name_ids', [('jurisdictions', None), ('offices', None)], load)
+
+
+class _RaceUploadRows:
+    """The races and campaigns rows of an upload, built a batch at a time.
+
+    Groups are matched to race_ids from their first row; groups that land on
+    the same race are merged, the later group's race row and campaigns
+    winning. batches() takes each group's rows out of the _RowGroups as it
+    builds them, so it can be iterated once.
+    """
+
+    def __init__(self, groups: _RowGroups, field_map: dict, election_id: int, election_year: int,
+                 jurisdiction_ids: dict[str, int], office_name_ids: dict[str, int]):
+        self.groups = groups
+        self.field_map = field_map
+        self.election_id = election_id
+        self.election_year = election_year
+        self.jurisdiction_ids = jurisdiction_ids
+        self.office_name_ids = office_name_ids
+        # race_id -> group keys, in the order races are first seen
+        self._keys: dict[int, list[str]] = {}
+        for key in groups.keys():
+            sample = groups.first(key)
+            jurisdiction = (sample.get(field_map['Jurisdiction']) or '').strip()
+            office_name = (sample.get(field_map['Office']) or '').strip()
+            if not jurisdiction or not office_name:
+                continue
+            office_id = int(jurisdiction_ids[jurisdiction] * 100 + office_name_ids[office_name])
+            self._keys.setdefault(int(election_id * 10000000 + office_id), []).append(key)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def batches(self, size: int):
+        """Yield (races, campaigns) for up to size races at a time: race_id ->
+        race row, and race_id -> {contact_id: campaign row}."""
+        race_ids = list(self._keys)
+        for start in range(0, len(race_ids), size):
+            races: dict[int, tuple] = {}
+            campaigns: dict[int, dict[int, tuple]] = {}
+            for race_id in race_ids[start:start + size]:
+                campaigns[race_id] = {}
+                for key in self._keys[race_id]:
+                    races[race_id] = self._add_group(self.groups.pop(key), campaigns[race_id])
+            yield races, campaigns
+
+    def _add_group(self, g_rows: list[dict], race_campaigns: dict[int, tuple]) -> tuple:
+        """The race row of one group, adding its campaigns to race_campaigns."""
+        field_map = self.field_map
+        election_id = self.election_id
+        election_year = self.election_year
+        sample = g_rows[0]
+        jurisdiction = (sample.get(field_map['Jurisdiction']) or '').strip()
+        office_name = (sample.get(field_map['Office']) or '').strip()
+
+        jurisdiction_id = self.jurisdiction_ids[jurisdiction]
+        office_name_id = self.office_name_ids[office_name]
+
+        total_votes = _parse_int_field(sample.get(field_map['Total Votes']))
+        term_years = _parse_int_field(sample.get(field_map['Term (years)']))
+
+        seats = 0
+        elected_key = field_map['Elected']
+        for r in g_rows:
+            elected_val = (r.get(elected_key) or '').strip()
+            if elected_val in _ELECTED_VALUES:
+                seats += 1
+
+        office_id = int(jurisdiction_id * 100 + office_name_id)
+        race_id = int(election_id * 10000000 + office_id)
+
+        race_name = f"{election_year} {jurisdiction}/{office_name}"
+
+        term_start_date = _fourth_monday_in_april(election_year)
+        reelection_date = _first_tuesday_in_april(election_year + (term_years or 0))
+        term_end_date = _fourth_monday_in_april(election_year + (term_years or 0))
+
+        for r in g_rows:
+            first_name = (r.get(field_map['First Name']) or '').strip()
+            middle_name = (r.get(field_map['Middle Name']) or '').strip()
+            last_name = (r.get(field_map['Last Name']) or '').strip()
+            contact_id_raw = (r.get(field_map['Contact ID']) or '').strip()
+
+            if not first_name or not last_name or not contact_id_raw:
+                continue
+
+            candidate_name = f"{first_name} {middle_name + ' ' if middle_name else ''}{last_name}".strip()
+            campaign_name = f"{candidate_name} for {jurisdiction}/{office_name} {election_year}".strip()
+
+            votes_received = _parse_int_field(r.get(field_map['Votes Received']), default=0)
+            percent_received = _parse_float_field(r.get(field_map['Percent Received']), default=0.0)
+            total_votes_row = _parse_int_field(r.get(field_map['Total Votes']), default=total_votes)
+            elected_val = (r.get(field_map['Elected']) or '').strip()
+            elected = 1 if elected_val in _ELECTED_VALUES else 0
+
+            election_date = _parse_date_mdy(r.get(field_map['Election Date']))
+            office_start_date = _parse_date_mdy(r.get(field_map['Office Start Date']))
+            reelection_date_row = _parse_date_mdy(r.get(field_map['Re-Election Date']))
+            term_end_date_row = _parse_date_mdy(r.get(field_map['Term End Date']))
+
+            term_years_row = _parse_int_field(r.get(field_map['Term (years)']), default=term_years)
+
+            # A candidate listed twice in a race keeps the last row.
+            race_campaigns[int(contact_id_raw)] = (
+                campaign_name,
+                race_id,
+                candidate_name,
+                int(contact_id_raw),
+                jurisdiction,
+                jurisdiction_id,
+                office_name,
+                office_name_id,
+                office_id,
+                votes_received,
+                percent_received,
+                total_votes_row,
+                elected,
+                election_date,
+                term_years_row,
+                office_start_date,
+                reelection_date_row,
+                term_end_date_row,
+            )
+
+        return (
+            race_id,
+            race_name,
+            jurisdiction,
+            jurisdiction_id,
+            office_name,
+            office_name_id,
+            office_id,
+            election_id,
+            seats,
+            total_votes,
+            term_years,
+            term_start_date,
+            reelection_date,
+            term_end_date,
+        )
 
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(
-                """
-                SELECT election_date::date AS election_date
-                FROM elections
-                WHERE election_id = %s;
-                """,
-                (election_id,),
-            )
-            election = cursor.fetchone()
-            if not election:
-                conn.close()
-                return "Election not found", 404
 
-            election_year = int(election['election_date'].year)
+# Columns of the races and campaigns rows a races upload writes, in the order
+# _RaceUploadRows builds them, with the type each is cast to in VALUES
+# lists (where a column of NULLs would otherwise be text).
+_UPLOAD_RACE_COLUMNS = [
+    ('race_id', 'bigint'),
+    ('race_name', 'text'),
+    ('jurisdiction', 'text'),
+    ('jurisdiction_id', 'bigint'),
+    ('office_name', 'text'),
+    ('office_name_id', 'bigint'),
+    ('office_id', 'bigint'),
+    ('election_id', 'bigint'),
+    ('seats', 'bigint'),
+    ('total_votes', 'bigint'),
+    ('term_years', 'bigint'),
+    ('term_start_date', 'timestamp'),
+    ('reelection_date', 'timestamp'),
+    ('term_end_date', 'timestamp'),
+]
 
-            groups: dict[str, list[dict]] = {}
-            for row in rows:
-                key = (row.get(field_map['Race Ordinal ID']) or '').strip()
-                if not key:
-                    continue
-                groups.setdefault(key, []).append(row)
+_UPLOAD_CAMPAIGN_COLUMNS = [
+    ('campaign_name', 'text'),
+    ('race_id', 'bigint'),
+    ('candidate_name', 'text'),
+    ('contact_id', 'bigint'),
+    ('jurisdiction', 'text'),
+    ('jurisdiction_id', 'bigint'),
+    ('office_name', 'text'),
+    ('office_name_id', 'bigint'),
+    ('office_id', 'bigint'),
+    ('votes_received', 'bigint'),
+    ('percent_received', 'double precision'),
+    ('total_votes', 'bigint'),
+    ('elected', 'bigint'),
+    ('election_date', 'timestamp'),
+    ('term_years', 'bigint'),
+    ('term_start_date', 'timestamp'),
+    ('reelection_date', 'timestamp'),
+    ('term_end_date', 'timestamp'),
+]
 
-            for ordinal_id, g_rows in groups.items():
-                sample = g_rows[0]
-                jurisdiction = (sample.get(field_map['Jurisdiction']) or '').strip()
-                office_name = (sample.get(field_map['Office']) or '').strip()
-                if not jurisdiction or not office_name:
-                    continue
 
-                total_votes_raw = (sample.get(field_map['Total Votes']) or '').strip()
-                term_years_raw = (sample.get(field_map['Term (years)']) or '').strip()
-                try:
-                    total_votes = int(float(total_votes_raw)) if total_votes_raw else 0
-                except Exception:
-                    total_votes = 0
-                try:
-                    term_years = int(float(term_years_raw)) if term_years_raw else 0
-                except Exception:
-                    term_years = 0
+def _comparable(row) -> tuple:
+    """A stored or uploaded row with timestamps at midnight compared as dates."""
+    return tuple(
+        v.date() if isinstance(v, datetime) and v.time() == datetime.min.time() else v
+        for v in row
+    )
 
-                seats = 0
-                elected_key = field_map['Elected']
-                for r in g_rows:
-                    elected_val = (r.get(elected_key) or '').strip()
-                    if elected_val in {'1', 'true', 'True', 'YES', 'Yes'}:
-                        seats += 1
 
-                cursor.execute(
-                    """
-                    SELECT jurisdiction_id
-                    FROM jurisdictions
-                    WHERE jurisdiction_name = %s
-                    LIMIT 1;
-                    """,
-                    (jurisdiction,),
-                )
-                jrow = cursor.fetchone()
-                if not jrow:
-                    raise ValueError(f"Jurisdiction not found: {jurisdiction}")
-                jurisdiction_id = int(jrow['jurisdiction_id'])
+class _RaceUploadDiff:
+    """The writes that bring the races and campaigns of an upload up to date.
+
+    Races are matched by race_id and campaigns by (race_id, contact_id);
+    stored campaigns in an uploaded race that the file does not list are
+    deleted. Rows that already match are left alone.
+    """
+
+    def __init__(self):
+        self.race_inserts: list[tuple] = []
+        self.race_updates: list[tuple] = []
+        self.races_unchanged = 0
+        self.campaign_inserts: list[tuple] = []
+        self.campaign_updates: list[tuple] = []
+        # (race_id, contact_id) keys; contact_id may be None
+        self.campaign_deletes: list[tuple] = []
+        self.campaigns_unchanged = 0
+        self.campaigns_stored = 0
+        # race_id -> (race_name, 'new' | 'updated' | 'unchanged', inserts, updates, deletes)
+        self.by_race: dict[int, tuple] = {}
+        self.changed_contact_ids: list[int] = []
+
+    @property
+    def changed_race_ids(self) -> list[int]:
+        return [
+            race_id for race_id, (_, status, inserts, updates, deletes) in self.by_race.items()
+            if status != 'unchanged' or inserts or updates or deletes
+        ]
 
-                cursor.execute(
-                    """
-                    SELECT office_name_id
-                    FROM offices
-                    WHERE office_name = %s
-                    LIMIT 1;
-                    """,
-                    (office_name,),
-                )
-                orow = cursor.fetchone()
-                if not orow:
-                    raise ValueError(f"Office not found in offices table: {office_name}")
-                office_name_id = int(orow['office_name_id'])
+    @property
+    def row_writes(self) -> int:
+        return (
+            len(self.race_inserts) + len(self.race_updates)
+            + len(self.campaign_inserts) + len(self.campaign_updates) + len(self.campaign_deletes)
+        )
 
-                office_id = int(jurisdiction_id * 100 + office_name_id)
-                race_id = int(election_id * 10000000 + office_id)
+    @property
+    def statements(self) -> int:
+        batches = [self.race_inserts, self.race_updates, self.campaign_deletes, self.campaign_updates, self.campaign_inserts]
+        return sum(1 for batch in batches if batch)
 
-                race_name = f"{election_year} {jurisdiction}/{office_name}"
+    @property
+    def campaigns_uploaded(self) -> int:
+        return len(self.campaign_inserts) + len(self.campaign_updates) + self.campaigns_unchanged
 
-                term_start_date = _fourth_monday_in_april(election_year)
-                reelection_date = _first_tuesday_in_april(election_year + (term_years or 0))
-                term_end_date = _fourth_monday_in_april(election_year + (term_years or 0))
+    # What deleting and re-inserting every campaign of every uploaded race,
+    # as uploads used to, would cost: a DELETE and an UPDATE (or INSERT) per
+    # race and an INSERT per campaign.
+    @property
+    def rewrite_row_writes(self) -> int:
+        return len(self.by_race) + self.campaigns_stored + self.campaigns_uploaded
 
-                cursor.execute(
-                    """
-                    DELETE FROM campaigns
-                    WHERE race_id = %s;
-                    """,
-                    (race_id,),
-                )
+    @property
+    def rewrite_statements(self) -> int:
+        return 2 * len(self.by_race) + len(self.race_inserts) + self.campaigns_uploaded
 
-                cursor.execute(
-                    """
-                    UPDATE races
-                    SET
-                        race_name = %s,
-                        jurisdiction = %s,
-                        jurisdiction_id = %s,
-                        office_name = %s,
-                        office_name_id = %s,
-                        office_id = %s,
-                        election_id = %s,
-                        seats = %s,
-                        total_votes = %s,
-                        term_years = %s,
-                        term_start_date = %s,
-                        reelection_date = %s,
-                        term_end_date = %s
-                    WHERE race_id = %s;
-                    """,
-                    (
-                        race_name,
-                        jurisdiction,
-                        jurisdiction_id,
-                        office_name,
-                        office_name_id,
-                        office_id,
-                        election_id,
-                        seats,
-                        total_votes,
-                        term_years,
-                        term_start_date,
-                        reelection_date,
-                        term_end_date,
-                        race_id,
-                    ),
-                )
-                if cursor.rowcount == 0:
-                    cursor.execute(
-                        """
-                        INSERT INTO races (
-                            race_id,
-                            race_name,
-                            jurisdiction,
-                            jurisdiction_id,
-                            office_name,
-                            office_name_id,
-                            office_id,
-                            election_id,
-                            seats,
-                            total_votes,
-                            term_years,
-                            term_start_date,
-                            reelection_date,
-                            term_end_date
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-                        """,
-                        (
-                            race_id,
-                            race_name,
-                            jurisdiction,
-                            jurisdiction_id,
-                            office_name,
-                            office_name_id,
-                            office_id,
-                            election_id,
-                            seats,
-                            total_votes,
-                            term_years,
-                            term_start_date,
-                            reelection_date,
-                            term_end_date,
-                        ),
-                    )
 
-                for r in g_rows:
-                    first_name = (r.get(field_map['First Name']) or '').strip()
-                    middle_name = (r.get(field_map['Middle Name']) or '').strip()
-                    last_name = (r.get(field_map['Last Name']) or '').strip()
-                    contact_id_raw = (r.get(field_map['Contact ID']) or '').strip()
+class _RaceUploadTotals:
+    """The counts of the _RaceUploadDiffs of an upload's batches, summed,
+    and their by_race rows: all a preview shows."""
 
-                    if not first_name or not last_name or not contact_id_raw:
-                        continue
+    COUNTS = [
+        'race_inserts', 'race_updates', 'campaign_inserts', 'campaign_updates', 'campaign_deletes',
+    ]
+    TOTALS = [
+        'races_unchanged', 'campaigns_unchanged', 'row_writes', 'statements',
+        'rewrite_row_writes', 'rewrite_statements',
+    ]
 
-                    candidate_name = f"{first_name} {middle_name + ' ' if middle_name else ''}{last_name}".strip()
-                    campaign_name = f"{candidate_name} for {jurisdiction}/{office_name} {election_year}".strip()
+    def __init__(self):
+        for name in self.COUNTS + self.TOTALS:
+            setattr(self, name, 0)
+        self.by_race: dict[int, tuple] = {}
+
+    def add(self, diff: _RaceUploadDiff) -> None:
+        for name in self.COUNTS:
+            setattr(self, name, getattr(self, name) + len(getattr(diff, name)))
+        for name in self.TOTALS:
+            setattr(self, name, getattr(self, name) + getattr(diff, name))
+        self.by_race.update(diff.by_race)
+
+
+def _diff_race_upload(cursor, races: dict[int, tuple], campaigns: dict[int, dict[int, tuple]]) -> _RaceUploadDiff:
+    """Compare an upload's rows with the stored ones, reading them in two queries."""
+    diff = _RaceUploadDiff()
+    race_ids = list(races)
+    race_columns = ', '.join(name for name, _ in _UPLOAD_RACE_COLUMNS)
+    campaign_columns = ', '.join(name for name, _ in _UPLOAD_CAMPAIGN_COLUMNS)
+
+    cursor.execute(f"SELECT {race_columns} FROM races WHERE race_id = ANY(%s);", (race_ids,))
+    stored_races = {row['race_id']: _comparable(row.values()) for row in cursor.fetchall()}
+    cursor.execute(f"SELECT {campaign_columns} FROM campaigns WHERE race_id = ANY(%s);", (race_ids,))
+    stored_campaigns: dict[int, dict] = {}
+    for row in cursor.fetchall():
+        stored_campaigns.setdefault(row['race_id'], {}).setdefault(row['contact_id'], []).append(_comparable(row.values()))
+        diff.campaigns_stored += 1
+
+    for race_id, race in races.items():
+        stored = stored_races.get(race_id)
+        if stored is None:
+            diff.race_inserts.append(race)
+            status = 'new'
+        elif stored != _comparable(race):
+            diff.race_updates.append(race)
+            status = 'updated'
+        else:
+            diff.races_unchanged += 1
+            status = 'unchanged'
+
+        inserts = updates = deletes = 0
+        existing = stored_campaigns.get(race_id, {})
+        wanted = campaigns.get(race_id, {})
+        for contact_id, rows in existing.items():
+            if contact_id in wanted and len(rows) == 1:
+                continue
+            # Not in the file, or stored more than once: drop the stored rows
+            # (the file's row, if any, is inserted again below).
+            diff.campaign_deletes.append((race_id, contact_id))
+            deletes += len(rows)
+            if contact_id is not None:
+                diff.changed_contact_ids.append(contact_id)
+        for contact_id, campaign in wanted.items():
+            rows = existing.get(contact_id)
+            if rows is None or len(rows) > 1:
+                diff.campaign_inserts.append(campaign)
+                inserts += 1
+            elif rows[0] != _comparable(campaign):
+                diff.campaign_updates.append(campaign)
+                updates += 1
+            else:
+                diff.campaigns_unchanged += 1
+                continue
+            diff.changed_contact_ids.append(contact_id)
+        diff.by_race[race_id] = (race[1], status, inserts, updates, deletes)
+    return diff
+
+
+def _values_template(columns) -> str:
+    return '(' + ', '.join(f'%s::{sql_type}' for _, sql_type in columns) + ')'
+
+
+def _apply_race_upload(cursor, diff: _RaceUploadDiff) -> None:
+    """Write a _RaceUploadDiff with one statement per kind of change."""
+    race_names = [name for name, _ in _UPLOAD_RACE_COLUMNS]
+    campaign_names = [name for name, _ in _UPLOAD_CAMPAIGN_COLUMNS]
+    if diff.race_inserts:
+        execute_values(
+            cursor,
+            f"INSERT INTO races ({', '.join(race_names)}) VALUES %s;",
+            diff.race_inserts,
+            page_size=len(diff.race_inserts),
+        )
+    if diff.race_updates:
+        execute_values(
+            cursor,
+            f"""
+            UPDATE races r
+            SET {', '.join(f'{name} = v.{name}' for name in race_names[1:])}
+            FROM (VALUES %s) AS v ({', '.join(race_names)})
+            WHERE r.race_id = v.race_id;
+            """,
+            diff.race_updates,
+            template=_values_template(_UPLOAD_RACE_COLUMNS),
+            page_size=len(diff.race_updates),
+        )
+    if diff.campaign_deletes:
+        execute_values(
+            cursor,
+            """
+            DELETE FROM campaigns c
+            USING (VALUES %s) AS v (race_id, contact_id)
+            WHERE c.race_id = v.race_id AND c.contact_id IS NOT DISTINCT FROM v.contact_id;
+            """,
+            diff.campaign_deletes,
+            template='(%s::bigint, %s::bigint)',
+            page_size=len(diff.campaign_deletes),
+        )
+    if diff.campaign_updates:
+        execute_values(
+            cursor,
+            f"""
+            UPDATE campaigns c
+            SET {', '.join(f'{name} = v.{name}' for name in campaign_names if name not in ('race_id', 'contact_id'))}
+            FROM (VALUES %s) AS v ({', '.join(campaign_names)})
+            WHERE c.race_id = v.race_id AND c.contact_id = v.contact_id;
+            """,
+            diff.campaign_updates,
+            template=_values_template(_UPLOAD_CAMPAIGN_COLUMNS),
+            page_size=len(diff.campaign_updates),
+        )
+    if diff.campaign_inserts:
+        execute_values(
+            cursor,
+            f"INSERT INTO campaigns ({', '.join(campaign_names)}) VALUES %s;",
+            diff.campaign_inserts,
+            page_size=len(diff.campaign_inserts),
+        )
 
-                    votes_received = _parse_int_field(r.get(field_map['Votes Received']), default=0)
-                    percent_received = _parse_float_field(r.get(field_map['Percent Received']), default=0.0)
-                    total_votes_row = _parse_int_field(r.get(field_map['Total Votes']), default=total_votes)
-                    elected_val = (r.get(field_map['Elected']) or '').strip()
-                    elected = 1 if elected_val in {'1', 'true', 'True', 'YES', 'Yes'} else 0
 
-                    election_date = _parse_date_mdy(r.get(field_map['Election Date']))
-                    office_start_date = _parse_date_mdy(r.get(field_map['Office Start Date']))
-                    reelection_date_row = _parse_date_mdy(r.get(field_map['Re-Election Date']))
-                    term_end_date_row = _parse_date_mdy(r.get(field_map['Term End Date']))
+# Background uploads: a races upload with "background" ticked is parsed and
+# checked in the request as usual, then queued as a job in upload_jobs and
+# written by a thread in the same worker, UPLOAD_CHUNK_RACES races per
+# transaction, so no request waits on it and no transaction holds locks on
+# races and campaigns for the whole file. The job builds each chunk from the
+# upload's _RowGroups, so it holds no more of the file than the request did.
+# Each chunk is diffed against the stored rows like a normal upload, so
+# running one again (say after a worker restart, by uploading the file again)
+# writes only what is still missing. The job page streams progress read
+# from upload_jobs, so any worker can serve it, and reports a job that has
+# gone UPLOAD_JOB_STALE_MINUTES without progress (lost with its worker) as
+# failed.
+UPLOAD_JOB_POLL_SECONDS = 1.0
+UPLOAD_JOB_STALE_MINUTES = int(os.getenv('UPLOAD_JOB_STALE_MINUTES', '15'))
+
+
+class _UploadJobs:
+    """Runs queued race uploads one at a time on a thread of this worker.
+
+    The thread is not a daemon, so a worker that is shutting down finishes
+    its queued jobs first (within gunicorn's graceful timeout), and it only
+    lives while there are jobs, so an idle worker still exits at once. Its
+    connections get the admin statement timeout, as the upload itself would.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: deque = deque()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, tenant: tenants.Tenant, job_id: int, election_id: int, upload_rows: _RaceUploadRows) -> None:
+        with self._lock:
+            self._pending.append((tenant, job_id, election_id, upload_rows))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='upload-jobs')
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                job = self._pending.popleft()
+            tenant, job_id, upload_rows = job[0], job[1], job[3]
+            try:
+                self._process(*job)
+            except Exception as e:
+                app.logger.exception('Upload job %s failed', job_id)
+                self._finish(tenant, job_id, 'failed', str(e))
+            finally:
+                upload_rows.groups.close()
+
+    def _execute(self, tenant: tenants.Tenant, sql: str, params) -> None:
+        conn = _pool_checkout(_primary_pool, tenant, ADMIN_STATEMENT_TIMEOUT_MS)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
 
-                    term_years_row = _parse_int_field(r.get(field_map['Term (years)']), default=term_years)
+    def _finish(self, tenant: tenants.Tenant, job_id: int, status: str, error: str | None = None) -> None:
+        self._execute(
+            tenant,
+            """
+            UPDATE upload_jobs
+            SET status = %s, error = %s, finished_at = now(), updated_at = now()
+            WHERE job_id = %s;
+            """,
+            (status, error, job_id),
+        )
 
+    def _process(self, tenant: tenants.Tenant, job_id: int, election_id: int, upload_rows: _RaceUploadRows) -> None:
+        self._execute(
+            tenant,
+            """
+            UPDATE upload_jobs
+            SET status = 'running', error = NULL, started_at = now(), updated_at = now(), finished_at = NULL
+            WHERE job_id = %s;
+            """,
+            (job_id,),
+        )
+        for chunk, (races, campaigns) in enumerate(upload_rows.batches(UPLOAD_CHUNK_RACES), 1):
+            conn = _pool_checkout(_primary_pool, tenant, ADMIN_STATEMENT_TIMEOUT_MS)
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    started = time.perf_counter()
+                    diff = _diff_race_upload(cursor, races, campaigns)
+                    _apply_race_upload(cursor, diff)
+                    if diff.row_writes:
+                        _notify_change(
+                            cursor,
+                            [
+                                ('elections', [election_id]),
+                                ('races', diff.changed_race_ids),
+                                ('campaigns', diff.changed_race_ids),
+                                ('individuals', diff.changed_contact_ids),
+                            ],
+                            tenant,
+                        )
+                    seconds = time.perf_counter() - started
                     cursor.execute(
                         """
-                        INSERT INTO campaigns (
-                            campaign_name,
-                            race_id,
-                            candidate_name,
-                            contact_id,
-                            jurisdiction,
-                            jurisdiction_id,
-                            office_name,
-                            office_name_id,
-                            office_id,
-                            votes_received,
-                            percent_received,
-                            total_votes,
-                            elected,
-                            election_date,
-                            term_years,
-                            term_start_date,
-                            reelection_date,
-                            term_end_date
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
+                        INSERT INTO upload_job_chunks (job_id, chunk, races, row_writes, statements, seconds)
+                        VALUES (%s, %s, %s, %s, %s, %s);
+                        """,
+                        (job_id, chunk, len(races), diff.row_writes, diff.statements, seconds),
+                    )
+                    cursor.execute(
+                        """
+                        UPDATE upload_jobs
+                        SET races_done = races_done + %s, row_writes = row_writes + %s, updated_at = now()
+                        WHERE job_id = %s;
                         """,
-                        (
-                            campaign_name,
-                            race_id,
-                            candidate_name,
-                            int(contact_id_raw),
-                            jurisdiction,
-                            jurisdiction_id,
-                            office_name,
-                            office_name_id,
-                            office_id,
-                            votes_received,
-                            percent_received,
-                            total_votes_row,
-                            elected,
-                            election_date,
-                            term_years_row,
-                            office_start_date,
-                            reelection_date_row,
-                            term_end_date_row,
-                        ),
+                        (len(races), diff.row_writes, job_id),
                     )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+        self._finish(tenant, job_id, 'done')
+
+
+_upload_jobs = _UploadJobs()
+
+
+def _upload_job_progress(cursor, job_id: int, after_chunk: int = 0):
+    """The job's row and its chunks numbered above after_chunk.
+
+    An unfinished job that has made no progress for UPLOAD_JOB_STALE_MINUTES
+    was lost with its worker (a crash, a timeout kill or a deploy), and is
+    reported as failed.
+    """
+    cursor.execute(
+        """
+        SELECT job_id, election_id, filename,
+               CASE WHEN stale THEN 'failed' ELSE status END AS status,
+               races_total, races_done, chunk_races, row_writes,
+               CASE WHEN stale THEN %s ELSE error END AS error,
+               created_at, started_at, updated_at, finished_at
+        FROM (
+            SELECT *, status IN ('queued', 'running')
+                      AND updated_at < now() - make_interval(mins => %s) AS stale
+            FROM upload_jobs
+            WHERE job_id = %s
+        ) j;
+        """,
+        (
+            f"No progress for {UPLOAD_JOB_STALE_MINUTES} minutes; the worker running it stopped. "
+            "Upload the file again to write the races it had not committed.",
+            UPLOAD_JOB_STALE_MINUTES,
+            job_id,
+        ),
+    )
+    job = cursor.fetchone()
+    cursor.execute(
+        """
+        SELECT chunk, races, row_writes, statements, seconds
+        FROM upload_job_chunks
+        WHERE job_id = %s AND chunk > %s
+        ORDER BY chunk;
+        """,
+        (job_id, after_chunk),
+    )
+    return job, cursor.fetchall()
+
+
+def _upload_job_viewable(cursor, job_id: int) -> bool:
+    """Whether the request has the admin token or the job's ?key=."""
+    if _admin_token_is_valid(request):
+        return True
+    key = (request.args.get('key') or '').strip()
+    if not key:
+        return False
+    cursor.execute("SELECT view_key FROM upload_jobs WHERE job_id = %s;", (job_id,))
+    row = cursor.fetchone()
+    return row is not None and row['view_key'] is not None and hmac.compare_digest(row['view_key'], key)
 
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        return f"Error uploading races: {e}", 500
 
+@app.route('/upload_jobs/<int:job_id>')
+def upload_job(job_id):
+    """Progress of a background races upload."""
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        if not _upload_job_viewable(cursor, job_id):
+            conn.close()
+            return "Forbidden", 403
+        job, chunks = _upload_job_progress(cursor, job_id)
     conn.close()
-    return redirect(url_for('election_races', election_id=election_id))
+    if not job:
+        return "Upload job not found", 404
+    return render_template('upload_job.html', job=job, chunks=chunks, key=request.args.get('key'))
+
+
+@app.route('/upload_jobs/<int:job_id>/events')
+def upload_job_events(job_id):
+    """Server-Sent Events stream of a background upload's progress.
+
+    Each event is {"job": {...}, "chunks": [...]} with the chunks committed
+    since the previous event; the stream ends once the job has finished.
+    Each poll checks a primary connection out and back in, so a stream
+    holds none while it sleeps.
+    """
+    conn = get_db_connection()
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        viewable = _upload_job_viewable(cursor, job_id)
+    conn.close()
+    if not viewable:
+        return "Forbidden", 403
+    tenant = _tenant()
+
+    def stream():
+        yield 'retry: 3000\n\n'
+        last_chunk = 0
+        last_job = None
+        last_sent = time.monotonic()
+        deadline = time.monotonic() + LIVE_RESULTS_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            conn = _pool_checkout(_primary_pool, tenant)
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    job, chunks = _upload_job_progress(cursor, job_id, last_chunk)
+                conn.rollback()
+            finally:
+                conn.close()
+            if job is None:
+                return
+            if chunks or job != last_job:
+                last_chunk = chunks[-1]['chunk'] if chunks else last_chunk
+                last_job = job
+                last_sent = time.monotonic()
+                data = json.dumps({'job': job, 'chunks': chunks}, separators=(',', ':'), default=str)
+                yield f'event: progress\ndata: {data}\n\n'
+            elif time.monotonic() - last_sent >= LIVE_RESULTS_KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ': keepalive\n\n'
+            if job['status'] in ('done', 'failed'):
+                return
+            time.sleep(UPLOAD_JOB_POLL_SECONDS)
+
+    return app.response_class(
+        stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 
 def _first_tuesday_in_april(year: int) -> date:
+    import calendar
+
     april_first = date(year, 4, 1)
     days_until_tuesday = (calendar.TUESDAY - april_first.weekday() + 7) % 7
     return april_first + timedelta(days=days_until_tuesday)
 
 
 def _fourth_monday_in_april(year: int) -> date:
+    import calendar
+
     april_first = date(year, 4, 1)
     fourth_monday_offset = 21 + (calendar.MONDAY - april_first.weekday() + 7) % 7
     return april_first + timedelta(days=fourth_monday_offset)
@@ -885,6 +3208,7 @@ def _parse_float_field(val: str | None, default: float = 0.0) -> float:
     return float(s)
 
 
+@functools.lru_cache(maxsize=4096)
 def _parse_date_mdy(val: str | None) -> date | None:
     s = (val or '').strip()
     if not s:
@@ -900,7 +3224,7 @@ def _parse_date_mdy(val: str | None) -> date | None:
 @app.route('/add_race/<int:election_id>', methods=['GET', 'POST'])
 def add_race(election_id):
     """Render and handle the add race form."""
-    conn = get_db_connection()
+    conn = get_db_connection(readonly=request.method == 'GET')
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
         cursor.execute(
             """
@@ -912,15 +3236,18 @@ def add_race(election_id):
         )
         election = cursor.fetchone()
 
-        cursor.execute(
-            """
-            SELECT DISTINCT office_full_name
-            FROM offices
-            WHERE office_full_name IS NOT NULL AND office_full_name <> ''
-            ORDER BY office_full_name;
-            """
-        )
-        office_full_names = cursor.fetchall()
+        def load_office_full_names():
+            cursor.execute(
+                """
+                SELECT DISTINCT office_full_name
+                FROM offices
+                WHERE office_full_name IS NOT NULL AND office_full_name <> ''
+                ORDER BY office_full_name;
+                """
+            )
+            return cursor.fetchall()
+
+        office_full_names = _cached_reference('office_full_names', [('offices', None)], load_office_full_names)
 
     conn.close()
 
@@ -1049,8 +3376,10 @@ def add_race(election_id):
                         term_end_date,
                     ),
                 )
+                _notify_change(cursor, [('elections', [election_id]), ('races', [race_id])])
 
             conn.commit()
+            _mark_primary_write()
         except Exception as e:
             conn.rollback()
             conn.close()
@@ -1082,63 +3411,51 @@ def add_race(election_id):
     )
 
 @app.route('/race_details/<int:race_id>')
+@_cached_page
 def race_details(race_id):
     """Render the race detail page for a specific race."""
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute("""
-            SELECT race_name, jurisdiction, office_name, seats, total_votes, term_years, 
-                   TO_CHAR(term_start_date, 'MM/DD/YYYY') as term_start_date,
-                   TO_CHAR(reelection_date, 'MM/DD/YYYY') as reelection_date,
-                   TO_CHAR(term_end_date, 'MM/DD/YYYY') as term_end_date
-            FROM races
-            WHERE race_id = %s;
-        """, (race_id,))
-        race = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT campaign_name, votes_received, percent_received, total_votes, elected, contact_id
-            FROM campaigns
-            WHERE race_id = %s;
-        """, (race_id,))
-        campaigns = cursor.fetchall()
-    conn.close()
+    model = _current_read_model()
+    if model is not None:
+        race, campaigns = model.race_details(race_id)
+    else:
+        conn = get_db_connection(readonly=True)
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(queries.RACE, (race_id,))
+            race = cursor.fetchone()
+
+            cursor.execute(queries.RACE_CAMPAIGNS, (race_id,))
+            campaigns = cursor.fetchall()
+        conn.close()
 
     if not race:
         return "Race not found", 404
 
+    _cache_depends_on(('races', race_id), ('campaigns', race_id))
     return render_template('race_details.html', race=race, campaigns=campaigns)
 
 @app.route('/individual/<int:contact_id>')
+@_cached_page
 def individual(contact_id):
     """Render the individual candidate detail page."""
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute("""
-            SELECT first_name, middle_name, last_name, email, phone, address, city, zip, state, 
-                   candidate_status, party_affiliation, democratic_alignment, area, notes, contact_id
-            FROM individuals
-            WHERE contact_id = %s;
-        """, (contact_id,))
-        individual = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT campaign_name, votes_received, percent_received, total_votes, elected, 
-                   TO_CHAR(election_date, 'MM/DD/YYYY') as election_date,
-                   TO_CHAR(term_start_date, 'MM/DD/YYYY') as term_start_date,
-                   TO_CHAR(reelection_date, 'MM/DD/YYYY') as reelection_date,
-                   TO_CHAR(term_end_date, 'MM/DD/YYYY') as term_end_date,
-                   race_id, election_date as election_sort_date
-            FROM campaigns
-            WHERE contact_id = %s
-            ORDER BY election_sort_date;
-        """, (contact_id,))
-        campaigns = cursor.fetchall()
-    conn.close()
+    model = _current_read_model()
+    if model is not None:
+        individual, campaigns = model.individual(contact_id)
+    else:
+        conn = get_db_connection(readonly=True)
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(queries.INDIVIDUAL, (contact_id,))
+            individual = cursor.fetchone()
+
+            cursor.execute(queries.INDIVIDUAL_CAMPAIGNS, (contact_id,))
+            campaigns = cursor.fetchall()
+        conn.close()
 
     if not individual:
         return "Individual not found", 404
 
+    _cache_depends_on(('individuals', contact_id))
+    for campaign in campaigns:
+        _cache_depends_on(('campaigns', campaign['race_id']))
     return render_template('individual.html', individual=individual, campaigns=campaigns)
 
 @app.route('/individual/add', methods=['GET', 'POST'])
@@ -1170,46 +3487,30 @@ def add_individual():
         conn = get_db_connection()
         try:
             with conn.cursor() as cursor:
-                try:
-                    cursor.execute(
-                        """
-                        INSERT INTO individuals (
-                            first_name, middle_name, last_name, full_name,
-                            email, phone, address, city, state, zip,
-                            candidate_status, party_affiliation, democratic_alignment, area, notes
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        RETURNING contact_id;
-                        """,
-                        (
-                            first_name, middle_name, last_name, full_name,
-                            email, phone, address, city, state, zip_code,
-                            candidate_status, party_affiliation, democratic_alignment, area, notes,
-                        ),
+                cursor.execute(
+                    """
+                    INSERT INTO individuals (
+                        first_name, middle_name, last_name, full_name,
+                        email, phone, address, city, state, zip,
+                        candidate_status, party_affiliation, democratic_alignment, area, notes
                     )
-                    contact_id = cursor.fetchone()[0]
-                except Exception:
-                    cursor.execute("LOCK TABLE individuals IN EXCLUSIVE MODE;")
-                    cursor.execute("SELECT COALESCE(MAX(contact_id), 0) + 1 FROM individuals;")
-                    contact_id = cursor.fetchone()[0]
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING contact_id;
+                    """,
+                    (
+                        first_name, middle_name, last_name, full_name,
+                        email, phone, address, city, state, zip_code,
+                        candidate_status, party_affiliation, democratic_alignment, area, notes,
+                    ),
+                )
+                contact_id = cursor.fetchone()[0]
+                if contact_id is None:
+                    raise ValueError(_NO_CONTACT_ID_DEFAULT)
 
-                    cursor.execute(
-                        """
-                        INSERT INTO individuals (
-                            contact_id, first_name, middle_name, last_name, full_name,
-                            email, phone, address, city, state, zip,
-                            candidate_status, party_affiliation, democratic_alignment, area, notes
-                        )
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-                        """,
-                        (
-                            contact_id, first_name, middle_name, last_name, full_name,
-                            email, phone, address, city, state, zip_code,
-                            candidate_status, party_affiliation, democratic_alignment, area, notes,
-                        ),
-                    )
+                _notify_change(cursor, [('individuals', [contact_id])])
 
             conn.commit()
+            _mark_primary_write()
         except Exception as e:
             conn.rollback()
             conn.close()
@@ -1242,7 +3543,9 @@ def update_individual(contact_id):
                 data.get('democratic_alignment') or None, data.get('area') or None, data.get('notes') or None, 
                 contact_id
             ))
+            _notify_change(cursor, [('individuals', [contact_id])])
         conn.commit()
+        _mark_primary_write()
         conn.close()
         return redirect(url_for('individual', contact_id=contact_id))
     else:
@@ -1262,144 +3565,137 @@ def update_individual(contact_id):
 
         return render_template('update_individual.html', individual=individual)
 
-@app.route('/people')
-def people():
-    """Render the people page."""
-    sort_column = request.args.get('sort', 'full_name')
-    sort_order = request.args.get('order', 'asc')
-
-    sort_map = {
-        'full_name': 'i.full_name',
-        'current_jurisdiction': 'coalesce(c.current_jurisdiction, \'\')',
-        'current_office': 'coalesce(c.current_office, \'\')',
-        'party_affiliation': 'coalesce(i.party_affiliation, \'\')',
-        'candidate_status': 'coalesce(i.candidate_status, \'\')',
-    }
-    if sort_column not in sort_map:
-        sort_column = 'full_name'
-    if sort_order not in ['asc', 'desc']:
-        sort_order = 'asc'
-
-    conn = get_db_connection()
+def _people_rows(sort_column: str, sort_order: str) -> list:
+    model = _current_read_model()
+    if model is not None:
+        return model.people(sort_column, sort_order)
+    conn = get_db_connection(readonly=True)
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(f"""
-            WITH current_service AS (
-                SELECT
-                    contact_id,
-                    string_agg(DISTINCT jurisdiction, ', ' ORDER BY jurisdiction) AS current_jurisdiction,
-                    string_agg(DISTINCT office_name, ', ' ORDER BY office_name) AS current_office
-                FROM campaigns
-                WHERE elected = 1
-                  AND term_start_date IS NOT NULL
-                  AND term_end_date IS NOT NULL
-                  AND CURRENT_DATE >= term_start_date::date
-                  AND CURRENT_DATE <= term_end_date::date
-                GROUP BY contact_id
-            )
-            SELECT
-                i.contact_id,
-                i.full_name,
-                i.party_affiliation,
-                i.candidate_status,
-                c.current_jurisdiction,
-                c.current_office
-            FROM individuals i
-            LEFT JOIN current_service c ON c.contact_id = i.contact_id
-            ORDER BY {sort_map[sort_column]} {sort_order};
-        """)
+        cursor.execute(
+            queries.PEOPLE.format(sort_column=queries.PEOPLE_SORT_MAP[sort_column], sort_order=sort_order)
+        )
         peoples_data = cursor.fetchall()
     conn.close()
+    return peoples_data
+
+@app.route('/people')
+@_cached_page
+def people():
+    """Render the people page."""
+    sort_column, sort_order = queries.validated_sort(
+        request.args.get('sort'), request.args.get('order'), queries.PEOPLE_SORT_MAP, 'full_name'
+    )
+    peoples_data, pagination = _list_page(_people_rows(sort_column, sort_order))
 
+    _cache_depends_on(('individuals', None), ('campaigns', None))
     return render_template(
         'peoples.html',
         peoples=peoples_data,
         sort_column=sort_column,
         sort_order=sort_order,
+        pagination=pagination,
+        data_url=url_for('people_json') if pagination is None else None,
+    )
+
+@app.route('/people.json')
+@_cacheable_json
+@_cached_page
+def people_json():
+    """The people list as a compact JSON payload, sorted in the browser."""
+    _cache_depends_on(('individuals', None), ('campaigns', None))
+    return _list_payload(
+        ['contact_id', 'full_name', 'current_jurisdiction', 'current_office', 'party_affiliation', 'candidate_status'],
+        _people_rows('full_name', 'asc'),
     )
 
 @app.route('/peoples')
 def peoples_redirect():
     return redirect(url_for('people'))
 
-@app.route('/jurisdictions')
-def jurisdictions():
-    """Render the jurisdictions page."""
-    sort_column = request.args.get('sort', 'jurisdiction_name')
-    sort_order = request.args.get('order', 'asc')
-    
-    if sort_column not in ['jurisdiction_name', 'jurisdiction_type']:
-        sort_column = 'jurisdiction_name'
-    if sort_order not in ['asc', 'desc']:
-        sort_order = 'asc'
-
-    conn = get_db_connection()
+def _jurisdictions_rows(sort_column: str, sort_order: str) -> list:
+    model = _current_read_model()
+    if model is not None:
+        return model.jurisdictions_list(sort_column, sort_order)
+    conn = get_db_connection(readonly=True)
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(f"""
-            SELECT jurisdiction_id, jurisdiction_name, jurisdiction_type
-            FROM jurisdictions
-            ORDER BY {sort_column} {sort_order};
-        """)
+        cursor.execute(queries.JURISDICTIONS.format(sort_column=sort_column, sort_order=sort_order))
         jurisdictions_data = cursor.fetchall()
     conn.close()
+    return jurisdictions_data
+
+@app.route('/jurisdictions')
+@_cached_page
+def jurisdictions():
+    """Render the jurisdictions page."""
+    sort_column, sort_order = queries.validated_sort(
+        request.args.get('sort'), request.args.get('order'), queries.JURISDICTION_SORT_COLUMNS, 'jurisdiction_name'
+    )
+    jurisdictions_data, pagination = _list_page(_jurisdictions_rows(sort_column, sort_order))
 
+    _cache_depends_on(('jurisdictions', None))
     return render_template(
         'jurisdictions.html',
         jurisdictions=jurisdictions_data,
         sort_column=sort_column,
-        sort_order=sort_order
+        sort_order=sort_order,
+        pagination=pagination,
+        data_url=url_for('jurisdictions_json') if pagination is None else None,
+    )
+
+@app.route('/jurisdictions.json')
+@_cacheable_json
+@_cached_page
+def jurisdictions_json():
+    """The jurisdictions list as a compact JSON payload, sorted in the browser."""
+    _cache_depends_on(('jurisdictions', None))
+    return _list_payload(
+        ['jurisdiction_id', 'jurisdiction_name', 'jurisdiction_type'], _jurisdictions_rows('jurisdiction_name', 'asc')
     )
 
 @app.route('/jurisdiction/details/<int:jurisdiction_id>')
+@_cached_page
 def jurisdiction_details(jurisdiction_id):
     """Render the jurisdiction detail page."""
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute("""
-            SELECT jurisdiction_name, jurisdiction_type, email, phone, address, city, state, zip, website
-            FROM jurisdictions
-            WHERE jurisdiction_id = %s;
-        """, (jurisdiction_id,))
-        jurisdiction = cursor.fetchone()
+    model = _current_read_model()
+    if model is not None:
+        jurisdiction, offices = model.jurisdiction_details(jurisdiction_id)
+    else:
+        conn = get_db_connection(readonly=True)
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(queries.JURISDICTION, (jurisdiction_id,))
+            jurisdiction = cursor.fetchone()
 
-        cursor.execute("""
-            SELECT office_name, office_id, seats
-            FROM offices
-            WHERE jurisdiction_id = %s
-            ORDER BY office_name;
-        """, (jurisdiction_id,))
-        offices = cursor.fetchall()
+            cursor.execute(queries.JURISDICTION_OFFICES, (jurisdiction_id,))
+            offices = cursor.fetchall()
 
-        for office in offices:
-            cursor.execute("""
-                SELECT candidate_name, contact_id
-                FROM campaigns
-                WHERE office_id = %s AND elected = 1
-                ORDER BY election_date DESC
-                LIMIT %s;
-            """, (office['office_id'], office['seats']))
-            officeholders = cursor.fetchall()
-            office['current_officeholders'] = officeholders
+            for office in offices:
+                cursor.execute(queries.OFFICE_CURRENT_HOLDERS, (office['office_id'], office['seats']))
+                officeholders = cursor.fetchall()
+                office['current_officeholders'] = officeholders
 
-    conn.close()
+        conn.close()
 
     if not jurisdiction:
         return "Jurisdiction not found", 404
 
+    _cache_depends_on(('jurisdictions', jurisdiction_id), ('offices', None), ('campaigns', None))
     return render_template('jurisdiction_details.html', jurisdiction=jurisdiction, offices=offices)
 
 @app.route('/offices')
+@_cached_page
 def offices():
     """Render the offices page."""
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute("""
-            SELECT jurisdiction, jurisdiction_id, office_name, office_id, seats, term_years, term_start_month, election_month
-            FROM offices
-            ORDER BY jurisdiction, office_name;
-        """)
-        offices_data = cursor.fetchall()
-    conn.close()
+    model = _current_read_model()
+    if model is not None:
+        offices_data = model.offices_list()
+    else:
+        conn = get_db_connection(readonly=True)
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(queries.OFFICES)
+            offices_data = cursor.fetchall()
+        conn.close()
 
+    _cache_depends_on(('offices', None))
     return render_template('offices.html', offices=offices_data)
 
 def month_name(month_number):
@@ -1413,56 +3709,79 @@ def google_verification():
     return render_template('googlecc3d64f28e62a7a5.html')
 
 @app.route('/office/details/<int:office_id>')
+@_cached_page
 def office_details(office_id):
     """Render the office detail page."""
-    conn = get_db_connection()
-    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute("""
-            SELECT office_full_name, office_name, seats, term_years, term_start_month, election_month, email, phone, address, city, state, zip, website
-            FROM offices
-            WHERE office_id = %s;
-        """, (office_id,))
-        office = cursor.fetchone()
+    model = _current_read_model()
+    if model is not None:
+        office, officeholders, races = model.office_details(office_id)
+    else:
+        conn = get_db_connection(readonly=True)
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(queries.OFFICE, (office_id,))
+            office = cursor.fetchone()
 
-        cursor.execute(
-            """
-            SELECT candidate_name, contact_id, election_date
-            FROM campaigns
-            WHERE office_id = %s
-              AND elected = 1
-              AND election_date = (
-                  SELECT MAX(election_date)
-                  FROM campaigns
-                  WHERE office_id = %s AND elected = 1
-              )
-            ORDER BY votes_received DESC NULLS LAST, campaign_id DESC;
-            """,
-            (office_id, office_id),
-        )
-        officeholders = cursor.fetchall()
+            cursor.execute(queries.OFFICE_HOLDERS, (office_id, office_id))
+            officeholders = cursor.fetchall()
 
-        cursor.execute(
-            """
-            SELECT
-                r.race_id,
-                r.race_name,
-                e.election_date::date AS election_date
-            FROM races r
-            LEFT JOIN elections e ON e.election_id = r.election_id
-            WHERE r.office_id = %s
-            ORDER BY election_date ASC NULLS LAST, r.race_name ASC;
-            """,
-            (office_id,),
-        )
-        races = cursor.fetchall()
-    conn.close()
+            cursor.execute(queries.OFFICE_RACES, (office_id,))
+            races = cursor.fetchall()
+        conn.close()
 
     if not office:
         return "Office not found", 404
 
-    return render_template('office_details.html', office=office, officeholders=officeholders, races=races)
+    _cache_depends_on(('offices', office_id), ('races', None), ('campaigns', None))
+    return render_template('office_details.html', office=office, office_id=office_id, officeholders=officeholders, races=races)
+
+app.jinja_env.globals.update(
+    month_name=month_name,
+    page_cache_stats=_page_cache_stats,
+    tenant_metrics=_tenant_metrics,
+    fragment=_fragment,
+)
+
+
+@app.context_processor
+def _inject_tenant():
+    return {'tenant': _tenant()}
+
+
+# A tenant's /<slug> prefix must not shadow one of the app's own paths.
+_shadowed = {t.slug for t in TENANTS} & {rule.rule.split('/')[1] for rule in app.url_map.iter_rules()}
+if len(TENANTS) > 1 and _shadowed:
+    raise ValueError(f"Tenant slugs clash with app routes: {sorted(_shadowed)}")
+
+# Templates only change on deploy, so outside `python app.py` Jinja does not
+# stat them on every render, and compiled templates are kept in a bytecode
+# cache on disk that new workers and restarts load instead of recompiling.
+# Entries carry a checksum of the template source, so edited templates are
+# simply recompiled. TEMPLATE_PRECOMPILE=1 compiles every template at import,
+# which with gunicorn's preload_app happens once in the master before forking.
+TEMPLATES_AUTO_RELOAD = os.getenv('TEMPLATES_AUTO_RELOAD', '0') in {'1', 'true', 'True'}
+JINJA_CACHE_ENABLED = os.getenv('JINJA_CACHE_ENABLED', '1') not in {'0', 'false', 'False', ''}
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'cocodems_jinja_cache')
+TEMPLATE_PRECOMPILE = os.getenv('TEMPLATE_PRECOMPILE', '0') in {'1', 'true', 'True'}
+
+app.config['TEMPLATES_AUTO_RELOAD'] = TEMPLATES_AUTO_RELOAD
+app.jinja_env.auto_reload = TEMPLATES_AUTO_RELOAD
+if JINJA_CACHE_ENABLED:
+    try:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        app.logger.warning("Jinja bytecode cache disabled; cannot create %s: %s", JINJA_CACHE_DIR, e)
+    else:
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+
+def _precompile_templates() -> None:
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
 
-app.jinja_env.globals.update(month_name=month_name)
+if TEMPLATE_PRECOMPILE:
+    _precompile_templates()
 
 if __name__ == '__main__':
+    app.jinja_env.auto_reload = True
     app.run(debug=True, port=int(os.getenv('PORT', '5000')))
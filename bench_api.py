@@ -0,0 +1,214 @@
+"""Load test the async JSON API (api_server.py) against the Flask pages on gunicorn sync workers.
+
+Starts both servers with the same number of worker processes (one per core by
+default), drives each with the same number of concurrent keep-alive clients
+over equivalent routes for a fixed time, and prints throughput, throughput per
+worker and latency percentiles. The Flask side runs with its page caches off so
+both sides do the same database work per request; it still renders HTML, which
+is part of what a sync worker spends its time on.
+
+    python bench_api.py [--workers 4] [--concurrency 32] [--duration 15]
+
+The load generator runs on the same host, so leave it a core if you can, or
+point it at servers started elsewhere with --sync-url/--async-url.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import psycopg2
+
+from app import DATABASE
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+
+def sample_ids() -> dict:
+    conn = psycopg2.connect(**DATABASE)
+    try:
+        with conn.cursor() as cursor:
+            def first(sql):
+                cursor.execute(sql)
+                row = cursor.fetchone()
+                return row[0] if row else 0
+
+            return {
+                'election_id': first("SELECT election_id FROM races GROUP BY election_id ORDER BY count(*) DESC LIMIT 1;"),
+                'race_id': first("SELECT race_id FROM campaigns GROUP BY race_id ORDER BY count(*) DESC LIMIT 1;"),
+                'contact_id': first("SELECT contact_id FROM campaigns GROUP BY contact_id ORDER BY count(*) DESC LIMIT 1;"),
+                'jurisdiction_id': first("SELECT jurisdiction_id FROM offices GROUP BY jurisdiction_id ORDER BY count(*) DESC LIMIT 1;"),
+                'office_id': first("SELECT office_id FROM races GROUP BY office_id ORDER BY count(*) DESC LIMIT 1;"),
+            }
+    finally:
+        conn.close()
+
+
+def route_pairs(ids: dict) -> list[tuple[str, str]]:
+    """(Flask page, equivalent API route) pairs, requested round-robin."""
+    return [
+        (f"/election_races/{ids['election_id']}", f"/api/v1/elections/{ids['election_id']}"),
+        (f"/race_details/{ids['race_id']}", f"/api/v1/races/{ids['race_id']}"),
+        (f"/individual/{ids['contact_id']}", f"/api/v1/individuals/{ids['contact_id']}"),
+        (f"/jurisdiction/details/{ids['jurisdiction_id']}", f"/api/v1/jurisdictions/{ids['jurisdiction_id']}"),
+        (f"/office/details/{ids['office_id']}", f"/api/v1/offices/{ids['office_id']}"),
+        ('/elections', '/api/v1/elections'),
+    ]
+
+
+async def http_get(host: str, port: int, path: str, conn):
+    """Send one GET on conn (reader, writer), reconnecting if needed; return (status, conn)."""
+    for attempt in range(2):
+        if conn is None:
+            conn = await asyncio.open_connection(host, port)
+        reader, writer = conn
+        try:
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode('ascii'))
+            await writer.drain()
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError
+            status = int(status_line.split()[1])
+            length, close = 0, False
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                name = name.strip().lower()
+                if name == 'content-length':
+                    length = int(value)
+                elif name == 'connection' and value.strip().lower() == 'close':
+                    close = True
+            await reader.readexactly(length)
+            if close:
+                writer.close()
+                conn = None
+            return status, conn
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            conn = None
+            if attempt:
+                raise
+    raise ConnectionError(path)
+
+
+async def drive(base_url: str, paths: list[str], concurrency: int, duration: float) -> dict:
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client(offset: int):
+        nonlocal errors
+        conn, i = None, offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                status, conn = await asyncio.wait_for(http_get(host, port, path, conn), REQUEST_TIMEOUT_SECONDS)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errors += 1
+                conn = None
+                continue
+            if status != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+        if conn is not None:
+            conn[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {'requests': len(latencies), 'errors': errors, 'elapsed': elapsed, 'latencies': sorted(latencies)}
+
+
+async def probe(url: str) -> int:
+    parts = urlsplit(url)
+    status, conn = await http_get(parts.hostname, parts.port or 80, parts.path or '/', None)
+    if conn is not None:
+        conn[1].close()
+    return status
+
+
+def wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(probe(url)) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout:.0f}s")
+
+
+def _start(argv: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def report(label: str, result: dict, workers: int) -> None:
+    throughput = result['requests'] / result['elapsed']
+    lat = result['latencies'] or [0.0]
+
+    def pct(q):
+        return lat[min(len(lat) - 1, int(len(lat) * q))] * 1000
+
+    print(f"{label:14} {throughput:9.1f} {throughput / workers:9.1f} "
+          f"{statistics.median(lat) * 1000:8.1f} {pct(0.95):8.1f} {pct(0.99):8.1f} {result['errors']:7d}")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--sync-url', help='use an already running Flask server instead of starting gunicorn')
+    parser.add_argument('--async-url', help='use an already running API server instead of starting uvicorn')
+    args = parser.parse_args(argv)
+
+    pairs = route_pairs(sample_ids())
+    env = dict(os.environ, LOCAL_CACHE_ENABLED='0', PAGE_CACHE_ENABLED='0', READ_MODEL_ENABLED='0')
+    procs = []
+    try:
+        sync_url = args.sync_url
+        if not sync_url:
+            sync_url = 'http://127.0.0.1:8101'
+            procs.append(_start([sys.executable, '-m', 'gunicorn', '-k', 'sync', '-w', str(args.workers),
+                                 '-b', '127.0.0.1:8101', 'app:app'], env))
+        async_url = args.async_url
+        if not async_url:
+            async_url = 'http://127.0.0.1:8102'
+            procs.append(_start([sys.executable, '-m', 'uvicorn', '--workers', str(args.workers),
+                                 '--host', '127.0.0.1', '--port', '8102', '--log-level', 'warning',
+                                 'api_server:app'], env))
+        wait_until_up(sync_url + pairs[-1][0])
+        wait_until_up(async_url + pairs[-1][1])
+
+        results = {}
+        for label, url, paths in (
+            ('gunicorn sync', sync_url, [p for p, _ in pairs]),
+            ('asgi api', async_url, [p for _, p in pairs]),
+        ):
+            asyncio.run(drive(url, paths, args.concurrency, 2))
+            results[label] = asyncio.run(drive(url, paths, args.concurrency, args.duration))
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+    print(f"{args.workers} worker(s) each, {args.concurrency} concurrent clients, {args.duration:.0f}s per server")
+    print(f"{'server':14} {'req/s':>9} {'req/s/wk':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for label, result in results.items():
+        report(label, result, args.workers)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+"""Benchmark /admin/clean_candidates on a large candidates file.
+
+Builds a candidates CSV (20,000 rows by default) that mixes rows with a
+Contact ID, rows naming people already in the database, new people and
+repeats of those new people, then posts it twice through the test client:
+the first run inserts the new people, the second should match every row and
+insert nobody. Prints the time and the number of individuals added by each
+run, then deletes every individual numbered above the largest contact_id at
+the start unless --keep is given. Uses the database configured for app.py
+and ADMIN_TOKEN, so run it against a local copy of the data.
+
+    python bench_clean_candidates.py [--rows 20000] [--keep]
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+
+os.environ['LOCAL_CACHE_ENABLED'] = '0'
+os.environ['PAGE_CACHE_ENABLED'] = '0'
+os.environ['READ_MODEL_ENABLED'] = '0'
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+
+FIELDS = ['Contact ID', 'First Name', 'Middle Name', 'Last Name', 'Jurisdiction', 'Office']
+MARKER = 'Benchcand'
+
+
+def build_file(rows: int, existing: list[tuple], jurisdictions: list[str]) -> bytes:
+    rng = random.Random(42)
+    new_people = [(f'First{i}', rng.choice(['', 'A', 'B.']), f'{MARKER}{i}') for i in range(max(1, rows // 4))]
+    out = io.StringIO(newline='')
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    for i in range(rows):
+        kind = i % 4
+        jurisdiction = rng.choice(jurisdictions) if jurisdictions else 'City of Portage'
+        if kind == 0 and existing:
+            contact_id, first, middle, last = rng.choice(existing)
+            writer.writerow([contact_id, first, middle or '', last, jurisdiction, 'Alderperson'])
+        elif kind == 1 and existing:
+            _, first, middle, last = rng.choice(existing)
+            # Different case and spacing than in the table.
+            writer.writerow(['', f' {first.upper()} ', middle or '', last.lower(), jurisdiction, 'Alderperson'])
+        else:
+            first, middle, last = rng.choice(new_people)
+            writer.writerow(['', first, middle, last, jurisdiction, 'Alderperson'])
+    return out.getvalue().encode('utf-8')
+
+
+def post(client, data: bytes, token: str) -> tuple[float, bytes]:
+    started = time.perf_counter()
+    response = client.post(
+        '/admin/clean_candidates',
+        data={'admin_token': token, 'candidates_file': (io.BytesIO(data), 'candidates.csv')},
+        content_type='multipart/form-data',
+    )
+    body = response.get_data()
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise SystemExit(f"clean_candidates returned {response.status_code}: {body[:500]!r}")
+    return elapsed, body
+
+
+def count_individuals(cursor) -> int:
+    cursor.execute("SELECT count(*) FROM individuals;")
+    return cursor.fetchone()[0]
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--keep', action='store_true', help='keep the individuals the benchmark creates')
+    args = parser.parse_args(argv)
+
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        raise SystemExit("Set ADMIN_TOKEN to the app's admin token")
+
+    conn = psycopg2.connect(**app.DATABASE)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT contact_id, first_name, middle_name, last_name FROM individuals "
+                "WHERE first_name <> '' AND last_name <> '' ORDER BY contact_id LIMIT 2000;"
+            )
+            existing = cursor.fetchall()
+            cursor.execute("SELECT DISTINCT jurisdiction FROM campaigns WHERE jurisdiction <> '';")
+            jurisdictions = [row[0] for row in cursor.fetchall()]
+            data = build_file(args.rows, existing, jurisdictions)
+            cursor.execute("SELECT COALESCE(MAX(contact_id), 0) FROM individuals;")
+            last_contact_id = cursor.fetchone()[0]
+
+            client = app.app.test_client()
+            print(f"{args.rows} rows, {len(data) / 1024:.0f} KiB")
+            print(f"{'run':6} {'seconds':>8} {'added':>7}")
+            for run in ('first', 'second'):
+                before = count_individuals(cursor)
+                elapsed, body = post(client, data, token)
+                added = count_individuals(cursor) - before
+                print(f"{run:6} {elapsed:8.2f} {added:7d}")
+            filled = sum(1 for row in csv.DictReader(io.StringIO(body.decode('utf-8'))) if row['Contact ID'])
+            print(f"{filled} of {args.rows} rows have a Contact ID")
+
+            if not args.keep:
+                cursor.execute("DELETE FROM individuals WHERE contact_id > %s RETURNING contact_id;", (last_contact_id,))
+                deleted = [row[0] for row in cursor.fetchall()]
+                with app.app.test_request_context():
+                    app._notify_change(cursor, [('individuals', deleted)])
+                print(f"Deleted {len(deleted)} individuals added by the benchmark")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+"""Benchmark app.py under the gunicorn worker configurations in gunicorn.conf.py.
+
+Starts gunicorn once per configuration against the database configured for
+app.py (use a local Postgres), drives it with concurrent keep-alive clients
+over a mix of read-only pages, and prints requests per second and tail
+latency for each. Page caches are off unless --cached is given, so the
+numbers reflect rendering and database time.
+
+    python bench_gunicorn.py [--concurrency 32] [--duration 15] [--cached]
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_api import drive, report, route_pairs, sample_ids, wait_until_up
+
+BIND = '127.0.0.1:8103'
+
+
+def configurations() -> list[tuple[str, dict]]:
+    configs = [
+        ('sync', {'GUNICORN_WORKER_CLASS': 'sync'}),
+        ('gthread', {'GUNICORN_WORKER_CLASS': 'gthread'}),
+        ('gthread x8', {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_THREADS': '8'}),
+    ]
+    if importlib.util.find_spec('gevent') is not None:
+        configs.append(('gevent', {'GUNICORN_WORKER_CLASS': 'gevent'}))
+    return configs
+
+
+def worker_count(overrides: dict, env: dict) -> int:
+    """Ask gunicorn.conf.py how many workers it would start with these overrides."""
+    code = 'import runpy; print(runpy.run_path("gunicorn.conf.py")["workers"])'
+    out = subprocess.run([sys.executable, '-c', code], env=dict(env, **overrides),
+                         capture_output=True, text=True, check=True)
+    return int(out.stdout.strip())
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--cached', action='store_true', help='leave the page caches on')
+    args = parser.parse_args(argv)
+
+    paths = [page for page, _ in route_pairs(sample_ids())]
+    env = dict(os.environ, GUNICORN_BIND=BIND, READ_MODEL_ENABLED='0')
+    if not args.cached:
+        env.update(LOCAL_CACHE_ENABLED='0', PAGE_CACHE_ENABLED='0')
+
+    results = []
+    for label, overrides in configurations():
+        workers = worker_count(overrides, env)
+        log = tempfile.TemporaryFile()
+        proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app'],
+                                env=dict(env, **overrides), stdout=subprocess.DEVNULL, stderr=log)
+        try:
+            try:
+                wait_until_up(f'http://{BIND}{paths[-1]}')
+            except SystemExit as exc:
+                log.seek(0)
+                print(f"skipping {label}: {exc}\n{log.read().decode(errors='replace')[-2000:]}", file=sys.stderr)
+                continue
+            asyncio.run(drive(f'http://{BIND}', paths, args.concurrency, 2))
+            results.append((f'{label} ({workers}w)', asyncio.run(drive(f'http://{BIND}', paths, args.concurrency, args.duration)), workers))
+        finally:
+            proc.terminate()
+            proc.wait()
+            log.close()
+
+    print(f"{args.concurrency} concurrent clients, {args.duration:.0f}s per configuration, "
+          f"page caches {'on' if args.cached else 'off'}")
+    print(f"{'config':14} {'req/s':>9} {'req/s/wk':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for label, result, workers in results:
+        report(label, result, workers)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""Benchmark the read-only pages served from SQL against the in-memory read model.
+
+Renders each page repeatedly with the page caches turned off, first through
+the SQL path and then through read_model.py, and prints the median and p95
+time per request for each. Uses the database configured for app.py, so run
+it against a local copy of the data.
+
+    python bench_read_model.py [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ['LOCAL_CACHE_ENABLED'] = '0'
+os.environ['PAGE_CACHE_ENABLED'] = '0'
+os.environ['READ_MODEL_ENABLED'] = '1'
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+
+
+def sample_paths() -> list[str]:
+    conn = psycopg2.connect(**app.DATABASE)
+    try:
+        with conn.cursor() as cursor:
+            def first(sql):
+                cursor.execute(sql)
+                row = cursor.fetchone()
+                return row[0] if row else 0
+
+            election_id = first("SELECT election_id FROM races GROUP BY election_id ORDER BY count(*) DESC LIMIT 1;")
+            race_id = first("SELECT race_id FROM campaigns GROUP BY race_id ORDER BY count(*) DESC LIMIT 1;")
+            contact_id = first("SELECT contact_id FROM campaigns GROUP BY contact_id ORDER BY count(*) DESC LIMIT 1;")
+            jurisdiction_id = first("SELECT jurisdiction_id FROM offices GROUP BY jurisdiction_id ORDER BY count(*) DESC LIMIT 1;")
+            office_id = first("SELECT office_id FROM races GROUP BY office_id ORDER BY count(*) DESC LIMIT 1;")
+    finally:
+        conn.close()
+    return [
+        '/elections',
+        f'/election_races/{election_id}',
+        f'/race_details/{race_id}',
+        f'/individual/{contact_id}',
+        '/people',
+        '/people?sort=current_office&order=desc',
+        '/jurisdictions',
+        f'/jurisdiction/details/{jurisdiction_id}',
+        '/offices',
+        f'/office/details/{office_id}',
+    ]
+
+
+def time_path(client, path: str, repeat: int) -> list[float]:
+    client.get(path)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise SystemExit(f"{path} returned {response.status_code}")
+    return timings
+
+
+def summarize(timings: list[float]) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"{statistics.median(ordered) * 1000:8.2f} {p95 * 1000:8.2f}"
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    client = app.app.test_client()
+    paths = sample_paths()
+
+    app.READ_MODEL_ENABLED = False
+    sql_timings = {p: time_path(client, p, args.repeat) for p in paths}
+
+    app.READ_MODEL_ENABLED = True
+    started = time.perf_counter()
+    while app._current_read_model() is None:
+        if time.perf_counter() - started > 60:
+            raise SystemExit("Read model did not load within 60s (is data_versions migrated?)")
+        time.sleep(0.05)
+    load_seconds = time.perf_counter() - started
+    model_timings = {p: time_path(client, p, args.repeat) for p in paths}
+
+    snapshot = app._current_read_model()
+    print(f"Read model loaded in {load_seconds:.2f}s, ~{snapshot.approximate_bytes() / 2**20:.1f} MB")
+    print(f"{'page':45} {'sql p50':>8} {'sql p95':>8} {'mem p50':>8} {'mem p95':>8}  (ms)")
+    for p in paths:
+        print(f"{p:45} {summarize(sql_timings[p])} {summarize(model_timings[p])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
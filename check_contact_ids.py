@@ -0,0 +1,98 @@
+"""Check that concurrent writers can add individuals without waiting on each other.
+
+Opens a transaction that inserts an individual and stays open for --hold
+seconds, as a slow upload would, and meanwhile adds --count individuals
+through app.py's /individual/add from --threads threads. Each add should
+take its contact_id from the sequence and finish long before the open
+transaction does; under the old MAX(contact_id) + 1 fallback every add
+queued behind the table lock. Reports the add latencies, checks the new ids
+are distinct and deletes the individuals it added. Exits non-zero if the
+adds were still running when the open transaction rolled back. Uses the
+database configured for app.py, so run it against a local copy of the data.
+
+    python check_contact_ids.py [--count 40] [--threads 8] [--hold 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ['LOCAL_CACHE_ENABLED'] = '0'
+os.environ['PAGE_CACHE_ENABLED'] = '0'
+os.environ['READ_MODEL_ENABLED'] = '0'
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+
+
+def add_individual(n: int) -> tuple[float, int]:
+    client = app.app.test_client()
+    started = time.perf_counter()
+    response = client.post('/individual/add', data={'first_name': 'Concurrency', 'last_name': f'Check {n}'})
+    elapsed = time.perf_counter() - started
+    if response.status_code != 302:
+        raise SystemExit(f"/individual/add returned {response.status_code}: {response.get_data(as_text=True)[:300]}")
+    return elapsed, int(response.headers['Location'].rstrip('/').rsplit('/', 1)[1])
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--hold', type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    holder = psycopg2.connect(**app.DATABASE)
+    release = threading.Timer(args.hold, holder.rollback)
+    try:
+        with holder.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO individuals (first_name, last_name) VALUES ('Concurrency', 'Check holder') RETURNING contact_id;"
+            )
+            if cursor.fetchone()[0] is None:
+                raise SystemExit("individuals.contact_id has no default; run python migrate_database.py")
+        release.start()
+        hold_started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(add_individual, range(args.count)))
+        done = time.perf_counter() - hold_started
+    finally:
+        release.cancel()
+        if release.is_alive():
+            release.join()
+        holder.rollback()
+        holder.close()
+
+    timings = sorted(elapsed for elapsed, _ in results)
+    ids = [contact_id for _, contact_id in results]
+    conn = psycopg2.connect(**app.DATABASE)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM individuals WHERE contact_id = ANY(%s);", (ids,))
+            with app.app.test_request_context():
+                app._notify_change(cursor, [('individuals', ids)])
+        conn.commit()
+    finally:
+        conn.close()
+
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{args.count} adds from {args.threads} threads while another transaction held an insert open")
+    print(f"median {statistics.median(timings) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms; "
+          f"all done {done:.2f}s into the {args.hold:.0f}s hold")
+    if len(set(ids)) != len(ids):
+        print("FAIL: duplicate contact_ids were handed out")
+        return 1
+    if done >= args.hold:
+        print("FAIL: adds waited for the open transaction")
+        return 1
+    print("OK: no add waited for another writer")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
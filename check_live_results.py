@@ -0,0 +1,66 @@
+"""Check that the live results thread coalesces queued reloads and survives errors.
+
+Queues change notifications for two watched elections on a _LiveResults
+that has no database behind it, one asking for every race of the first
+election and one for race 1 of the second, with more for each queued
+behind them, and checks that its thread reloads each election once with
+the races merged. Then makes one reload fail and checks that the thread
+keeps serving the ones after it. Needs no database.
+
+    python check_live_results.py
+"""
+import os
+import queue
+import sys
+import threading
+
+os.environ['LIVE_RESULTS_ENABLED'] = '0'
+os.environ['READ_MODEL_ENABLED'] = '0'
+
+import app  # noqa: E402
+
+
+def main() -> int:
+    live = app._LiveResults(max_streams=10)
+    reloads: queue.Queue = queue.Queue()
+    fail = {('check', 3)}
+
+    def reload(key, race_ids):
+        if key in fail:
+            fail.discard(key)
+            raise RuntimeError('reload failed on purpose')
+        reloads.put((key, race_ids))
+
+    live._reload = reload
+    everything, one_race = ('check', 1), ('check', 2)
+    # Queued before the thread starts, so its first pass sees them all.
+    for item in [(everything, None), (one_race, {1}), (everything, {5}), (one_race, {4})]:
+        live._work.put(item)
+    live._ensure_thread()
+
+    failures = []
+    first = dict(reloads.get(timeout=5) for _ in range(2))
+    if first != {everything: None, one_race: {1, 4}}:
+        failures.append(f"coalesced reloads were {first}")
+
+    live._work.put((('check', 3), {7}))
+    live._work.put((('check', 4), None))
+    try:
+        after = reloads.get(timeout=5)
+    except queue.Empty:
+        after = None
+    if after != (('check', 4), None):
+        failures.append(f"after a failed reload got {after}")
+    if not any(t.name == 'live-results' and t.is_alive() for t in threading.enumerate()):
+        failures.append("the live-results thread died")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        return 1
+    print("OK: reloads coalesced per election and a failed reload did not stop the thread")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
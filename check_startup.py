@@ -0,0 +1,76 @@
+"""Check app.py's cold start against a time budget.
+
+Runs a fresh interpreter several times, each importing app.py and serving one
+page through the test client, and reports the import time and the time from
+the start of the import to the first response. The first run uses an empty
+Jinja bytecode cache and the rest a warm one, as after a worker or dyno
+restart. Exits non-zero if the median warm import-to-first-response time is
+over the budget, so it can gate a deploy.
+
+    python check_startup.py [--budget-ms 1500] [--path /elections] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get(sys.argv[1])
+done = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_ms': (imported - started) * 1000,
+    'first_response_ms': (done - started) * 1000,
+}))
+"""
+
+
+def probe(path: str, env: dict) -> dict:
+    out = subprocess.run([sys.executable, '-c', _PROBE, path], env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise SystemExit(f"Probe failed:\n{out.stderr}")
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    if result['status'] != 200:
+        raise SystemExit(f"{path} returned {result['status']}")
+    return result
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '1500')))
+    parser.add_argument('--path', default='/elections')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='cocodems_jinja_check_') as cache_dir:
+        env = dict(
+            os.environ,
+            JINJA_CACHE_DIR=cache_dir,
+            LOCAL_CACHE_ENABLED='0',
+            PAGE_CACHE_ENABLED='0',
+            READ_MODEL_ENABLED='0',
+        )
+        cold = probe(args.path, env)
+        warm = [probe(args.path, env) for _ in range(max(1, args.runs - 1))]
+
+    warm_import = statistics.median(r['import_ms'] for r in warm)
+    warm_first = statistics.median(r['first_response_ms'] for r in warm)
+    print(f"{'':6} {'import ms':>10} {'first response ms':>18}")
+    print(f"{'cold':6} {cold['import_ms']:10.1f} {cold['first_response_ms']:18.1f}")
+    print(f"{'warm':6} {warm_import:10.1f} {warm_first:18.1f}   (median of {len(warm)})")
+    if warm_first > args.budget_ms:
+        print(f"FAIL: {args.path} took {warm_first:.0f} ms from import to first response, over the {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,267 @@
+"""Export the public pages to a directory of static files.
+
+Renders the list pages and every election, race, individual, jurisdiction and
+office page through app.py into OUTPUT_DIR (`/race_details/12` becomes
+`race_details/12/index.html`), along with the JSON payloads the list pages
+sort in the browser, copies static/, and writes a manifest with a
+fingerprint of the rows behind each page. On the next run only pages whose
+fingerprint changed are rendered again and pages for deleted rows are removed;
+a change to the templates or the code that renders them re-renders everything.
+Pages are rendered by a pool of processes. --tenant picks which county to
+export when app.py serves several (see tenants.py).
+
+    python export_static.py OUTPUT_DIR [--jobs 4] [--full] [--tenant SLUG]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Render straight from the database; the exporter is its own cache.
+os.environ['LOCAL_CACHE_ENABLED'] = '0'
+os.environ['PAGE_CACHE_ENABLED'] = '0'
+os.environ['READ_MODEL_ENABLED'] = '0'
+os.environ['LIVE_RESULTS_ENABLED'] = '0'
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_NAME = '.export-manifest.json'
+CHUNK_SIZE = 50
+
+# Inputs to rendering other than the data: if any of these change, every page
+# is rendered again.
+RENDER_INPUTS = ['app.py', 'queries.py', 'templates']
+
+# (URL, fingerprint) of each list page. A fingerprint is an md5 of the rows
+# the page shows, so it changes exactly when the page could.
+LIST_PAGES = {
+    '/elections': "SELECT md5(coalesce(string_agg(e::text, '|' ORDER BY e.election_id), '')) FROM elections e;",
+    '/people': """
+        SELECT md5(
+            coalesce((SELECT string_agg(i::text, '|' ORDER BY i.contact_id) FROM individuals i), '')
+            || coalesce((SELECT string_agg(c::text, '|' ORDER BY c.campaign_id) FROM campaigns c WHERE c.elected = 1), '')
+            || CURRENT_DATE::text
+        );
+    """,
+    '/jurisdictions': "SELECT md5(coalesce(string_agg(j::text, '|' ORDER BY j.jurisdiction_id), '')) FROM jurisdictions j;",
+    '/offices': "SELECT md5(coalesce(string_agg(o::text, '|' ORDER BY o.office_id), '')) FROM offices o;",
+}
+
+JSON_PAYLOAD_PAGES = {'/elections', '/people', '/jurisdictions'}
+
+# (URL pattern, query returning (id, fingerprint) for every entity page).
+ENTITY_PAGES = [
+    ('/election_races/{}', """
+        SELECT e.election_id, md5(e::text || coalesce(r.rows, '') || coalesce(c.rows, ''))
+        FROM elections e
+        LEFT JOIN (
+            SELECT election_id, string_agg(r::text, '|' ORDER BY r.race_id) AS rows
+            FROM races r GROUP BY election_id
+        ) r ON r.election_id = e.election_id
+        LEFT JOIN (
+            SELECT r.election_id, string_agg(c::text, '|' ORDER BY c.campaign_id) AS rows
+            FROM campaigns c JOIN races r ON r.race_id = c.race_id
+            WHERE c.elected = 1 GROUP BY r.election_id
+        ) c ON c.election_id = e.election_id;
+    """),
+    ('/race_details/{}', """
+        SELECT r.race_id, md5(r::text || coalesce(c.rows, ''))
+        FROM races r
+        LEFT JOIN (
+            SELECT race_id, string_agg(c::text, '|' ORDER BY c.campaign_id) AS rows
+            FROM campaigns c GROUP BY race_id
+        ) c ON c.race_id = r.race_id;
+    """),
+    ('/individual/{}', """
+        SELECT i.contact_id, md5(i::text || coalesce(c.rows, ''))
+        FROM individuals i
+        LEFT JOIN (
+            SELECT contact_id, string_agg(c::text, '|' ORDER BY c.campaign_id) AS rows
+            FROM campaigns c GROUP BY contact_id
+        ) c ON c.contact_id = i.contact_id;
+    """),
+    ('/jurisdiction/details/{}', """
+        SELECT j.jurisdiction_id, md5(j::text || coalesce(o.rows, '') || coalesce(c.rows, ''))
+        FROM jurisdictions j
+        LEFT JOIN (
+            SELECT jurisdiction_id, string_agg(o::text, '|' ORDER BY o.office_id) AS rows
+            FROM offices o GROUP BY jurisdiction_id
+        ) o ON o.jurisdiction_id = j.jurisdiction_id
+        LEFT JOIN (
+            SELECT o.jurisdiction_id, string_agg(c::text, '|' ORDER BY c.campaign_id) AS rows
+            FROM campaigns c JOIN offices o ON o.office_id = c.office_id
+            WHERE c.elected = 1 GROUP BY o.jurisdiction_id
+        ) c ON c.jurisdiction_id = j.jurisdiction_id;
+    """),
+    ('/office/details/{}', """
+        SELECT o.office_id, md5(o::text || coalesce(r.rows, '') || coalesce(c.rows, ''))
+        FROM offices o
+        LEFT JOIN (
+            SELECT r.office_id, string_agg(r::text || coalesce(e.election_date::text, ''), '|' ORDER BY r.race_id) AS rows
+            FROM races r LEFT JOIN elections e ON e.election_id = r.election_id GROUP BY r.office_id
+        ) r ON r.office_id = o.office_id
+        LEFT JOIN (
+            SELECT office_id, string_agg(c::text, '|' ORDER BY c.campaign_id) AS rows
+            FROM campaigns c WHERE c.elected = 1 GROUP BY office_id
+        ) c ON c.office_id = o.office_id;
+    """),
+]
+
+
+def render_fingerprint() -> str:
+    digest = hashlib.md5()
+    for name in RENDER_INPUTS:
+        path = os.path.join(BASE_DIR, name)
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, f) for root, _, fs in os.walk(path) for f in fs
+        )
+        for file_path in files:
+            digest.update(os.path.relpath(file_path, BASE_DIR).encode())
+            with open(file_path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def page_fingerprints(tenant) -> dict[str, str]:
+    pages = {}
+    conn = psycopg2.connect(**app.DATABASE, options=f'-c search_path={tenant.schema}')
+    try:
+        with conn.cursor() as cursor:
+            for url, sql in LIST_PAGES.items():
+                cursor.execute(sql)
+                pages[url] = cursor.fetchone()[0]
+            for pattern, sql in ENTITY_PAGES:
+                cursor.execute(sql)
+                for entity_id, fingerprint in cursor.fetchall():
+                    if entity_id is not None:
+                        pages[pattern.format(entity_id)] = fingerprint
+    finally:
+        conn.close()
+    # The JSON payloads that list pages sort in the browser show the same rows.
+    for url in list(pages):
+        if url in JSON_PAYLOAD_PAGES or url.startswith('/election_races/'):
+            pages[f'{url}.json'] = pages[url]
+    return pages
+
+
+def output_path(output_dir: str, url: str) -> str:
+    if url.endswith('.json'):
+        return os.path.join(output_dir, url.strip('/'))
+    return os.path.join(output_dir, url.strip('/'), 'index.html')
+
+
+def load_manifest(output_dir: str) -> dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+_client = None
+
+
+def _init_worker(tenant_slug: str) -> None:
+    global _client
+    _client = app.app.test_client()
+    _client.environ_base[app.tenants.ENVIRON_KEY] = tenant_slug
+
+
+def render_pages(output_dir: str, urls: list[str]) -> list[tuple[str, int]]:
+    """Render urls into output_dir in a pool worker; return (url, status) for each."""
+    results = []
+    for url in urls:
+        response = _client.get(url)
+        if response.status_code == 200:
+            write_atomic(output_path(output_dir, url), response.get_data())
+        results.append((url, response.status_code))
+    return results
+
+
+def remove_page(output_dir: str, url: str) -> None:
+    path = output_path(output_dir, url)
+    try:
+        os.remove(path)
+        os.removedirs(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def copy_static(output_dir: str) -> None:
+    import shutil
+
+    shutil.copytree(os.path.join(BASE_DIR, 'static'), os.path.join(output_dir, 'static'), dirs_exist_ok=True)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_dir')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--full', action='store_true', help='render every page, ignoring the manifest')
+    parser.add_argument('--tenant', help='tenant to export (default: the default or only one)')
+    args = parser.parse_args(argv)
+    tenant = app.TENANTS.get(args.tenant) if args.tenant else (app.TENANTS.default or next(iter(app.TENANTS)))
+    if tenant is None:
+        parser.error(f"unknown tenant {args.tenant!r}")
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    manifest = {} if args.full else load_manifest(output_dir)
+    render_version = render_fingerprint()
+    previous = manifest.get('pages', {}) if manifest.get('render_version') == render_version else {}
+    pages = page_fingerprints(tenant)
+
+    stale = [url for url, fingerprint in pages.items() if previous.get(url) != fingerprint]
+    removed = [url for url in manifest.get('pages', {}) if url not in pages]
+    chunks = [stale[i:i + CHUNK_SIZE] for i in range(0, len(stale), CHUNK_SIZE)]
+
+    failed = {}
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(tenant.slug,)) as pool:
+        for results in pool.map(render_pages, [output_dir] * len(chunks), chunks):
+            for url, status in results:
+                if status != 200:
+                    failed[url] = status
+
+    for url in removed:
+        remove_page(output_dir, url)
+    for url, status in failed.items():
+        if status == 404:
+            # Deleted between fingerprinting and rendering; drop it until the next run.
+            remove_page(output_dir, url)
+        pages.pop(url, None)
+
+    # The site root is the elections list, as in app.py.
+    if '/elections' in stale or not os.path.exists(os.path.join(output_dir, 'index.html')):
+        with open(output_path(output_dir, '/elections'), 'rb') as f:
+            write_atomic(os.path.join(output_dir, 'index.html'), f.read())
+    copy_static(output_dir)
+
+    write_atomic(
+        os.path.join(output_dir, MANIFEST_NAME),
+        json.dumps({'render_version': render_version, 'exported_at': time.time(), 'pages': pages}).encode(),
+    )
+
+    print(f"Rendered {len(stale) - len(failed)} of {len(pages) + len(failed)} pages "
+          f"({len(removed)} removed) in {time.perf_counter() - started:.1f}s")
+    for url, status in sorted(failed.items()):
+        print(f"  {url}: HTTP {status}", file=sys.stderr)
+    return 1 if any(status != 404 for status in failed.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
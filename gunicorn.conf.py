@@ -0,0 +1,109 @@
+"""Gunicorn settings for app.py, read automatically by `gunicorn app:app`.
+
+Everything can be overridden from the environment:
+
+* GUNICORN_WORKER_CLASS: `gthread` (default), `gevent` or `sync`. gevent
+  also needs `pip install gevent psycogreen`.
+* WEB_CONCURRENCY: worker processes. Defaults to cores + 1 for gthread,
+  cores for gevent and 2 * cores + 1 for sync.
+* GUNICORN_THREADS: threads per gthread worker (default 4).
+* GUNICORN_WORKER_CONNECTIONS: concurrent requests per gevent worker
+  (default 50). They share the worker's DB_POOL_MAX_SIZE database
+  connections, so keep workers * DB_POOL_MAX_SIZE under the server's
+  max_connections.
+* GUNICORN_PRELOAD: import the app once in the master before forking
+  (default on).
+* GUNICORN_KEEPALIVE: seconds to hold an idle keep-alive connection
+  (default 5). The sync worker class does not support keep-alive.
+* GUNICORN_TIMEOUT: seconds before a silent worker is killed and restarted.
+* GUNICORN_GRACEFUL_TIMEOUT: seconds a worker gets to finish its requests
+  on restart (default 30).
+* GUNICORN_CHECK_MIGRATIONS: refuse to start while a tenant's schema has
+  migrations pending (default on).
+"""
+import os
+
+_WORKER_CLASSES = {'gthread', 'gevent', 'sync'}
+
+
+def _cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+cores = _cores()
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class not in _WORKER_CLASSES:
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be one of {sorted(_WORKER_CLASSES)}, not {worker_class!r}")
+
+if worker_class == 'gevent':
+    # Patch before the app is preloaded, or the locks and sockets it creates
+    # at import are the blocking kind and the workers hang on them. psycopg2
+    # also blocks the whole worker on every query unless its wait callback
+    # is made cooperative.
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+if worker_class == 'sync':
+    workers = 2 * cores + 1
+elif worker_class == 'gevent':
+    workers = cores
+else:
+    workers = cores + 1
+workers = int(os.getenv('WEB_CONCURRENCY') or workers)
+
+threads = int(os.getenv('GUNICORN_THREADS', '4')) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '50'))
+
+bind = os.getenv('GUNICORN_BIND') or f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') not in {'0', 'false', 'False', ''}
+
+# Idle keep-alive connections behind the router; shorter than its own idle
+# timeout so the worker, not the router, closes them.
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# gthread and gevent workers keep heartbeating while a request runs, so the
+# timeout only catches hung workers. A sync worker is silent for the whole
+# request, so its timeout has to cover the slowest admin request (backups,
+# reloads and uploads run under the admin statement timeout).
+if worker_class == 'sync':
+    timeout = int(os.getenv('DB_ADMIN_STATEMENT_TIMEOUT_MS', '300000')) // 1000 + 30
+else:
+    timeout = 30
+timeout = int(os.getenv('GUNICORN_TIMEOUT') or timeout)
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+# Write worker heartbeat files to memory rather than a possibly slow disk.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+check_migrations = os.getenv('GUNICORN_CHECK_MIGRATIONS', '1') not in {'0', 'false', 'False', ''}
+
+
+def on_starting(server):
+    # Pages read tables the migrations create (race_summary, data_versions,
+    # upload_jobs), so a schema that is behind would answer them with 500s.
+    # An unreachable database is left to fail per request, as before.
+    if not check_migrations:
+        return
+    import psycopg2
+
+    from migrate_database import TENANTS, pending_migrations
+
+    for tenant in TENANTS:
+        try:
+            pending = pending_migrations(tenant.schema)
+        except psycopg2.OperationalError as e:
+            server.log.warning("Could not check migrations for %s: %s", tenant.schema, e)
+            continue
+        if pending:
+            raise SystemExit(
+                f"Schema {tenant.schema} is missing migrations {', '.join(pending)}; "
+                "run python migrate_database.py --all-tenants"
+            )
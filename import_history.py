@@ -0,0 +1,395 @@
+"""Bulk-load a multi-year election results file such as processed_election_data.csv.
+
+Streams the file into a temporary staging table with COPY, then derives the
+elections, races, individuals and campaigns it describes with set-based
+INSERT ... SELECT ... ON CONFLICT statements, all in one transaction, so a
+run loads the whole file or nothing. Ids are those the races upload in
+app.py assigns: election_id is the election date as YYYYMMDD, office_id is
+jurisdiction_id * 100 + office_name_id and race_id is election_id * 10^7 +
+office_id, and races get the same names, seats and April term dates.
+Running the import again updates the rows in place. Candidates with a
+numeric Contact ID keep it; the rest are matched to individuals by name as
+/admin/clean_candidates does, and anyone not found is added. Needs the unique
+indexes from migrations/003_natural_keys.sql (python migrate_database.py).
+
+    python import_history.py [CSV] [--tenant SLUG] [--dry-run]
+"""
+import argparse
+import csv
+import re
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import app
+
+REQUIRED_COLUMNS = [
+    'Jurisdiction',
+    'Office',
+    'Votes Received',
+    'Percent Received',
+    'Total Votes',
+    'Elected',
+    'Election Date',
+    'Term (years)',
+    'Office Start Date',
+    'Re-Election Date',
+    'Term End Date',
+    'First Name',
+    'Middle Name',
+    'Last Name',
+    'Contact ID',
+]
+
+# Parsing helpers with the same rules as app.py's _parse_date_mdy,
+# _parse_int_field and _name_key. They live in pg_temp, so they vanish with
+# the session.
+HELPERS = r"""
+CREATE FUNCTION pg_temp.mdy(s text) RETURNS date AS $$
+    SELECT CASE
+        WHEN btrim(s) = '' THEN NULL
+        WHEN split_part(btrim(s), '/', 3) ~ '^\d{2}$' THEN to_date(btrim(s), 'MM/DD/YY')
+        ELSE to_date(btrim(s), 'MM/DD/YYYY')
+    END
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION pg_temp.int_or(s text, fallback bigint) RETURNS bigint AS $$
+    SELECT COALESCE(trunc(NULLIF(btrim(s), '')::numeric)::bigint, fallback)
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION pg_temp.name_part(s text) RETURNS text AS $$
+    SELECT lower(btrim(regexp_replace(replace(coalesce(s, ''), '.', ' '), '\s+', ' ', 'g')))
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE FUNCTION pg_temp.name_key(first_name text, middle_name text, last_name text) RETURNS text AS $$
+    SELECT pg_temp.name_part(first_name) || '|' || pg_temp.name_part(middle_name) || '|' || pg_temp.name_part(last_name)
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+# One row per usable line of the file, with the values the upload computes.
+PARSE = """
+CREATE TEMP TABLE import_parsed ON COMMIT DROP AS
+SELECT
+    s.line,
+    btrim(s.jurisdiction) AS jurisdiction,
+    btrim(s.office) AS office_name,
+    j.jurisdiction_id,
+    o.office_name_id,
+    btrim(s.first_name) AS first_name,
+    btrim(coalesce(s.middle_name, '')) AS middle_name,
+    btrim(s.last_name) AS last_name,
+    CASE WHEN btrim(s.contact_id) ~ '^\\d+$' THEN btrim(s.contact_id)::bigint END AS contact_id,
+    pg_temp.int_or(s.votes_received, 0) AS votes_received,
+    coalesce(NULLIF(btrim(s.percent_received), '')::double precision, 0) AS percent_received,
+    pg_temp.int_or(s.total_votes, 0) AS total_votes,
+    CASE WHEN btrim(s.elected) IN ('1', 'true', 'True', 'YES', 'Yes') THEN 1 ELSE 0 END AS elected,
+    pg_temp.mdy(s.election_date) AS election_date,
+    pg_temp.int_or(s.term_years, 0) AS term_years,
+    pg_temp.mdy(s.office_start_date) AS office_start_date,
+    pg_temp.mdy(s.re_election_date) AS reelection_date,
+    pg_temp.mdy(s.term_end_date) AS term_end_date
+FROM import_rows s
+LEFT JOIN (
+    SELECT jurisdiction_name, min(jurisdiction_id) AS jurisdiction_id
+    FROM jurisdictions GROUP BY jurisdiction_name
+) j ON j.jurisdiction_name = btrim(s.jurisdiction)
+LEFT JOIN (
+    SELECT office_name, min(office_name_id) AS office_name_id
+    FROM offices GROUP BY office_name
+) o ON o.office_name = btrim(s.office)
+WHERE btrim(coalesce(s.jurisdiction, '')) <> '' AND btrim(coalesce(s.office, '')) <> '';
+
+ALTER TABLE import_parsed
+    ADD COLUMN election_id bigint,
+    ADD COLUMN office_id bigint,
+    ADD COLUMN race_id bigint;
+
+UPDATE import_parsed SET
+    election_id = to_char(election_date, 'YYYYMMDD')::bigint,
+    office_id = jurisdiction_id * 100 + office_name_id,
+    race_id = to_char(election_date, 'YYYYMMDD')::bigint * 10000000 + jurisdiction_id * 100 + office_name_id;
+"""
+
+UNKNOWN_REFERENCES = """
+SELECT 'Jurisdiction', jurisdiction FROM import_parsed WHERE jurisdiction_id IS NULL
+UNION
+SELECT 'Office', office_name FROM import_parsed WHERE office_name_id IS NULL
+ORDER BY 1, 2;
+"""
+
+ELECTIONS = """
+INSERT INTO elections (election_id, election_name, election_date)
+SELECT DISTINCT election_id, to_char(election_date, 'FMMonth YYYY') || ' election', election_date
+FROM import_parsed
+WHERE election_id IS NOT NULL
+ON CONFLICT (election_id) DO NOTHING
+RETURNING election_id;
+"""
+
+# A race takes its total votes and term from its first line, and a seat for
+# every elected candidate, as in the upload.
+RACES = """
+INSERT INTO races (
+    race_id, race_name, jurisdiction, jurisdiction_id, office_name, office_name_id, office_id,
+    election_id, seats, total_votes, term_years, term_start_date, reelection_date, term_end_date
+)
+SELECT
+    r.race_id,
+    extract(year FROM r.election_date)::int || ' ' || r.jurisdiction || '/' || r.office_name,
+    r.jurisdiction, r.jurisdiction_id, r.office_name, r.office_name_id, r.office_id,
+    r.election_id, r.seats, r.total_votes, r.term_years,
+    t.term_start_date, t.reelection_date, t.term_end_date
+FROM (
+    SELECT DISTINCT ON (race_id) *,
+        count(*) FILTER (WHERE elected = 1) OVER (PARTITION BY race_id) AS seats
+    FROM import_parsed
+    WHERE race_id IS NOT NULL
+    ORDER BY race_id, line
+) r
+JOIN import_terms t ON t.year = extract(year FROM r.election_date) AND t.term_years = r.term_years
+ON CONFLICT (race_id) DO UPDATE SET
+    race_name = EXCLUDED.race_name,
+    jurisdiction = EXCLUDED.jurisdiction,
+    jurisdiction_id = EXCLUDED.jurisdiction_id,
+    office_name = EXCLUDED.office_name,
+    office_name_id = EXCLUDED.office_name_id,
+    office_id = EXCLUDED.office_id,
+    election_id = EXCLUDED.election_id,
+    seats = EXCLUDED.seats,
+    total_votes = EXCLUDED.total_votes,
+    term_years = EXCLUDED.term_years,
+    term_start_date = EXCLUDED.term_start_date,
+    reelection_date = EXCLUDED.reelection_date,
+    term_end_date = EXCLUDED.term_end_date
+WHERE (races.race_name, races.jurisdiction, races.jurisdiction_id, races.office_name, races.office_name_id,
+       races.office_id, races.election_id, races.seats, races.total_votes, races.term_years,
+       races.term_start_date, races.reelection_date, races.term_end_date)
+    IS DISTINCT FROM
+      (EXCLUDED.race_name, EXCLUDED.jurisdiction, EXCLUDED.jurisdiction_id, EXCLUDED.office_name, EXCLUDED.office_name_id,
+       EXCLUDED.office_id, EXCLUDED.election_id, EXCLUDED.seats, EXCLUDED.total_votes, EXCLUDED.term_years,
+       EXCLUDED.term_start_date, EXCLUDED.reelection_date, EXCLUDED.term_end_date)
+RETURNING race_id;
+"""
+
+# Candidates without a Contact ID: match by name (the oldest individual of
+# that name), add those not found, then match again.
+MATCH_INDIVIDUALS = """
+UPDATE import_parsed p
+SET contact_id = i.contact_id
+FROM (
+    SELECT pg_temp.name_key(first_name, middle_name, last_name) AS name_key, min(contact_id) AS contact_id
+    FROM individuals
+    GROUP BY 1
+) i
+WHERE p.contact_id IS NULL AND p.first_name <> '' AND p.last_name <> ''
+  AND i.name_key = pg_temp.name_key(p.first_name, p.middle_name, p.last_name);
+"""
+
+ADD_INDIVIDUALS = """
+INSERT INTO individuals (
+    first_name, middle_name, last_name, full_name,
+    email, phone, address, city, state, zip,
+    candidate_status, party_affiliation, democratic_alignment, area, notes
+)
+SELECT DISTINCT ON (pg_temp.name_key(p.first_name, p.middle_name, p.last_name))
+    p.first_name, p.middle_name, p.last_name,
+    btrim(p.last_name || ', ' || p.first_name || CASE WHEN p.middle_name <> '' THEN ' ' || p.middle_name ELSE '' END),
+    '', '', '', c.city, 'WI', '', '', '', '', '', ''
+FROM import_parsed p
+JOIN import_cities c ON c.jurisdiction = p.jurisdiction
+WHERE p.contact_id IS NULL AND p.first_name <> '' AND p.last_name <> ''
+ORDER BY pg_temp.name_key(p.first_name, p.middle_name, p.last_name), p.line
+RETURNING contact_id;
+"""
+
+# A candidate listed twice in one race keeps the last line, as in the upload.
+CAMPAIGNS = """
+INSERT INTO campaigns (
+    campaign_name, race_id, candidate_name, contact_id, jurisdiction, jurisdiction_id,
+    office_name, office_name_id, office_id, votes_received, percent_received, total_votes,
+    elected, election_date, term_years, term_start_date, reelection_date, term_end_date
+)
+SELECT
+    c.candidate_name || ' for ' || c.jurisdiction || '/' || c.office_name || ' ' || extract(year FROM c.election_date)::int,
+    c.race_id, c.candidate_name, c.contact_id, c.jurisdiction, c.jurisdiction_id,
+    c.office_name, c.office_name_id, c.office_id, c.votes_received, c.percent_received, c.total_votes,
+    c.elected, c.election_date, c.term_years, c.office_start_date, c.reelection_date, c.term_end_date
+FROM (
+    SELECT DISTINCT ON (race_id, contact_id) *,
+        first_name || ' ' || CASE WHEN middle_name <> '' THEN middle_name || ' ' ELSE '' END || last_name AS candidate_name
+    FROM import_parsed
+    WHERE race_id IS NOT NULL AND contact_id IS NOT NULL AND first_name <> '' AND last_name <> ''
+    ORDER BY race_id, contact_id, line DESC
+) c
+ON CONFLICT (race_id, contact_id) DO UPDATE SET
+    campaign_name = EXCLUDED.campaign_name,
+    candidate_name = EXCLUDED.candidate_name,
+    jurisdiction = EXCLUDED.jurisdiction,
+    jurisdiction_id = EXCLUDED.jurisdiction_id,
+    office_name = EXCLUDED.office_name,
+    office_name_id = EXCLUDED.office_name_id,
+    office_id = EXCLUDED.office_id,
+    votes_received = EXCLUDED.votes_received,
+    percent_received = EXCLUDED.percent_received,
+    total_votes = EXCLUDED.total_votes,
+    elected = EXCLUDED.elected,
+    election_date = EXCLUDED.election_date,
+    term_years = EXCLUDED.term_years,
+    term_start_date = EXCLUDED.term_start_date,
+    reelection_date = EXCLUDED.reelection_date,
+    term_end_date = EXCLUDED.term_end_date
+WHERE (campaigns.campaign_name, campaigns.candidate_name, campaigns.jurisdiction, campaigns.jurisdiction_id,
+       campaigns.office_name, campaigns.office_name_id, campaigns.office_id, campaigns.votes_received,
+       campaigns.percent_received, campaigns.total_votes, campaigns.elected, campaigns.election_date,
+       campaigns.term_years, campaigns.term_start_date, campaigns.reelection_date, campaigns.term_end_date)
+    IS DISTINCT FROM
+      (EXCLUDED.campaign_name, EXCLUDED.candidate_name, EXCLUDED.jurisdiction, EXCLUDED.jurisdiction_id,
+       EXCLUDED.office_name, EXCLUDED.office_name_id, EXCLUDED.office_id, EXCLUDED.votes_received,
+       EXCLUDED.percent_received, EXCLUDED.total_votes, EXCLUDED.elected, EXCLUDED.election_date,
+       EXCLUDED.term_years, EXCLUDED.term_start_date, EXCLUDED.reelection_date, EXCLUDED.term_end_date)
+RETURNING race_id, contact_id;
+"""
+
+
+def column_name(header: str) -> str:
+    """Staging column for a CSV header: 'Re-Election Date' -> re_election_date."""
+    return re.sub(r'\W+', '_', header.strip().lower()).strip('_')
+
+
+class Timer:
+    def __init__(self):
+        self.steps: list[tuple[str, float]] = []
+        self._last = time.perf_counter()
+
+    def step(self, name: str) -> None:
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='?', default='processed_election_data.csv')
+    parser.add_argument('--tenant', help='tenant to load into (default: the default or only one)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change, then roll back')
+    args = parser.parse_args(argv)
+    tenant = app.TENANTS.get(args.tenant) if args.tenant else (app.TENANTS.default or next(iter(app.TENANTS)))
+    if tenant is None:
+        parser.error(f"unknown tenant {args.tenant!r}")
+
+    with open(args.csv, encoding='utf-8-sig', newline='') as f:
+        headers = next(csv.reader(f), [])
+    missing = [c for c in REQUIRED_COLUMNS if c not in [h.strip() for h in headers]]
+    if missing:
+        print(f"{args.csv} is missing required columns: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    columns = [column_name(h) for h in headers]
+
+    timer = Timer()
+    conn = psycopg2.connect(**app.DATABASE, options=f'-c search_path={tenant.schema}')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(HELPERS)
+            cursor.execute(
+                f"CREATE TEMP TABLE import_rows (line bigserial, {', '.join(f'{c} text' for c in columns)}) ON COMMIT DROP;"
+            )
+            with open(args.csv, encoding='utf-8-sig', newline='') as f:
+                cursor.copy_expert(
+                    f"COPY import_rows ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true);", f
+                )
+            staged = cursor.rowcount
+            timer.step('copy')
+
+            cursor.execute(PARSE)
+            cursor.execute(UNKNOWN_REFERENCES)
+            unknown = cursor.fetchall()
+            if unknown:
+                for kind, name in unknown:
+                    print(f"{kind} not found: {name}", file=sys.stderr)
+                print(f"Nothing imported: {len(unknown)} unknown jurisdictions or offices", file=sys.stderr)
+                conn.rollback()
+                return 1
+
+            # Term dates and cities come from app.py's rules, once per
+            # distinct value rather than per line.
+            cursor.execute("SELECT DISTINCT extract(year FROM election_date)::int, term_years FROM import_parsed;")
+            terms = [
+                (year, term_years, app._fourth_monday_in_april(year),
+                 app._first_tuesday_in_april(year + (term_years or 0)),
+                 app._fourth_monday_in_april(year + (term_years or 0)))
+                for year, term_years in cursor.fetchall()
+            ]
+            cursor.execute(
+                "CREATE TEMP TABLE import_terms (year int, term_years bigint, term_start_date date, "
+                "reelection_date date, term_end_date date) ON COMMIT DROP;"
+            )
+            execute_values(cursor, "INSERT INTO import_terms VALUES %s;", terms)
+            cursor.execute("SELECT DISTINCT jurisdiction FROM import_parsed;")
+            cities = [
+                (jurisdiction, app._infer_city_from_jurisdiction(jurisdiction) or jurisdiction)
+                for (jurisdiction,) in cursor.fetchall()
+            ]
+            cursor.execute("CREATE TEMP TABLE import_cities (jurisdiction text, city text) ON COMMIT DROP;")
+            execute_values(cursor, "INSERT INTO import_cities VALUES %s;", cities)
+            timer.step('parse')
+
+            cursor.execute(ELECTIONS)
+            election_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(RACES)
+            race_ids = [row[0] for row in cursor.fetchall()]
+            timer.step('elections and races')
+
+            cursor.execute(MATCH_INDIVIDUALS)
+            cursor.execute(ADD_INDIVIDUALS)
+            contact_ids = [row[0] for row in cursor.fetchall()]
+            if contact_ids and None in contact_ids:
+                raise ValueError(app._NO_CONTACT_ID_DEFAULT)
+            cursor.execute(MATCH_INDIVIDUALS)
+            timer.step('individuals')
+
+            cursor.execute(CAMPAIGNS)
+            campaigns = cursor.fetchall()
+            cursor.execute(
+                "SELECT count(*) FROM import_parsed "
+                "WHERE race_id IS NULL OR contact_id IS NULL OR first_name = '' OR last_name = '';"
+            )
+            skipped = cursor.fetchone()[0]
+            timer.step('campaigns')
+
+            changed_races = sorted(set(race_ids) | {race_id for race_id, _ in campaigns})
+            with app.app.test_request_context(environ_base={app.tenants.ENVIRON_KEY: tenant}):
+                app._notify_change(
+                    cursor,
+                    [
+                        ('elections', election_ids + [race_id // 10000000 for race_id in changed_races]),
+                        ('races', changed_races),
+                        ('campaigns', changed_races),
+                        ('individuals', contact_ids + [contact_id for _, contact_id in campaigns]),
+                    ],
+                )
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        timer.step('commit')
+    except (psycopg2.Error, ValueError) as e:
+        conn.rollback()
+        print(f"Import failed, nothing was written: {str(e).strip()}", file=sys.stderr)
+        if getattr(e, 'pgcode', None) == '42P10':
+            print("Run python migrate_database.py to add the unique indexes the import needs.", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    print(f"{'Would import' if args.dry_run else 'Imported'} {staged} lines into {tenant.schema}: "
+          f"{len(election_ids)} new elections, {len(race_ids)} races and {len(campaigns)} campaigns added or changed, "
+          f"{len(contact_ids)} new individuals; {skipped} lines without an election date or candidate skipped")
+    total = sum(seconds for _, seconds in timer.steps)
+    print('  ' + ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timer.steps) + f"; total {total:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
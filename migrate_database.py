@@ -0,0 +1,122 @@
+"""Apply the SQL files in migrations/ that have not been applied yet.
+
+Each file runs in its own transaction and is recorded in schema_migrations,
+so running this script again is safe. Database settings come from the same
+environment variables as app.py. Each tenant's schema is migrated (and
+created if missing) separately, and has its own schema_migrations.
+
+    python migrate_database.py                  # apply pending migrations
+    python migrate_database.py --list           # show applied/pending migrations
+    python migrate_database.py --tenant sauk    # migrate one tenant's schema
+    python migrate_database.py --all-tenants    # migrate every tenant's schema
+
+gunicorn.conf.py calls pending_migrations() at startup and refuses to serve
+a schema that is behind.
+"""
+import os
+import sys
+
+import psycopg2
+
+from app import DATABASE, TENANTS
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def migration_files() -> list[str]:
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql'))
+
+
+def applied_migrations(cursor) -> set[str]:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name text PRIMARY KEY,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        );
+        """
+    )
+    cursor.execute("SELECT name FROM schema_migrations;")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def pending_migrations(schema: str) -> list[str]:
+    """The migrations not yet applied to schema, without writing anything."""
+    conn = psycopg2.connect(**DATABASE)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s);", (f'{schema}.schema_migrations',))
+            if cursor.fetchone()[0] is None:
+                return migration_files()
+            cursor.execute(f"SELECT name FROM {schema}.schema_migrations;")
+            applied = {row[0] for row in cursor.fetchall()}
+        conn.rollback()
+    finally:
+        conn.close()
+    return [f for f in migration_files() if f not in applied]
+
+
+def main(argv: list[str]) -> int:
+    if '--all-tenants' in argv:
+        schemas = [tenant.schema for tenant in TENANTS]
+    elif '--tenant' in argv:
+        slug = argv[argv.index('--tenant') + 1] if argv.index('--tenant') + 1 < len(argv) else ''
+        tenant = TENANTS.get(slug)
+        if tenant is None:
+            print(f"Unknown tenant {slug!r}; configured: {', '.join(t.slug for t in TENANTS)}", file=sys.stderr)
+            return 2
+        schemas = [tenant.schema]
+    else:
+        schemas = [(TENANTS.default or next(iter(TENANTS))).schema]
+    for schema in schemas:
+        if len(schemas) > 1:
+            print(f"== {schema}")
+        status = migrate(schema, argv)
+        if status:
+            return status
+    return 0
+
+
+def migrate(schema: str, argv: list[str]) -> int:
+    conn = psycopg2.connect(**DATABASE)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s;", (schema,))
+            if cursor.fetchone() is None:
+                cursor.execute(f'CREATE SCHEMA {schema};')
+            cursor.execute("SELECT set_config('search_path', %s, false);", (schema,))
+        conn.commit()
+
+        with conn.cursor() as cursor:
+            applied = applied_migrations(cursor)
+        conn.commit()
+
+        pending = [f for f in migration_files() if f not in applied]
+        if '--list' in argv:
+            for name in migration_files():
+                print(f"{'applied' if name in applied else 'pending'}  {name}")
+            return 0
+
+        for name in pending:
+            with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+                sql = f.read()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+                    cursor.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (name,))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Error applying {name}: {e}", file=sys.stderr)
+                return 1
+            print(f"Applied {name}")
+
+        if not pending:
+            print("Database is up to date.")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
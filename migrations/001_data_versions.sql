@@ -0,0 +1,18 @@
+-- Per-table change counters. Write paths in app.py bump the rows for the
+-- tables they touch in the same transaction, so the sum of all versions
+-- identifies a snapshot of the data (used to key the shared page cache).
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 0
+);
+
+INSERT INTO data_versions (table_name)
+VALUES
+    ('campaigns'),
+    ('elections'),
+    ('individuals'),
+    ('jurisdictions'),
+    ('office_names'),
+    ('offices'),
+    ('races')
+ON CONFLICT (table_name) DO NOTHING;
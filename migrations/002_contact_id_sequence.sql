@@ -0,0 +1,27 @@
+-- New individuals take their contact_id from a sequence, so concurrent
+-- inserts never wait on each other for MAX(contact_id) + 1. Safe to run
+-- again: app.py runs this file after /admin/reload, since a dump taken
+-- before this migration restores the table without the default, and the
+-- restored ids can be past the sequence.
+DO $$
+DECLARE
+    seq text := pg_get_serial_sequence('individuals', 'contact_id');
+    last_id bigint;
+BEGIN
+    IF seq IS NULL THEN
+        CREATE SEQUENCE IF NOT EXISTS individuals_contact_id_seq;
+        ALTER SEQUENCE individuals_contact_id_seq OWNED BY individuals.contact_id;
+        ALTER TABLE individuals ALTER COLUMN contact_id SET DEFAULT nextval('individuals_contact_id_seq');
+        seq := pg_get_serial_sequence('individuals', 'contact_id');
+    END IF;
+
+    -- Never move the sequence back: ids of deleted individuals may still
+    -- be referenced by campaigns.
+    SELECT GREATEST(MAX(contact_id), pg_sequence_last_value(seq::regclass)) INTO last_id FROM individuals;
+    IF last_id IS NULL THEN
+        PERFORM setval(seq, 1, false);
+    ELSE
+        PERFORM setval(seq, last_id, true);
+    END IF;
+END
+$$;
@@ -0,0 +1,32 @@
+-- Unique indexes on the keys the bulk importer (import_history.py) upserts
+-- on with ON CONFLICT, and the races upload matches rows by. Tables that
+-- already have a unique index or primary key on exactly these columns are
+-- left alone. Fails, naming the key, if the table holds duplicates; remove
+-- them (re-uploading the race replaces duplicate campaigns) and run again.
+CREATE OR REPLACE FUNCTION pg_temp.ensure_unique_index(tbl regclass, cols text[], index_name text) RETURNS void AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_index i
+        WHERE i.indrelid = tbl
+          AND i.indisunique
+          AND i.indpred IS NULL
+          AND ARRAY(
+              SELECT a.attname::text
+              FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k (attnum, ord)
+              JOIN pg_attribute a ON a.attrelid = tbl AND a.attnum = k.attnum
+              ORDER BY k.ord
+          ) = cols
+    ) THEN
+        RETURN;
+    END IF;
+    EXECUTE format(
+        'CREATE UNIQUE INDEX %I ON %s (%s)',
+        index_name, tbl, (SELECT string_agg(quote_ident(c), ', ') FROM unnest(cols) AS c)
+    );
+END
+$$ LANGUAGE plpgsql;
+
+SELECT pg_temp.ensure_unique_index('elections', ARRAY['election_id'], 'elections_election_id_key');
+SELECT pg_temp.ensure_unique_index('races', ARRAY['race_id'], 'races_race_id_key');
+SELECT pg_temp.ensure_unique_index('campaigns', ARRAY['race_id', 'contact_id'], 'campaigns_race_id_contact_id_key');
@@ -0,0 +1,148 @@
+-- One row per race with the facts the race and office pages used to
+-- aggregate from campaigns on every request: the winners (in order of votes),
+-- how many candidates ran and were elected, whether more candidates ran than
+-- there were seats (or winners, where the two disagree) and the votes
+-- separating the two leading candidates.
+-- Triggers on campaigns and races keep it current in the writing
+-- transaction, refreshing only the races a statement touched. Safe to run
+-- again; /admin/reload does after a restore, which drops the triggers along
+-- with the tables.
+CREATE TABLE IF NOT EXISTS race_summary (
+    race_id bigint PRIMARY KEY,
+    office_id bigint,
+    election_date timestamp without time zone,
+    candidate_count integer NOT NULL,
+    elected_count integer NOT NULL,
+    contested boolean NOT NULL,
+    top_margin bigint,
+    winners jsonb NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS race_summary_office_idx ON race_summary (office_id, election_date);
+
+-- Recompute the summaries of race_ids, dropping those of races that no
+-- longer have a row in races or campaigns. Transactions refreshing the same
+-- race take turns: each statement of the function gets a fresh snapshot, so
+-- once the race's lock is granted the INSERT sees the rows the previous
+-- holder committed, rather than overwriting its summary with one computed
+-- before it did.
+CREATE OR REPLACE FUNCTION refresh_race_summary(race_ids bigint[]) RETURNS void
+LANGUAGE sql
+SET search_path FROM CURRENT
+AS $$
+    SELECT pg_advisory_xact_lock(id) FROM unnest(race_ids) id ORDER BY id;
+
+    INSERT INTO race_summary (
+        race_id, office_id, election_date, candidate_count, elected_count, contested, top_margin, winners
+    )
+    SELECT
+        ids.race_id,
+        COALESCE(c.office_id, r.office_id),
+        c.election_date,
+        COALESCE(c.candidate_count, 0),
+        COALESCE(c.elected_count, 0),
+        COALESCE(c.candidate_count, 0) > GREATEST(r.seats, c.elected_count, 1),
+        c.top_margin,
+        COALESCE(c.winners, '[]'::jsonb)
+    FROM (
+        SELECT race_id FROM races WHERE race_id = ANY(race_ids)
+        UNION
+        SELECT race_id FROM campaigns WHERE race_id = ANY(race_ids)
+    ) ids
+    LEFT JOIN LATERAL (
+        SELECT seats, office_id FROM races WHERE race_id = ids.race_id LIMIT 1
+    ) r ON true
+    LEFT JOIN LATERAL (
+        SELECT
+            max(ranked.office_id) AS office_id,
+            max(ranked.election_date) AS election_date,
+            count(*)::integer AS candidate_count,
+            count(*) FILTER (WHERE ranked.elected = 1)::integer AS elected_count,
+            max(ranked.votes_received) FILTER (WHERE ranked.place = 1)
+                - max(ranked.votes_received) FILTER (WHERE ranked.place = 2) AS top_margin,
+            jsonb_agg(
+                jsonb_build_object('candidate_name', ranked.candidate_name, 'contact_id', ranked.contact_id)
+                ORDER BY ranked.place
+            ) FILTER (WHERE ranked.elected = 1) AS winners
+        FROM (
+            SELECT
+                office_id, election_date, elected, votes_received, candidate_name, contact_id,
+                row_number() OVER (ORDER BY votes_received DESC NULLS LAST, campaign_id DESC) AS place
+            FROM campaigns
+            WHERE race_id = ids.race_id
+        ) ranked
+        HAVING count(*) > 0
+    ) c ON true
+    ON CONFLICT (race_id) DO UPDATE SET
+        office_id = EXCLUDED.office_id,
+        election_date = EXCLUDED.election_date,
+        candidate_count = EXCLUDED.candidate_count,
+        elected_count = EXCLUDED.elected_count,
+        contested = EXCLUDED.contested,
+        top_margin = EXCLUDED.top_margin,
+        winners = EXCLUDED.winners;
+
+    DELETE FROM race_summary s
+    WHERE s.race_id = ANY(race_ids)
+      AND NOT EXISTS (SELECT 1 FROM races WHERE race_id = s.race_id)
+      AND NOT EXISTS (SELECT 1 FROM campaigns WHERE race_id = s.race_id);
+$$;
+
+-- Statement-level, so an upload of thousands of rows refreshes each race it
+-- touched once. Postgres only allows transition tables on single-event
+-- triggers, hence one trigger per event.
+CREATE OR REPLACE FUNCTION race_summary_changed() RETURNS trigger
+LANGUAGE plpgsql
+SET search_path FROM CURRENT
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_race_summary(ARRAY(SELECT DISTINCT race_id FROM new_rows WHERE race_id IS NOT NULL));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_race_summary(ARRAY(
+            SELECT race_id FROM new_rows WHERE race_id IS NOT NULL
+            UNION
+            SELECT race_id FROM old_rows WHERE race_id IS NOT NULL
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_race_summary(ARRAY(SELECT DISTINCT race_id FROM old_rows WHERE race_id IS NOT NULL));
+    ELSE
+        -- TRUNCATE
+        DELETE FROM race_summary;
+        PERFORM refresh_race_summary(ARRAY(SELECT race_id FROM races UNION SELECT race_id FROM campaigns));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS race_summary_insert ON campaigns;
+DROP TRIGGER IF EXISTS race_summary_update ON campaigns;
+DROP TRIGGER IF EXISTS race_summary_delete ON campaigns;
+DROP TRIGGER IF EXISTS race_summary_truncate ON campaigns;
+CREATE TRIGGER race_summary_insert AFTER INSERT ON campaigns
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+CREATE TRIGGER race_summary_update AFTER UPDATE ON campaigns
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+CREATE TRIGGER race_summary_delete AFTER DELETE ON campaigns
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+CREATE TRIGGER race_summary_truncate AFTER TRUNCATE ON campaigns
+    FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+
+DROP TRIGGER IF EXISTS race_summary_insert ON races;
+DROP TRIGGER IF EXISTS race_summary_update ON races;
+DROP TRIGGER IF EXISTS race_summary_delete ON races;
+DROP TRIGGER IF EXISTS race_summary_truncate ON races;
+CREATE TRIGGER race_summary_insert AFTER INSERT ON races
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+CREATE TRIGGER race_summary_update AFTER UPDATE ON races
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+CREATE TRIGGER race_summary_delete AFTER DELETE ON races
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+CREATE TRIGGER race_summary_truncate AFTER TRUNCATE ON races
+    FOR EACH STATEMENT EXECUTE FUNCTION race_summary_changed();
+
+-- Summarize what is already there, and drop rows left by a restore.
+DELETE FROM race_summary s
+WHERE NOT EXISTS (SELECT 1 FROM races WHERE race_id = s.race_id)
+  AND NOT EXISTS (SELECT 1 FROM campaigns WHERE race_id = s.race_id);
+SELECT refresh_race_summary(ARRAY(SELECT race_id FROM races UNION SELECT race_id FROM campaigns));
@@ -0,0 +1,31 @@
+-- Races uploads run in the background (see upload_election_races). Each job
+-- commits its races a chunk at a time; upload_job_chunks records what each
+-- committed chunk wrote and how long it took.
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    job_id bigserial PRIMARY KEY,
+    election_id bigint NOT NULL,
+    filename text,
+    -- queued, running, done or failed
+    status text NOT NULL DEFAULT 'queued',
+    races_total integer NOT NULL,
+    races_done integer NOT NULL DEFAULT 0,
+    chunk_races integer NOT NULL,
+    row_writes integer NOT NULL DEFAULT 0,
+    error text,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    started_at timestamptz,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    finished_at timestamptz
+);
+
+CREATE TABLE IF NOT EXISTS upload_job_chunks (
+    job_id bigint NOT NULL REFERENCES upload_jobs (job_id) ON DELETE CASCADE,
+    chunk integer NOT NULL,
+    races integer NOT NULL,
+    row_writes integer NOT NULL,
+    statements integer NOT NULL,
+    -- Time spent comparing and writing the chunk, before its commit.
+    seconds double precision NOT NULL,
+    committed_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (job_id, chunk)
+);
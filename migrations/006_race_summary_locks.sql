@@ -0,0 +1,67 @@
+-- Lock each race while refresh_race_summary recomputes it, so concurrent
+-- writes to different campaigns of one race cannot leave a summary computed
+-- from a snapshot that missed the other's commit. Databases migrated before
+-- this have the version from 004_race_summary.sql without the lock; 004 now
+-- has this definition too, for new databases and /admin/reload.
+
+CREATE OR REPLACE FUNCTION refresh_race_summary(race_ids bigint[]) RETURNS void
+LANGUAGE sql
+SET search_path FROM CURRENT
+AS $$
+    SELECT pg_advisory_xact_lock(id) FROM unnest(race_ids) id ORDER BY id;
+
+    INSERT INTO race_summary (
+        race_id, office_id, election_date, candidate_count, elected_count, contested, top_margin, winners
+    )
+    SELECT
+        ids.race_id,
+        COALESCE(c.office_id, r.office_id),
+        c.election_date,
+        COALESCE(c.candidate_count, 0),
+        COALESCE(c.elected_count, 0),
+        COALESCE(c.candidate_count, 0) > GREATEST(r.seats, c.elected_count, 1),
+        c.top_margin,
+        COALESCE(c.winners, '[]'::jsonb)
+    FROM (
+        SELECT race_id FROM races WHERE race_id = ANY(race_ids)
+        UNION
+        SELECT race_id FROM campaigns WHERE race_id = ANY(race_ids)
+    ) ids
+    LEFT JOIN LATERAL (
+        SELECT seats, office_id FROM races WHERE race_id = ids.race_id LIMIT 1
+    ) r ON true
+    LEFT JOIN LATERAL (
+        SELECT
+            max(ranked.office_id) AS office_id,
+            max(ranked.election_date) AS election_date,
+            count(*)::integer AS candidate_count,
+            count(*) FILTER (WHERE ranked.elected = 1)::integer AS elected_count,
+            max(ranked.votes_received) FILTER (WHERE ranked.place = 1)
+                - max(ranked.votes_received) FILTER (WHERE ranked.place = 2) AS top_margin,
+            jsonb_agg(
+                jsonb_build_object('candidate_name', ranked.candidate_name, 'contact_id', ranked.contact_id)
+                ORDER BY ranked.place
+            ) FILTER (WHERE ranked.elected = 1) AS winners
+        FROM (
+            SELECT
+                office_id, election_date, elected, votes_received, candidate_name, contact_id,
+                row_number() OVER (ORDER BY votes_received DESC NULLS LAST, campaign_id DESC) AS place
+            FROM campaigns
+            WHERE race_id = ids.race_id
+        ) ranked
+        HAVING count(*) > 0
+    ) c ON true
+    ON CONFLICT (race_id) DO UPDATE SET
+        office_id = EXCLUDED.office_id,
+        election_date = EXCLUDED.election_date,
+        candidate_count = EXCLUDED.candidate_count,
+        elected_count = EXCLUDED.elected_count,
+        contested = EXCLUDED.contested,
+        top_margin = EXCLUDED.top_margin,
+        winners = EXCLUDED.winners;
+
+    DELETE FROM race_summary s
+    WHERE s.race_id = ANY(race_ids)
+      AND NOT EXISTS (SELECT 1 FROM races WHERE race_id = s.race_id)
+      AND NOT EXISTS (SELECT 1 FROM campaigns WHERE race_id = s.race_id);
+$$;
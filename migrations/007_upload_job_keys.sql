@@ -0,0 +1,4 @@
+-- A random key per background upload, handed to the browser that started it
+-- in the job page's URL, so the page and its progress stream can be opened
+-- without putting the admin token in a URL.
+ALTER TABLE upload_jobs ADD COLUMN IF NOT EXISTS view_key text;
@@ -0,0 +1,276 @@
+"""SQL for the read-only pages, shared by app.py and the async JSON API in api_server.py.
+
+Queries use %s placeholders, which psycopg2 and psycopg 3 both accept. The
+ones with an ORDER BY chosen by the request take `{sort_column}` and
+`{sort_order}` and must be formatted with values from `validated_sort`.
+"""
+
+ELECTION_SORT_COLUMNS = ['election_name', 'election_date']
+RACE_SORT_COLUMNS = ['race_name', 'seats', 'total_votes', 'term_years']
+JURISDICTION_SORT_COLUMNS = ['jurisdiction_name', 'jurisdiction_type']
+PEOPLE_SORT_MAP = {
+    'full_name': 'i.full_name',
+    'current_jurisdiction': 'coalesce(c.current_jurisdiction, \'\')',
+    'current_office': 'coalesce(c.current_office, \'\')',
+    'party_affiliation': 'coalesce(i.party_affiliation, \'\')',
+    'candidate_status': 'coalesce(i.candidate_status, \'\')',
+}
+
+
+def validated_sort(sort_column: str | None, sort_order: str | None, allowed, default: str) -> tuple[str, str]:
+    """Return (sort_column, sort_order), falling back to the default column and 'asc'."""
+    if sort_column not in allowed:
+        sort_column = default
+    if sort_order not in ['asc', 'desc']:
+        sort_order = 'asc'
+    return sort_column, sort_order
+
+
+ELECTIONS = """
+    SELECT election_id, election_name, TO_CHAR(election_date, 'MM/DD/YYYY') as election_date
+    FROM elections
+    ORDER BY {sort_column} {sort_order};
+"""
+
+ELECTION = """
+    SELECT election_name, TO_CHAR(election_date, 'MM/DD/YYYY') as election_date
+    FROM elections
+    WHERE election_id = %s;
+"""
+
+# Per-race facts come from race_summary (migrations/004_race_summary.sql),
+# which triggers keep up to date with campaigns; winners is a list of
+# {candidate_name, contact_id} objects in order of votes.
+ELECTION_RACES = """
+    SELECT r.race_id, r.race_name, r.seats, r.total_votes, r.term_years,
+           COALESCE(s.winners, '[]') AS winners, s.candidate_count, s.elected_count, s.contested, s.top_margin
+    FROM races r
+    LEFT JOIN race_summary s ON s.race_id = r.race_id
+    WHERE r.election_id = %s
+    ORDER BY {sort_column} {sort_order};
+"""
+
+RACE = """
+    SELECT race_name, jurisdiction, office_name, seats, total_votes, term_years,
+           TO_CHAR(term_start_date, 'MM/DD/YYYY') as term_start_date,
+           TO_CHAR(reelection_date, 'MM/DD/YYYY') as reelection_date,
+           TO_CHAR(term_end_date, 'MM/DD/YYYY') as term_end_date
+    FROM races
+    WHERE race_id = %s;
+"""
+
+RACE_CAMPAIGNS = """
+    SELECT campaign_name, votes_received, percent_received, total_votes, elected, contact_id
+    FROM campaigns
+    WHERE race_id = %s;
+"""
+
+INDIVIDUAL = """
+    SELECT first_name, middle_name, last_name, email, phone, address, city, zip, state,
+           candidate_status, party_affiliation, democratic_alignment, area, notes, contact_id
+    FROM individuals
+    WHERE contact_id = %s;
+"""
+
+INDIVIDUAL_CAMPAIGNS = """
+    SELECT campaign_name, votes_received, percent_received, total_votes, elected,
+           TO_CHAR(election_date, 'MM/DD/YYYY') as election_date,
+           TO_CHAR(term_start_date, 'MM/DD/YYYY') as term_start_date,
+           TO_CHAR(reelection_date, 'MM/DD/YYYY') as reelection_date,
+           TO_CHAR(term_end_date, 'MM/DD/YYYY') as term_end_date,
+           race_id, election_date as election_sort_date
+    FROM campaigns
+    WHERE contact_id = %s
+    ORDER BY election_sort_date;
+"""
+
+# {sort_column} here is a value of PEOPLE_SORT_MAP, not its key.
+PEOPLE = """
+    WITH current_service AS (
+        SELECT
+            contact_id,
+            string_agg(DISTINCT jurisdiction, ', ' ORDER BY jurisdiction) AS current_jurisdiction,
+            string_agg(DISTINCT office_name, ', ' ORDER BY office_name) AS current_office
+        FROM campaigns
+        WHERE elected = 1
+          AND term_start_date IS NOT NULL
+          AND term_end_date IS NOT NULL
+          AND CURRENT_DATE >= term_start_date::date
+          AND CURRENT_DATE <= term_end_date::date
+        GROUP BY contact_id
+    )
+    SELECT
+        i.contact_id,
+        i.full_name,
+        i.party_affiliation,
+        i.candidate_status,
+        c.current_jurisdiction,
+        c.current_office
+    FROM individuals i
+    LEFT JOIN current_service c ON c.contact_id = i.contact_id
+    ORDER BY {sort_column} {sort_order};
+"""
+
+JURISDICTIONS = """
+    SELECT jurisdiction_id, jurisdiction_name, jurisdiction_type
+    FROM jurisdictions
+    ORDER BY {sort_column} {sort_order};
+"""
+
+JURISDICTION = """
+    SELECT jurisdiction_name, jurisdiction_type, email, phone, address, city, state, zip, website
+    FROM jurisdictions
+    WHERE jurisdiction_id = %s;
+"""
+
+JURISDICTION_OFFICES = """
+    SELECT office_name, office_id, seats
+    FROM offices
+    WHERE jurisdiction_id = %s
+    ORDER BY office_name;
+"""
+
+OFFICE_CURRENT_HOLDERS = """
+    SELECT candidate_name, contact_id
+    FROM campaigns
+    WHERE office_id = %s AND elected = 1
+    ORDER BY election_date DESC
+    LIMIT %s;
+"""
+
+# OFFICE_CURRENT_HOLDERS for every office in a jurisdiction in one query.
+JURISDICTION_CURRENT_HOLDERS = """
+    SELECT o.office_id, h.candidate_name, h.contact_id
+    FROM offices o
+    CROSS JOIN LATERAL (
+        SELECT candidate_name, contact_id
+        FROM campaigns
+        WHERE office_id = o.office_id AND elected = 1
+        ORDER BY election_date DESC
+        LIMIT o.seats
+    ) h
+    WHERE o.jurisdiction_id = %s;
+"""
+
+OFFICES = """
+    SELECT jurisdiction, jurisdiction_id, office_name, office_id, seats, term_years, term_start_month, election_month
+    FROM offices
+    ORDER BY jurisdiction, office_name;
+"""
+
+OFFICE = """
+    SELECT office_full_name, office_name, seats, term_years, term_start_month, election_month, email, phone, address, city, state, zip, website
+    FROM offices
+    WHERE office_id = %s;
+"""
+
+# Winners of the office's latest race that elected anyone. Takes office_id twice.
+OFFICE_HOLDERS = """
+    SELECT w.winner->>'candidate_name' AS candidate_name, (w.winner->>'contact_id')::bigint AS contact_id, s.election_date
+    FROM race_summary s
+    CROSS JOIN LATERAL jsonb_array_elements(s.winners) WITH ORDINALITY AS w(winner, place)
+    WHERE s.office_id = %s
+      AND s.elected_count > 0
+      AND s.election_date = (
+          SELECT MAX(election_date)
+          FROM race_summary
+          WHERE office_id = %s AND elected_count > 0
+      )
+    ORDER BY s.race_id, w.place;
+"""
+
+OFFICE_RACES = """
+    SELECT
+        r.race_id,
+        r.race_name,
+        e.election_date::date AS election_date
+    FROM races r
+    LEFT JOIN elections e ON e.election_id = r.election_id
+    WHERE r.office_id = %s
+    ORDER BY election_date ASC NULLS LAST, r.race_name ASC;
+"""
+
+
+def parse_id_list(raw: str | None, limit: int) -> list[int]:
+    """Parse a comma-separated ?ids= value into distinct ints, in order.
+
+    Raises ValueError with a message fit for the client when the list is
+    empty, malformed or longer than limit.
+    """
+    ids = []
+    for part in (raw or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            value = int(part)
+        except ValueError:
+            raise ValueError(f"Invalid id: {part!r}") from None
+        if value not in ids:
+            ids.append(value)
+    if not ids:
+        raise ValueError("Pass one or more comma-separated ids as ?ids=")
+    if len(ids) > limit:
+        raise ValueError(f"At most {limit} ids per request, got {len(ids)}")
+    return ids
+
+
+# Batch lookups by id for the /api/v1/<entity>?ids= endpoints. Each takes the
+# list of ids as its one parameter.
+INDIVIDUALS_BY_IDS = """
+    SELECT contact_id, first_name, middle_name, last_name, full_name, email, phone, address, city, zip, state,
+           candidate_status, party_affiliation, democratic_alignment, area, notes
+    FROM individuals
+    WHERE contact_id = ANY(%s)
+    ORDER BY contact_id;
+"""
+
+RACES_BY_IDS = """
+    SELECT race_id, race_name, election_id, jurisdiction, jurisdiction_id, office_name, office_id,
+           seats, total_votes, term_years,
+           TO_CHAR(term_start_date, 'MM/DD/YYYY') as term_start_date,
+           TO_CHAR(reelection_date, 'MM/DD/YYYY') as reelection_date,
+           TO_CHAR(term_end_date, 'MM/DD/YYYY') as term_end_date
+    FROM races
+    WHERE race_id = ANY(%s)
+    ORDER BY race_id;
+"""
+
+OFFICES_BY_IDS = """
+    SELECT office_id, office_full_name, jurisdiction, jurisdiction_id, office_name, seats, term_years,
+           term_start_month, election_month, email, phone, address, city, state, zip, website
+    FROM offices
+    WHERE office_id = ANY(%s)
+    ORDER BY office_id;
+"""
+
+CAMPAIGNS_BY_IDS = """
+    SELECT campaign_id, campaign_name, race_id, contact_id, candidate_name, jurisdiction, office_name, office_id,
+           votes_received, percent_received, total_votes, elected,
+           TO_CHAR(election_date, 'MM/DD/YYYY') as election_date,
+           TO_CHAR(term_start_date, 'MM/DD/YYYY') as term_start_date,
+           TO_CHAR(reelection_date, 'MM/DD/YYYY') as reelection_date,
+           TO_CHAR(term_end_date, 'MM/DD/YYYY') as term_end_date
+    FROM campaigns
+    WHERE campaign_id = ANY(%s)
+    ORDER BY campaign_id;
+"""
+
+# entity in the URL -> (query, id column)
+BATCH_QUERIES = {
+    'individuals': (INDIVIDUALS_BY_IDS, 'contact_id'),
+    'races': (RACES_BY_IDS, 'race_id'),
+    'offices': (OFFICES_BY_IDS, 'office_id'),
+    'campaigns': (CAMPAIGNS_BY_IDS, 'campaign_id'),
+}
+
+# Races of an election with their winners, for live results. The second and
+# third parameters are the same list of race_ids to limit them to, or NULL
+# for every race.
+LIVE_RACES = """
+    SELECT r.race_id, r.race_name, r.seats, r.total_votes, r.term_years, COALESCE(s.winners, '[]') AS winners
+    FROM races r
+    LEFT JOIN race_summary s ON s.race_id = r.race_id
+    WHERE r.election_id = %s AND (%s::bigint[] IS NULL OR r.race_id = ANY(%s))
+    ORDER BY r.race_id;
+"""
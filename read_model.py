@@ -0,0 +1,493 @@
+"""In-memory read model of the election database for app.py.
+
+The whole dataset (elections, races, campaigns, offices, jurisdictions and
+individuals) is small enough to keep in each worker's memory. ReadModel loads
+it once, indexes it by id, election, office and contact, and answers the
+read-only pages with the same rows the SQL in app.py returns.
+
+It stays current using the change notifications app.py already sends: each
+notification names the tables and ids a write touched, and the next read
+after data_versions moves reloads just those rows (or the whole table when
+the ids are unknown). Tables are replaced by building a new Snapshot and
+swapping it in, so readers never see a half-applied refresh.
+
+Text columns sort in Python code point order, which can differ from the
+database collation for mixed-case or punctuated values.
+"""
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+
+def _to_char(value) -> str | None:
+    """Python equivalent of TO_CHAR(value, 'MM/DD/YYYY')."""
+    return value.strftime('%m/%d/%Y') if value is not None else None
+
+
+def _as_date(value) -> date | None:
+    """Python equivalent of value::date."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _sorted(rows, key, descending: bool, nulls_last: bool | None = None):
+    """Sort like Postgres ORDER BY (NULLs last ascending, first descending,
+    unless nulls_last says otherwise)."""
+    if nulls_last is None:
+        nulls_last = not descending
+    none_rank = 1 if nulls_last != descending else 0
+
+    def sort_key(row):
+        value = key(row)
+        return (none_rank, None) if value is None else (1 - none_rank, value)
+
+    return sorted(rows, key=sort_key, reverse=descending)
+
+
+def _intern_row(row: tuple) -> tuple:
+    # Jurisdiction, office and status strings repeat across thousands of
+    # rows; interning stores each distinct value once.
+    return tuple(sys.intern(v) if isinstance(v, str) and len(v) <= 100 else v for v in row)
+
+
+class Table:
+    """The rows of one table as tuples, grouped by key column."""
+
+    def __init__(self, name: str, columns: list[str], key: str, rows: list[tuple]):
+        self.name = name
+        self.columns = columns
+        self.col = {c: i for i, c in enumerate(columns)}
+        self.key = key
+        self.rows = rows
+        self._bytes = None
+        key_index = self.col[key]
+        self.by_key: dict = {}
+        for row in rows:
+            self.by_key.setdefault(row[key_index], []).append(row)
+
+    def replace_keys(self, keys, new_rows: list[tuple]) -> 'Table':
+        """A copy with every row for keys replaced by new_rows."""
+        keys = set(keys)
+        key_index = self.col[self.key]
+        kept = [row for row in self.rows if row[key_index] not in keys]
+        return Table(self.name, self.columns, self.key, kept + new_rows)
+
+    def first(self, key):
+        rows = self.by_key.get(key)
+        return rows[0] if rows else None
+
+    def as_dict(self, row, columns) -> dict:
+        return {c: row[self.col[c]] for c in columns}
+
+    def approximate_bytes(self) -> int:
+        # Tables are never changed in place, so refreshes only measure the
+        # tables they rebuilt.
+        if self._bytes is not None:
+            return self._bytes
+        total = sys.getsizeof(self.rows)
+        seen = set()
+        for row in self.rows:
+            total += sys.getsizeof(row)
+            for value in row:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    total += sys.getsizeof(value)
+        self._bytes = total
+        return total
+
+
+# (table, key column, columns loaded). Campaigns are keyed by race_id because
+# write paths replace and announce them a race at a time.
+TABLES = {
+    'elections': ('election_id', [
+        'election_id', 'election_name', 'election_date',
+    ]),
+    'races': ('race_id', [
+        'race_id', 'race_name', 'jurisdiction', 'office_name', 'office_id', 'election_id',
+        'seats', 'total_votes', 'term_years', 'term_start_date', 'reelection_date', 'term_end_date',
+    ]),
+    'campaigns': ('race_id', [
+        'campaign_id', 'campaign_name', 'race_id', 'candidate_name', 'contact_id', 'jurisdiction',
+        'office_name', 'office_id', 'votes_received', 'percent_received', 'total_votes', 'elected',
+        'election_date', 'term_start_date', 'reelection_date', 'term_end_date',
+    ]),
+    'individuals': ('contact_id', [
+        'contact_id', 'first_name', 'middle_name', 'last_name', 'full_name', 'email', 'phone',
+        'address', 'city', 'zip', 'state', 'candidate_status', 'party_affiliation',
+        'democratic_alignment', 'area', 'notes',
+    ]),
+    'jurisdictions': ('jurisdiction_id', [
+        'jurisdiction_id', 'jurisdiction_name', 'jurisdiction_type', 'email', 'phone', 'address',
+        'city', 'state', 'zip', 'website',
+    ]),
+    'offices': ('office_id', [
+        'office_id', 'office_full_name', 'jurisdiction', 'jurisdiction_id', 'office_name', 'seats',
+        'term_years', 'term_start_month', 'election_month', 'email', 'phone', 'address', 'city',
+        'state', 'zip', 'website',
+    ]),
+}
+
+
+def load_table(cursor, name: str, keys=None) -> list[tuple]:
+    """Fetch a table's rows, or only the rows whose key is in keys."""
+    key, columns = TABLES[name]
+    sql = f"SELECT {', '.join(columns)} FROM {name}"
+    params = None
+    if keys is not None:
+        sql += f" WHERE {key} = ANY(%s)"
+        params = (list(keys),)
+    # Campaign order stands in for the unordered SQL the pages used to run.
+    if name == 'campaigns':
+        sql += " ORDER BY campaign_id NULLS LAST"
+    cursor.execute(sql + ';', params)
+    return [_intern_row(row) for row in cursor.fetchall()]
+
+
+class Snapshot:
+    """One consistent version of every table plus the secondary indexes."""
+
+    def __init__(self, tables: dict[str, Table]):
+        self.tables = tables
+        self.elections = tables['elections']
+        self.races = tables['races']
+        self.campaigns = tables['campaigns']
+        self.individuals = tables['individuals']
+        self.jurisdictions = tables['jurisdictions']
+        self.offices = tables['offices']
+
+        races_col = self.races.col
+        self.races_by_election: dict = {}
+        self.races_by_office: dict = {}
+        for row in self.races.rows:
+            self.races_by_election.setdefault(row[races_col['election_id']], []).append(row)
+            self.races_by_office.setdefault(row[races_col['office_id']], []).append(row)
+
+        camp_col = self.campaigns.col
+        self.campaigns_by_contact: dict = {}
+        self.campaigns_by_office: dict = {}
+        for row in self.campaigns.rows:
+            self.campaigns_by_contact.setdefault(row[camp_col['contact_id']], []).append(row)
+            self.campaigns_by_office.setdefault(row[camp_col['office_id']], []).append(row)
+
+        self.offices_by_jurisdiction: dict = {}
+        for row in self.offices.rows:
+            self.offices_by_jurisdiction.setdefault(row[self.offices.col['jurisdiction_id']], []).append(row)
+
+    def approximate_bytes(self) -> int:
+        return sum(t.approximate_bytes() for t in self.tables.values())
+
+    # Each method below mirrors the SQL of the app.py view of the same name.
+
+    def elections_list(self, sort_column: str, sort_order: str) -> list[dict]:
+        t = self.elections
+        rows = [
+            {
+                'election_id': r[t.col['election_id']],
+                'election_name': r[t.col['election_name']],
+                'election_date': _to_char(r[t.col['election_date']]),
+            }
+            for r in t.rows
+        ]
+        return _sorted(rows, lambda r: r[sort_column], sort_order == 'desc')
+
+    def election_races(self, election_id: int, sort_column: str, sort_order: str):
+        t = self.elections
+        row = t.first(election_id)
+        election = None
+        if row is not None:
+            election = {
+                'election_name': row[t.col['election_name']],
+                'election_date': _to_char(row[t.col['election_date']]),
+            }
+        rt = self.races
+        races = [
+            rt.as_dict(r, ['race_id', 'race_name', 'seats', 'total_votes', 'term_years'])
+            for r in self.races_by_election.get(election_id, [])
+        ]
+        races = _sorted(races, lambda r: r[sort_column], sort_order == 'desc')
+        for race in races:
+            race['winners'] = self.winners(race['race_id'])
+        return election, races
+
+    def winners(self, race_id: int) -> list[dict]:
+        """Winners in order of votes, as in race_summary."""
+        ct = self.campaigns
+        elected = [c for c in ct.by_key.get(race_id, []) if c[ct.col['elected']] == 1]
+        elected = _sorted(elected, lambda c: c[ct.col['campaign_id']], True)
+        elected = _sorted(elected, lambda c: c[ct.col['votes_received']], True, nulls_last=True)
+        return [ct.as_dict(c, ['candidate_name', 'contact_id']) for c in elected]
+
+    def race_details(self, race_id: int):
+        rt = self.races
+        row = rt.first(race_id)
+        race = None
+        if row is not None:
+            race = rt.as_dict(row, ['race_name', 'jurisdiction', 'office_name', 'seats', 'total_votes', 'term_years'])
+            for c in ('term_start_date', 'reelection_date', 'term_end_date'):
+                race[c] = _to_char(row[rt.col[c]])
+        ct = self.campaigns
+        campaigns = [
+            ct.as_dict(c, ['campaign_name', 'votes_received', 'percent_received', 'total_votes', 'elected', 'contact_id'])
+            for c in ct.by_key.get(race_id, [])
+        ]
+        return race, campaigns
+
+    def individual(self, contact_id: int):
+        it = self.individuals
+        row = it.first(contact_id)
+        individual = None
+        if row is not None:
+            individual = it.as_dict(row, [
+                'first_name', 'middle_name', 'last_name', 'email', 'phone', 'address', 'city', 'zip', 'state',
+                'candidate_status', 'party_affiliation', 'democratic_alignment', 'area', 'notes', 'contact_id',
+            ])
+        ct = self.campaigns
+        campaigns = []
+        for c in self.campaigns_by_contact.get(contact_id, []):
+            campaign = ct.as_dict(c, ['campaign_name', 'votes_received', 'percent_received', 'total_votes', 'elected'])
+            for col in ('election_date', 'term_start_date', 'reelection_date', 'term_end_date'):
+                campaign[col] = _to_char(c[ct.col[col]])
+            campaign['race_id'] = c[ct.col['race_id']]
+            campaign['election_sort_date'] = c[ct.col['election_date']]
+            campaigns.append(campaign)
+        return individual, _sorted(campaigns, lambda c: c['election_sort_date'], False)
+
+    def people(self, sort_column: str, sort_order: str) -> list[dict]:
+        ct = self.campaigns
+        col = ct.col
+        today = date.today()
+        service: dict = {}
+        for c in ct.rows:
+            start, end = c[col['term_start_date']], c[col['term_end_date']]
+            if c[col['elected']] != 1 or start is None or end is None:
+                continue
+            if not (_as_date(start) <= today <= _as_date(end)):
+                continue
+            entry = service.setdefault(c[col['contact_id']], (set(), set()))
+            if c[col['jurisdiction']] is not None:
+                entry[0].add(c[col['jurisdiction']])
+            if c[col['office_name']] is not None:
+                entry[1].add(c[col['office_name']])
+
+        it = self.individuals
+        rows = []
+        for r in it.rows:
+            jurisdictions, offices = service.get(r[it.col['contact_id']], (None, None))
+            rows.append({
+                'contact_id': r[it.col['contact_id']],
+                'full_name': r[it.col['full_name']],
+                'party_affiliation': r[it.col['party_affiliation']],
+                'candidate_status': r[it.col['candidate_status']],
+                'current_jurisdiction': ', '.join(sorted(jurisdictions)) if jurisdictions else None,
+                'current_office': ', '.join(sorted(offices)) if offices else None,
+            })
+        if sort_column == 'full_name':
+            key = lambda r: r['full_name']
+        else:
+            key = lambda r: r[sort_column] or ''
+        return _sorted(rows, key, sort_order == 'desc')
+
+    def jurisdictions_list(self, sort_column: str, sort_order: str) -> list[dict]:
+        t = self.jurisdictions
+        rows = [t.as_dict(r, ['jurisdiction_id', 'jurisdiction_name', 'jurisdiction_type']) for r in t.rows]
+        return _sorted(rows, lambda r: r[sort_column], sort_order == 'desc')
+
+    def current_officeholders(self, office_id: int, seats) -> list[dict]:
+        ct = self.campaigns
+        elected = [c for c in self.campaigns_by_office.get(office_id, []) if c[ct.col['elected']] == 1]
+        elected = _sorted(elected, lambda c: c[ct.col['election_date']], True)
+        if seats is not None:
+            elected = elected[:seats]
+        return [ct.as_dict(c, ['candidate_name', 'contact_id']) for c in elected]
+
+    def jurisdiction_details(self, jurisdiction_id: int):
+        jt = self.jurisdictions
+        row = jt.first(jurisdiction_id)
+        jurisdiction = None
+        if row is not None:
+            jurisdiction = jt.as_dict(row, [
+                'jurisdiction_name', 'jurisdiction_type', 'email', 'phone', 'address', 'city', 'state', 'zip', 'website',
+            ])
+        ot = self.offices
+        offices = [
+            ot.as_dict(o, ['office_name', 'office_id', 'seats'])
+            for o in self.offices_by_jurisdiction.get(jurisdiction_id, [])
+        ]
+        offices = _sorted(offices, lambda o: o['office_name'], False)
+        for office in offices:
+            office['current_officeholders'] = self.current_officeholders(office['office_id'], office['seats'])
+        return jurisdiction, offices
+
+    def offices_list(self) -> list[dict]:
+        t = self.offices
+        rows = [
+            t.as_dict(r, [
+                'jurisdiction', 'jurisdiction_id', 'office_name', 'office_id', 'seats', 'term_years',
+                'term_start_month', 'election_month',
+            ])
+            for r in t.rows
+        ]
+        rows = _sorted(rows, lambda r: r['office_name'], False)
+        return _sorted(rows, lambda r: r['jurisdiction'], False)
+
+    def office_details(self, office_id: int):
+        ot = self.offices
+        row = ot.first(office_id)
+        office = None
+        if row is not None:
+            office = ot.as_dict(row, [
+                'office_full_name', 'office_name', 'seats', 'term_years', 'term_start_month', 'election_month',
+                'email', 'phone', 'address', 'city', 'state', 'zip', 'website',
+            ])
+
+        ct = self.campaigns
+        elected = [c for c in self.campaigns_by_office.get(office_id, []) if c[ct.col['elected']] == 1]
+        latest = max((c[ct.col['election_date']] for c in elected if c[ct.col['election_date']] is not None), default=None)
+        holders = [c for c in elected if latest is not None and c[ct.col['election_date']] == latest]
+        holders = _sorted(holders, lambda c: c[ct.col['campaign_id']], True)
+        holders = _sorted(holders, lambda c: c[ct.col['votes_received']], True, nulls_last=True)
+        officeholders = [ct.as_dict(c, ['candidate_name', 'contact_id', 'election_date']) for c in holders]
+
+        rt = self.races
+        et = self.elections
+        races = []
+        for r in self.races_by_office.get(office_id, []):
+            election = et.first(r[rt.col['election_id']])
+            races.append({
+                'race_id': r[rt.col['race_id']],
+                'race_name': r[rt.col['race_name']],
+                'election_date': _as_date(election[et.col['election_date']]) if election is not None else None,
+            })
+        races = _sorted(races, lambda r: r['race_name'], False)
+        races = _sorted(races, lambda r: r['election_date'], False)
+        return office, officeholders, races
+
+
+class ReadModel:
+    """Keeps a Snapshot in step with data_versions for one worker.
+
+    connect() must return a new connection to the primary. Call
+    notify(changes) for every change notification, and current(versions)
+    from request threads; it returns None (read from SQL instead) until the
+    first load finishes or if the data does not fit in max_bytes.
+    """
+
+    def __init__(self, connect, max_bytes: int, logger=None):
+        self.connect = connect
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.snapshot: Snapshot | None = None
+        self.versions: dict | None = None
+        self.over_budget = False
+        self.last_refresh_seconds = None
+        self._pending: dict = {}
+        self._pending_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._loading = False
+
+    def notify(self, changes) -> None:
+        with self._pending_lock:
+            if changes is None:
+                # Notifications may have been missed: any table whose version
+                # moved must be reloaded in full.
+                self._pending.clear()
+                return
+            for table, ids in changes:
+                if table not in TABLES:
+                    continue
+                current = self._pending.get(table, set())
+                if ids is None or current is None:
+                    self._pending[table] = None
+                else:
+                    self._pending[table] = current | set(ids)
+
+    def start_loading(self, versions: dict) -> None:
+        """Load every table in a background thread."""
+        with self._refresh_lock:
+            if self._loading or self.snapshot is not None or self.over_budget:
+                return
+            self._loading = True
+        threading.Thread(target=self._load_all, args=(dict(versions),), name='read-model-load', daemon=True).start()
+
+    def _load_all(self, versions: dict) -> None:
+        started = time.perf_counter()
+        try:
+            conn = self.connect()
+            try:
+                with conn.cursor() as cursor:
+                    tables = {name: Table(name, TABLES[name][1], TABLES[name][0], load_table(cursor, name)) for name in TABLES}
+                conn.rollback()
+            finally:
+                conn.close()
+            snapshot = Snapshot(tables)
+            if not self._within_budget(snapshot):
+                return
+            with self._refresh_lock:
+                self.snapshot = snapshot
+                self.versions = versions
+                self.last_refresh_seconds = time.perf_counter() - started
+        except Exception:
+            if self.logger:
+                self.logger.exception('Read model load failed; using SQL.')
+        finally:
+            self._loading = False
+
+    def current(self, versions: dict) -> Snapshot | None:
+        """The snapshot, first refreshed if versions moved past the loaded ones."""
+        if self.snapshot is None:
+            self.start_loading(versions)
+            return None
+        if versions == self.versions:
+            return self.snapshot
+        with self._refresh_lock:
+            if versions != self.versions:
+                try:
+                    self._refresh(versions)
+                except Exception:
+                    # The tables it was refreshing are reloaded in full next
+                    # time (their pending ids are gone); until then, SQL.
+                    if self.logger:
+                        self.logger.exception('Read model refresh failed; using SQL.')
+                    return None
+            return self.snapshot
+
+    def _refresh(self, versions: dict) -> None:
+        started = time.perf_counter()
+        changed = [t for t in TABLES if versions.get(t) != (self.versions or {}).get(t)]
+        with self._pending_lock:
+            work = {t: self._pending.pop(t, None) for t in changed}
+        tables = dict(self.snapshot.tables)
+        conn = self.connect()
+        try:
+            with conn.cursor() as cursor:
+                for name, ids in work.items():
+                    key, columns = TABLES[name]
+                    if ids is None:
+                        tables[name] = Table(name, columns, key, load_table(cursor, name))
+                    elif ids:
+                        tables[name] = tables[name].replace_keys(ids, load_table(cursor, name, ids))
+            conn.rollback()
+        finally:
+            conn.close()
+        snapshot = Snapshot(tables)
+        if not self._within_budget(snapshot):
+            # The data outgrew the budget since the first load: drop the
+            # snapshot so every page reads from SQL again.
+            self.snapshot = None
+            self.versions = None
+            return
+        self.snapshot = snapshot
+        self.versions = dict(versions)
+        self.last_refresh_seconds = time.perf_counter() - started
+
+    def _within_budget(self, snapshot: Snapshot) -> bool:
+        size = snapshot.approximate_bytes()
+        if size <= self.max_bytes:
+            return True
+        self.over_budget = True
+        if self.logger:
+            self.logger.warning('Read model needs ~%d MB, over its %d MB budget; using SQL.',
+                                size // 2**20, self.max_bytes // 2**20)
+        return False
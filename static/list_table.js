@@ -0,0 +1,231 @@
+// Sorting and filtering for list pages in the browser.
+//
+// A <table data-source="/people.json"> is rendered by the server in its
+// requested order, so it works without JavaScript. The first click on a sort
+// link, or the first keystroke in the filter box, fetches the data source
+// once ({"columns": [...], "rows": [[...], ...]}) and from then on the table
+// body is rebuilt from it. Each <th> describes its column:
+//
+//   data-key     payload column shown in the cell and used for sorting
+//   data-type    "text" (default), "number" or "mdy" (MM/DD/YYYY dates)
+//   data-render  "link" (data-href), "links" (a list of [id, name] pairs,
+//                each linked with data-href) or "button" (data-href, data-label)
+//   data-href    URL template; {column} is replaced from the row, {0} from a pair
+//
+// A sort link is an <a data-sort> in the header. If the data source cannot
+// be fetched, the link is followed and the server sorts instead.
+//
+// A table with data-live="/election_races/3/events" also subscribes to that
+// Server-Sent Events stream. Each "races" event is {"rows": [{...}, ...],
+// "removed": [...], "complete": bool} with rows keyed like the data source;
+// they replace the records with the same data-row-key value (all of them when
+// complete is true) and the table is rendered again in its current order.
+(function () {
+    'use strict';
+
+    const collator = new Intl.Collator(undefined, { sensitivity: 'base' });
+
+    function fill(template, values) {
+        return template.replace(/\{(\w+)\}/g, (_, name) => encodeURIComponent(values[name] ?? ''));
+    }
+
+    function sortValue(value, type) {
+        if (value === null || value === undefined || value === '') {
+            return null;
+        }
+        if (type === 'number') {
+            return Number(value);
+        }
+        if (type === 'mdy') {
+            const [month, day, year] = String(value).split('/');
+            return `${year}${month}${day}`;
+        }
+        return String(value);
+    }
+
+    function compare(a, b, type) {
+        if (a === null || b === null) {
+            // Missing values sort first, as the server's coalesce(..., '') does.
+            return a === null ? (b === null ? 0 : -1) : 1;
+        }
+        if (type === 'number') {
+            return a - b;
+        }
+        if (type === 'mdy') {
+            return a < b ? -1 : a > b ? 1 : 0;
+        }
+        return collator.compare(a, b);
+    }
+
+    function link(href, text) {
+        const a = document.createElement('a');
+        a.href = href;
+        a.textContent = text;
+        return a;
+    }
+
+    function renderCell(column, record) {
+        const td = document.createElement('td');
+        const value = column.key ? record[column.key] : null;
+        if (column.render === 'link') {
+            td.appendChild(link(fill(column.href, record), value ?? ''));
+        } else if (column.render === 'links') {
+            (value || []).forEach((pair, i) => {
+                if (i > 0) {
+                    td.appendChild(document.createTextNode(', '));
+                }
+                td.appendChild(link(fill(column.href, pair), pair[1]));
+            });
+        } else if (column.render === 'button') {
+            const a = link(fill(column.href, record), '');
+            const button = document.createElement('button');
+            button.textContent = column.label;
+            a.appendChild(button);
+            td.appendChild(a);
+        } else {
+            td.textContent = value ?? '';
+        }
+        return td;
+    }
+
+    function cellText(column, record) {
+        const value = column.key ? record[column.key] : null;
+        if (column.render === 'links') {
+            return (value || []).map((pair) => pair[1]).join(' ');
+        }
+        return column.render === 'button' ? '' : String(value ?? '');
+    }
+
+    function setup(table) {
+        const headers = Array.from(table.tHead.rows[0].cells);
+        const columns = headers.map((th) => ({
+            key: th.dataset.key,
+            type: th.dataset.type || 'text',
+            render: th.dataset.render,
+            href: th.dataset.href,
+            label: th.dataset.label,
+        }));
+        const tbody = table.tBodies[0];
+        let records = null;
+        let sortKey = table.dataset.sort;
+        let descending = table.dataset.order === 'desc';
+        let filterText = '';
+
+        function index(record) {
+            columns.forEach((column) => {
+                record[`_text_${column.key}`] = cellText(column, record).toLowerCase();
+            });
+            return record;
+        }
+
+        async function load() {
+            if (records === null) {
+                const response = await fetch(table.dataset.source, { credentials: 'same-origin' });
+                if (!response.ok) {
+                    throw new Error(`${table.dataset.source}: HTTP ${response.status}`);
+                }
+                const payload = await response.json();
+                records = payload.rows.map((row) => {
+                    const record = {};
+                    payload.columns.forEach((name, i) => { record[name] = row[i]; });
+                    return index(record);
+                });
+            }
+            return records;
+        }
+
+        function render() {
+            const column = columns.find((c) => c.key === sortKey) || columns[0];
+            let rows = records;
+            if (filterText) {
+                rows = rows.filter((record) => columns.some((c) => record[`_text_${c.key}`].includes(filterText)));
+            }
+            rows = rows
+                .map((record, index) => ({ record, index, value: sortValue(record[column.key], column.type) }))
+                .sort((a, b) => (descending ? -1 : 1) * compare(a.value, b.value, column.type) || a.index - b.index)
+                .map((entry) => entry.record);
+
+            const fragment = document.createDocumentFragment();
+            rows.forEach((record) => {
+                const tr = document.createElement('tr');
+                columns.forEach((c) => tr.appendChild(renderCell(c, record)));
+                fragment.appendChild(tr);
+            });
+            tbody.replaceChildren(fragment);
+            headers.forEach((th) => {
+                th.classList.toggle('sorted-asc', th.dataset.key === sortKey && !descending);
+                th.classList.toggle('sorted-desc', th.dataset.key === sortKey && descending);
+            });
+        }
+
+        headers.forEach((th) => {
+            const a = th.querySelector('a[data-sort]');
+            if (!a) {
+                return;
+            }
+            a.addEventListener('click', async (event) => {
+                event.preventDefault();
+                try {
+                    await load();
+                } catch (err) {
+                    window.location.href = a.href;
+                    return;
+                }
+                descending = sortKey === th.dataset.key ? !descending : false;
+                sortKey = th.dataset.key;
+                const params = new URLSearchParams(window.location.search);
+                params.set('sort', sortKey);
+                params.set('order', descending ? 'desc' : 'asc');
+                history.replaceState(null, '', `?${params}`);
+                render();
+            });
+        });
+
+        const filter = document.createElement('input');
+        filter.type = 'search';
+        filter.placeholder = 'Filter';
+        filter.className = 'table-filter';
+        filter.addEventListener('input', async () => {
+            filterText = filter.value.trim().toLowerCase();
+            try {
+                await load();
+            } catch (err) {
+                return;
+            }
+            render();
+        });
+        const p = document.createElement('p');
+        p.appendChild(filter);
+        table.before(p);
+
+        if (table.dataset.live && window.EventSource) {
+            const rowKey = table.dataset.rowKey;
+            const events = new EventSource(table.dataset.live);
+            events.addEventListener('races', async (event) => {
+                const update = JSON.parse(event.data);
+                if (update.complete) {
+                    records = [];
+                } else {
+                    try {
+                        await load();
+                    } catch (err) {
+                        return;
+                    }
+                }
+                const changed = new Map(update.rows.map((row) => [row[rowKey], index(row)]));
+                const removed = new Set(update.removed);
+                records = records
+                    .filter((record) => !removed.has(record[rowKey]))
+                    .map((record) => {
+                        const row = changed.get(record[rowKey]);
+                        changed.delete(record[rowKey]);
+                        return row || record;
+                    })
+                    .concat(Array.from(changed.values()));
+                render();
+            });
+        }
+    }
+
+    document.querySelectorAll('table[data-source]').forEach(setup);
+})();
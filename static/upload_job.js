@@ -0,0 +1,49 @@
+// Live progress for a background races upload (templates/upload_job.html).
+//
+// The page is rendered with the job's progress so far. If its container has
+// data-events, the Server-Sent Events stream there sends "progress" events,
+// {"job": {...}, "chunks": [...]}, with the chunks committed since the last
+// event; they update the status and are appended to the chunk table. The
+// stream ends once the job is done or has failed.
+(function () {
+    'use strict';
+
+    function update(container, progress) {
+        const field = (name) => container.querySelector(`[data-field="${name}"]`);
+        const job = progress.job;
+        field('status').textContent = job.status;
+        field('races_done').textContent = job.races_done;
+        field('row_writes').textContent = job.row_writes;
+        field('progress').value = job.races_done;
+        if (job.error) {
+            field('error').textContent = `Error: ${job.error}`;
+            field('error').hidden = false;
+        }
+        const body = field('chunks');
+        const rendered = new Set(Array.from(body.rows, (row) => row.cells[0].textContent));
+        for (const chunk of progress.chunks) {
+            if (rendered.has(String(chunk.chunk))) {
+                continue;
+            }
+            const row = body.insertRow();
+            for (const value of [chunk.chunk, chunk.races, chunk.row_writes, chunk.statements, chunk.seconds.toFixed(3)]) {
+                row.insertCell().textContent = value;
+            }
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        const container = document.getElementById('upload-job');
+        if (!container || !container.dataset.events || !window.EventSource) {
+            return;
+        }
+        const events = new EventSource(container.dataset.events);
+        events.addEventListener('progress', (event) => {
+            const progress = JSON.parse(event.data);
+            update(container, progress);
+            if (progress.job.status === 'done' || progress.job.status === 'failed') {
+                events.close();
+            }
+        });
+    });
+}());
@@ -0,0 +1,142 @@
+"""Tenants: the county parties served by one deployment of app.py.
+
+Every tenant keeps its tables in its own schema of the one database named by
+the DB_* settings, and app.py sets search_path to that schema on each
+connection it hands out. Tenants are configured as JSON, read from the file
+named by TENANTS_FILE or from the TENANTS variable itself:
+
+    {
+        "columbia": {"name": "Columbia County", "schema": "public",
+                     "hosts": ["columbia.example.org"]},
+        "sauk": {"name": "Sauk County", "schema": "sauk",
+                 "hosts": ["sauk.example.org"], "admin_token_env": "SAUK_ADMIN_TOKEN"}
+    }
+
+A request is routed by its Host header, then by a leading /<slug> path
+segment (so `/sauk/people` is Sauk County's people page), then to
+DEFAULT_TENANT if that is set. With only one tenant configured it is the
+default. Without any configuration there is a single tenant, "default", in
+the public schema, which serves every request as before.
+"""
+import json
+import os
+import re
+
+# Slugs and schemas are interpolated into SQL, NOTIFY channels and URLs.
+_SLUG = re.compile(r'^[a-z][a-z0-9_]{0,39}$')
+_SCHEMA = re.compile(r'^[a-z_][a-z0-9_]{0,62}$')
+
+ENVIRON_KEY = 'cocodems.tenant'
+
+
+class Tenant:
+    def __init__(self, slug: str, schema: str, name: str = '', hosts=(), admin_token_env: str = 'ADMIN_TOKEN'):
+        if not _SLUG.match(slug):
+            raise ValueError(f"Tenant slug must be lowercase letters, digits and underscores: {slug!r}")
+        if not _SCHEMA.match(schema):
+            raise ValueError(f"Tenant {slug!r} has an invalid schema name: {schema!r}")
+        self.slug = slug
+        self.schema = schema
+        self.name = name
+        self.hosts = tuple(h.lower() for h in hosts)
+        self.admin_token_env = admin_token_env
+
+    def __repr__(self) -> str:
+        return f'Tenant({self.slug!r}, schema={self.schema!r})'
+
+
+class Tenants:
+    """The configured tenants, in configuration order."""
+
+    def __init__(self, tenants: list[Tenant], default: str | None = None):
+        if not tenants:
+            raise ValueError("At least one tenant is required")
+        self._by_slug = {}
+        self._by_host = {}
+        for tenant in tenants:
+            if tenant.slug in self._by_slug:
+                raise ValueError(f"Duplicate tenant {tenant.slug!r}")
+            self._by_slug[tenant.slug] = tenant
+            for host in tenant.hosts:
+                if host in self._by_host:
+                    raise ValueError(f"Host {host!r} is assigned to more than one tenant")
+                self._by_host[host] = tenant
+        if default is None and len(tenants) == 1:
+            default = tenants[0].slug
+        if default is not None and default not in self._by_slug:
+            raise ValueError(f"DEFAULT_TENANT {default!r} is not a configured tenant")
+        # Serves requests that match no host or prefix; None means they get a 404.
+        self.default = self._by_slug[default] if default else None
+
+    def __iter__(self):
+        return iter(self._by_slug.values())
+
+    def __len__(self) -> int:
+        return len(self._by_slug)
+
+    def get(self, slug: str) -> Tenant | None:
+        return self._by_slug.get(slug)
+
+    def resolve(self, host: str, path: str) -> tuple[Tenant | None, str]:
+        """Return (tenant, path prefix naming it) for a request, prefix '' if none."""
+        tenant = self._by_host.get(host.rsplit(':', 1)[0].lower()) if host else None
+        if tenant is not None:
+            return tenant, ''
+        slug = path.lstrip('/').split('/', 1)[0]
+        tenant = self._by_slug.get(slug)
+        if tenant is not None and len(self) > 1:
+            return tenant, f'/{slug}'
+        return self.default, ''
+
+
+def load() -> Tenants:
+    """Read the tenant configuration from TENANTS_FILE or TENANTS."""
+    path = os.getenv('TENANTS_FILE')
+    if path:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    elif os.getenv('TENANTS'):
+        config = json.loads(os.environ['TENANTS'])
+    else:
+        return Tenants([Tenant('default', 'public', name=os.getenv('TENANT_NAME', ''))])
+    tenants = [
+        Tenant(
+            slug,
+            settings.get('schema', slug),
+            name=settings.get('name', ''),
+            hosts=settings.get('hosts', ()),
+            admin_token_env=settings.get('admin_token_env', 'ADMIN_TOKEN'),
+        )
+        for slug, settings in config.items()
+    ]
+    return Tenants(tenants, default=os.getenv('DEFAULT_TENANT') or None)
+
+
+class TenantMiddleware:
+    """WSGI middleware that picks each request's tenant.
+
+    The tenant is stored in environ[ENVIRON_KEY]. A /<slug> prefix is moved
+    from PATH_INFO to SCRIPT_NAME, so routing ignores it and url_for() keeps
+    it in the links it builds. Requests for no known tenant get a 404. A
+    caller may also preset environ[ENVIRON_KEY] to a slug (export_static.py
+    does), which skips the lookup.
+    """
+
+    def __init__(self, app, tenants: Tenants):
+        self.app = app
+        self.tenants = tenants
+
+    def __call__(self, environ, start_response):
+        preset = environ.get(ENVIRON_KEY)
+        if isinstance(preset, str):
+            tenant, prefix = self.tenants.get(preset), ''
+        else:
+            tenant, prefix = self.tenants.resolve(environ.get('HTTP_HOST', ''), environ.get('PATH_INFO', ''))
+        if tenant is None:
+            start_response('404 Not Found', [('Content-Type', 'text/plain; charset=utf-8')])
+            return [b'Unknown site\n']
+        environ[ENVIRON_KEY] = tenant
+        if prefix:
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + prefix
+            environ['PATH_INFO'] = environ.get('PATH_INFO', '')[len(prefix):]
+        return self.app(environ, start_response)